@@ -0,0 +1,102 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from detection_log import box_contour
+from media_loader import MediaLoader
+from pipeline import DetectionPipeline
+
+# Each worker process builds its own pipeline (and undistortion maps) once, in _init_worker
+_worker_pipeline = None
+
+
+def _init_worker(config, num_processes):
+    global _worker_pipeline
+    _worker_pipeline = DetectionPipeline(config, use_mask_cache=True)
+    if _worker_pipeline.mask_cache is not None:
+        # The workers share the cache directory and its size limit
+        _worker_pipeline.mask_cache.num_processes = num_processes
+
+
+def _process_shard(shard):
+    """
+    Runs detection on the frames [start_frame, end_frame) of the input.
+
+    Returns:
+        list: FrameResults reduced to what the merge and the detection writers use (frame
+              number, timestamp, Hough segments, fitted line and the bounding box of the
+              selected contour), so they are cheap to send back and to hold until merged.
+    """
+    input_path, start_frame, end_frame = shard
+    _worker_pipeline.reset()  # Shards are not contiguous; start each one without a track
+    reduced_decode = _worker_pipeline.config.get("input", {}).get("reduced_decode", False)
+    media_loader = MediaLoader(input_path, start_frame=start_frame, end_frame=end_frame,
+                               reduced_decode=reduced_decode)
+    results = []
+    try:
+        for result in _worker_pipeline.run(media_loader, render=False):
+            result.frame = None
+            result.contour_features = None  # Every contour of the frame and its feature table
+            if result.best_contour is not None:
+                result.best_contour = box_contour(cv2.boundingRect(result.best_contour))
+            results.append(result)
+    finally:
+        media_loader.release()
+    return results
+
+
+class BatchRunner:
+    """
+    Splits an image folder or a video into frame ranges and processes them on a
+    process pool.
+
+    Image folders are split into chunks of the sorted file list. Videos are split
+    into frame ranges that each worker reaches by seeking with CAP_PROP_POS_FRAMES.
+    Results are yielded in frame order. Only detections are returned (no frames or
+    canvases), so this mode is meant for headless batch reprocessing.
+    """
+    def __init__(self, config, num_processes=None, shards_per_process=4):
+        """
+        Args:
+            config (dict): The CONFIG dictionary. Each worker builds its components from it.
+            num_processes (int): Size of the process pool (defaults to the number of CPUs).
+            shards_per_process (int): Number of shards per process, for load balancing.
+        """
+        self.config = config
+        self.num_processes = num_processes or os.cpu_count() or 1
+        self.shards_per_process = max(1, shards_per_process)
+
+    def make_shards(self, input_path):
+        """
+        Splits the input into (input_path, start_frame, end_frame) ranges.
+        """
+        media_loader = MediaLoader(input_path)
+        total_frames = media_loader.total_frames
+        media_loader.release()
+
+        if total_frames <= 0:
+            # The container did not report a frame count; fall back to a single shard
+            return [(input_path, 0, None)]
+
+        num_shards = min(total_frames, self.num_processes * self.shards_per_process)
+        shard_size = -(-total_frames // num_shards)  # Ceiling division
+        shards = [(input_path, start, min(start + shard_size, total_frames))
+                  for start in range(0, total_frames, shard_size)]
+
+        # The reported frame count of a video can be off; let the last shard read to the end
+        last_path, last_start, _ = shards[-1]
+        shards[-1] = (last_path, last_start, None)
+        return shards
+
+    def run(self, input_path):
+        """
+        Processes the input and yields FrameResults (without frame, contour features and with
+        best_contour reduced to its bounding box) in frame order.
+        """
+        shards = self.make_shards(input_path)
+        with ProcessPoolExecutor(max_workers=self.num_processes,
+                                 initializer=_init_worker, initargs=(self.config, self.num_processes)) as executor:
+            # executor.map returns the shards in submission order, which is frame order
+            for shard_results in executor.map(_process_shard, shards):
+                yield from shard_results
@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+from pipeline import DetectionPipeline
+from synthetic_frames import RESOLUTIONS, SyntheticFrameGenerator
+
+
+def summarize(samples):
+    """
+    Summarizes a list of latencies (in seconds) as milliseconds and frames per second.
+    """
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    mean = float(ms.mean())
+    return {
+        "mean_ms": mean,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "throughput_fps": 1000.0 / mean if mean > 0 else float("inf"),
+    }
+
+
+class StageBenchmark:
+    """
+    Times each pipeline stage separately on synthetic frames.
+
+    Every iteration runs the stages in pipeline order, feeding each stage the
+    output of the previous one, and records the latency of each call.
+    """
+    def __init__(self, config, iterations=30, warmup=3):
+        """
+        Args:
+            config (dict): The CONFIG dictionary used to build the components.
+            iterations (int): Number of timed iterations per resolution.
+            warmup (int): Number of untimed iterations run first.
+        """
+        self.config = config
+        self.iterations = iterations
+        self.warmup = warmup
+        self.pipeline = DetectionPipeline(config)
+
+    def _run_stages(self, frame, timings):
+        config = self.config
+        p = self.pipeline
+        frame_height, frame_width = frame.shape[:2]
+
+        def timed(name, func, *args, **kwargs):
+            start = time.perf_counter()
+            output = func(*args, **kwargs)
+            timings.setdefault(name, []).append(time.perf_counter() - start)
+            return output
+
+        corrected = timed("apply_fisheye_correction", p.geometry_corrector.apply_fisheye_correction, frame)
+        gray = timed("convert_to_grayscale", p.preprocessor.convert_to_grayscale, corrected)
+        blurred = timed("apply_blur", p.preprocessor.apply_blur, gray)
+        binary = timed("apply_binary_threshold", p.preprocessor.apply_binary_threshold, blurred)
+        opened = timed("apply_morphological_opening", p.morphology_processor.apply_morphological_opening, binary)
+        edges = timed("canny", cv2.Canny, opened, 30, 100)
+        hough_lines = timed("line_detection", p.line_detector.detect, edges,
+                            threshold=config["line_detection"]["threshold"],
+                            min_line_length=config["line_detection"]["min_line_length"],
+                            max_line_gap=config["line_detection"]["max_line_gap"])
+        contours = timed("contour_detection", p.contour_detector.detect, opened)
+        features = timed("contour_analysis", p.contour_analyzer.analyze, contours)
+        best_contour, fitted_line = timed("select_and_process_contour",
+                                          p.contour_selector.select_and_process_contour,
+                                          contours, frame_height, frame_width, features=features)
+
+        canvas = timed("prepare_canvas", p.drawer.prepare_canvas, corrected)
+
+        if hough_lines is not None:
+            timed("plot_extrapolated_lines", p.drawer.plot_extrapolated_lines, canvas, hough_lines,
+                  color=config["drawing"]["lines"]["color"],
+                  thickness=config["drawing"]["lines"]["thickness"])
+        timed("draw_contours", p.drawer.draw_contours, canvas, contours,
+              color=config["drawing"]["contours"]["color"],
+              thickness=config["drawing"]["contours"]["thickness"], features=features)
+
+    def run_resolution(self, synthetic_frame):
+        """
+        Benchmarks one synthetic frame and checks the detections against its ground truth.
+        """
+        frame = synthetic_frame.image
+        timings = {}
+        for _ in range(self.warmup):
+            self._run_stages(frame, {})
+        for _ in range(self.iterations):
+            self._run_stages(frame, timings)
+
+        # End-to-end timing through the real pipeline, which also gives the detections to check
+        end_to_end = []
+        result = None
+        for i in range(self.warmup + self.iterations):
+            start = time.perf_counter()
+            result = self.pipeline.process_frame(frame)
+            if i >= self.warmup:
+                end_to_end.append(time.perf_counter() - start)
+
+        stages = {name: summarize(samples) for name, samples in timings.items()}
+        stages["end_to_end"] = summarize(end_to_end)
+        return {
+            "stages": stages,
+            "geometry": check_geometry(result, synthetic_frame),
+        }
+
+
+def check_geometry(result, synthetic_frame, tolerance_ratio=0.01):
+    """
+    Checks that the fitted line matches the pole the synthetic frame was generated with.
+
+    Args:
+        result (FrameResult): The pipeline output for the synthetic frame.
+        synthetic_frame (SyntheticFrame): The frame and its ground truth.
+        tolerance_ratio (float): Allowed endpoint error as a fraction of the frame width.
+
+    Returns:
+        dict: The expected and detected lines, the endpoint error and whether it passed.
+    """
+    width = synthetic_frame.image.shape[1]
+    expected = [float(v) for v in synthetic_frame.expected_line]
+    tolerance_px = tolerance_ratio * width
+
+    if result is None or result.fitted_line is None:
+        return {"expected_line": expected, "fitted_line": None, "max_error_px": None,
+                "tolerance_px": tolerance_px, "passed": False}
+
+    fitted = [float(v) for v in result.fitted_line]
+    error = max(abs(fitted[0] - expected[0]), abs(fitted[2] - expected[2]))
+    return {"expected_line": expected, "fitted_line": fitted, "max_error_px": error,
+            "tolerance_px": tolerance_px, "passed": error <= tolerance_px}
+
+
+def compare_to_baseline(report, baseline, max_regression=0.1):
+    """
+    Compares median stage latencies against a baseline report.
+
+    Returns:
+        list: (resolution, stage, baseline_p50_ms, current_p50_ms, ratio) for every stage
+              that got slower by more than max_regression.
+    """
+    regressions = []
+    for resolution, current in report["results"].items():
+        previous = baseline.get("results", {}).get(resolution)
+        if previous is None:
+            continue
+        for stage, stats in current["stages"].items():
+            previous_stats = previous["stages"].get(stage)
+            if previous_stats is None or previous_stats["p50_ms"] <= 0:
+                continue
+            ratio = stats["p50_ms"] / previous_stats["p50_ms"]
+            if ratio > 1.0 + max_regression:
+                regressions.append((resolution, stage, previous_stats["p50_ms"], stats["p50_ms"], ratio))
+    return regressions
+
+
+def print_report(report):
+    for resolution, data in report["results"].items():
+        print(f"\n== {resolution} ==")
+        print(f"{'stage':<30}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'fps':>10}")
+        for stage, stats in data["stages"].items():
+            print(f"{stage:<30}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}{stats['p90_ms']:>10.2f}"
+                  f"{stats['p99_ms']:>10.2f}{stats['throughput_fps']:>10.1f}")
+        geometry = data["geometry"]
+        status = "OK" if geometry["passed"] else "FAILED"
+        print(f"geometry check: {status} (expected {geometry['expected_line']}, "
+              f"fitted {geometry['fitted_line']}, tolerance {geometry['tolerance_px']:.1f}px)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic UAV frames.")
+    parser.add_argument("--resolutions", nargs="+", default=list(RESOLUTIONS), choices=list(RESOLUTIONS),
+                        help="Resolutions to benchmark.")
+    parser.add_argument("--iterations", type=int, default=30, help="Timed iterations per resolution.")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed warm-up iterations per resolution.")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to save the results as JSON.")
+    parser.add_argument("--baseline", default=None, help="A previous results file to compare against.")
+    parser.add_argument("--max_regression", type=float, default=0.1,
+                        help="Allowed slowdown of a stage's median latency relative to the baseline (0.1 = 10%%).")
+    args = parser.parse_args()
+
+    generator = SyntheticFrameGenerator(k1=CONFIG["fisheye_correction"]["k1"],
+                                        k2=CONFIG["fisheye_correction"]["k2"])
+    benchmark = StageBenchmark(CONFIG, iterations=args.iterations, warmup=args.warmup)
+
+    report = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "cv2_threads": cv2.getNumThreads(),
+            "iterations": args.iterations,
+        },
+        "results": {},
+    }
+    for resolution in args.resolutions:
+        width, height = RESOLUTIONS[resolution]
+        print(f"Generating {resolution} synthetic frame ({width}x{height})...")
+        report["results"][resolution] = benchmark.run_resolution(generator.generate(width, height))
+
+    print_report(report)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to: {args.output}")
+
+    failed = [resolution for resolution, data in report["results"].items() if not data["geometry"]["passed"]]
+    if failed:
+        print(f"Geometry check failed for: {', '.join(failed)}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.max_regression)
+        for resolution, stage, before, after, ratio in regressions:
+            print(f"Regression [{resolution}] {stage}: {before:.2f}ms -> {after:.2f}ms ({ratio:.2f}x)")
+        if not regressions:
+            print(f"No stage regressed by more than {args.max_regression:.0%} against {args.baseline}.")
+
+    if failed or regressions:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
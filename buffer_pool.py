@@ -0,0 +1,53 @@
+import numpy as np
+
+
+class BufferPool:
+    """
+    Owns the intermediate images of the pipeline so that steady-state processing
+    makes no large allocations.
+
+    Buffers are keyed by name, dtype and shape, so each resolution gets its own set.
+    A buffer can be requested with a larger capacity shape (e.g. the full frame) and a
+    smaller working shape (e.g. a band or crop of it); the returned array is then a view
+    of the top-left corner of the capacity buffer, which keeps the number of buffers
+    bounded when the working shape changes from frame to frame.
+
+    The contents of a buffer are overwritten the next time it is requested, so a
+    pool must not be shared between threads.
+    """
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, shape, dtype=np.uint8, capacity=None):
+        """
+        Returns a buffer of the given shape.
+
+        Args:
+            name (str): Name of the intermediate result (e.g. 'blur').
+            shape (tuple): Shape of the array needed.
+            dtype (numpy.dtype): Element type.
+            capacity (tuple): Shape to allocate, at least as large as shape in every dimension.
+                              Defaults to shape.
+
+        Returns:
+            numpy.ndarray: An uninitialized array (or view) of the requested shape.
+        """
+        shape = tuple(shape)
+        capacity = shape if capacity is None else tuple(capacity)
+        key = (name, np.dtype(dtype).str, capacity)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = np.empty(capacity, dtype=dtype)
+        if shape == capacity:
+            return buffer
+        return buffer[tuple(slice(0, n) for n in shape)]
+
+    @property
+    def nbytes(self):
+        """
+        Total size of the pooled buffers in bytes.
+        """
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def clear(self):
+        self._buffers.clear()
@@ -1,8 +1,21 @@
 # Configuration dictionary
 CONFIG = {
-    "fisheye_correction": {"enabled": True, "k1": 0.2, "k2": 0.13},
+    "input": {
+        "prefetch": 8, # Frames decoded ahead of processing (0 to decode on demand)
+        "decode_threads": 4, # Threads decoding image folders in parallel
+        "reduced_decode": False # Decode large JPEGs at 1/2, 1/4 or 1/8 scale instead of resizing after a full decode (changes the pixels slightly)
+    },
+    "fisheye_correction": {
+        "enabled": True,
+        "k1": 0.2,
+        "k2": 0.13,
+        "map_cache_size": 4, # Number of resolutions whose undistortion maps are kept in memory
+        "map_cache_dir": None, # Directory to persist undistortion maps as .npy files (None to disable)
+        "grayscale_first": False # Undistort only the gray image; remap the color frame only for output
+    },
     "preprocessing": {
         "grayscale": {"enabled": True},
+        "blur": {"downsampled": False}, # Blur at half resolution and scale back up: about twice as fast, up to 5 grey levels off (0.2 on average)
         "binary_threshold": {"enabled": True},
         "morphological_opening": {"enabled": True, "kernel_size": (3, 3)}
     },
@@ -13,6 +26,28 @@ CONFIG = {
         "max_line_gap": 30
     },
     "contour_detection": {"enabled": True},
+    "mask_cache": { # Persist the binary and edge masks, so reruns that only change contour selection skip preprocessing
+        "enabled": False,
+        "directory": "mask_cache",
+        "max_size_mb": 2048 # Least recently used frames are evicted beyond this size
+    },
+    "pyramid": { # Coarse-to-fine detection: threshold, contours and Hough on a downscaled image
+        "enabled": False,
+        "levels": 1, # Each level halves the resolution
+        "refine_margin": 16 # Pixels around the selected contour that are re-thresholded at full resolution
+    },
+    "tracking": { # Restrict detection to a band around the line predicted from previous frames
+        "enabled": False,
+        "band_width": 0.2, # Band width as a fraction of the frame width, around the predicted line
+        "full_search_interval": 30, # Search the whole frame at least every N frames
+        "velocity_smoothing": 0.5 # Weight of the newest frame in the constant-velocity estimate
+    },
+    "temporal_threshold": { # Reuse Otsu's threshold across frames while the brightness histogram is stable
+        "enabled": False,
+        "drift_tolerance": 0.05, # Histogram change (total variation, 0 to 1) that triggers a new Otsu threshold
+        "smoothing": 0.5, # Fraction of the way to a new threshold per frame (1 = jump to it at once)
+        "histogram_step": 4 # The drift histogram samples every Nth row and column
+    },
     "contour_selection": { # New section for contour selection parameters
         "enabled": True,
         "min_area": 1000,
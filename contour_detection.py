@@ -5,17 +5,18 @@ class ContourDetector:
     """
     Detects contours in a binary image.
     """
-    def detect(self, binary):
+    def detect(self, binary, offset=(0, 0)):
         """
         Finds external contours in a binary image.
 
         Args:
             binary (numpy.ndarray): The binary input image.
+            offset (tuple): (dx, dy) added to every contour point, e.g. when binary is a crop of the frame.
 
         Returns:
             list: A list of detected contours.
         """
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
         return contours
 
 class LineDetector:
@@ -39,6 +40,128 @@ class LineDetector:
                                 minLineLength=min_line_length, maxLineGap=max_line_gap)
         return lines
 
+class ContourFeatures:
+    """
+    Per-frame feature table for a list of contours, shared by ContourSelector and Drawer.
+
+    The cheap features (area and bounding box) are computed for all contours at once.
+    The approximated-polygon vertex count is expensive, so it is only computed on
+    demand for the contours that survive the cheaper gates, and cached.
+    """
+    DTYPE = np.dtype([("area", np.float64), ("x", np.int32), ("y", np.int32),
+                      ("w", np.int32), ("h", np.int32), ("aspect_ratio", np.float64),
+                      ("vertices", np.int32)])
+
+    def __init__(self, contours, table):
+        self.contours = contours
+        self.table = table  # Structured array with one row per contour (vertices is -1 until computed)
+
+    def __len__(self):
+        return len(self.table)
+
+    def vertex_counts(self, indices):
+        """
+        Returns the number of vertices of the approximated polygon of the given contours,
+        computing it only for those not seen before.
+
+        Args:
+            indices (numpy.ndarray): Indices of the contours.
+
+        Returns:
+            numpy.ndarray: The vertex counts, in the order of indices.
+        """
+        vertices = self.table["vertices"]
+        for i in indices[vertices[indices] < 0]:
+            contour = self.contours[i]
+            epsilon = 0.001 * cv2.arcLength(contour, True)
+            vertices[i] = len(cv2.approxPolyDP(contour, epsilon, True))
+        return vertices[indices]
+
+    def candidates(self, min_area, max_aspect_ratio, min_approx_vertices, max_approx_vertices,
+                   strict_area=False, span_height=None, span_tolerance=0, narrow_width=100, narrow_height=50):
+        """
+        Applies the contour gates, cheapest first, and returns the indices of the contours that pass.
+
+        Args:
+            min_area (float): Minimum contour area.
+            max_aspect_ratio (float): Maximum bounding-box aspect ratio (width/height).
+            min_approx_vertices (int): Contours whose approximated polygon has between
+                                       min_approx_vertices and max_approx_vertices vertices are discarded.
+            max_approx_vertices (int): See min_approx_vertices.
+            strict_area (bool): Require area > min_area instead of area >= min_area.
+            span_height (int): If set, only keep contours running from the top to the bottom of an
+                               image of this height.
+            span_tolerance (int): Pixel tolerance for the top-to-bottom check.
+            narrow_width (int): Contours narrower than this and taller than narrow_height are discarded.
+            narrow_height (int): See narrow_width.
+
+        Returns:
+            numpy.ndarray: Indices of the contours passing all gates, in contour order.
+        """
+        t = self.table
+        area = t["area"]
+        keep = area > min_area if strict_area else area >= min_area
+
+        # Discard narrow, tall shapes (from the original gating code)
+        keep &= ~((t["w"] < narrow_width) & (t["h"] > narrow_height))
+        keep &= t["aspect_ratio"] <= max_aspect_ratio
+
+        if span_height is not None:
+            keep &= (t["y"] <= span_tolerance) & (t["y"] + t["h"] >= span_height - span_tolerance)
+
+        # The vertex count is only computed for the contours that are still candidates
+        indices = np.flatnonzero(keep)
+        vertices = self.vertex_counts(indices)
+        return indices[(vertices < min_approx_vertices) | (vertices > max_approx_vertices)]
+
+
+class ContourAnalyzer:
+    """
+    Computes the ContourFeatures table for the contours of a frame.
+    """
+    def analyze(self, contours):
+        """
+        Computes area and bounding box of every contour in one batched NumPy pass.
+
+        The area is the shoelace formula used by cv2.contourArea and the bounding box
+        matches cv2.boundingRect for integer contours.
+
+        Args:
+            contours (list): Contours returned by cv2.findContours.
+
+        Returns:
+            ContourFeatures: The feature table.
+        """
+        table = np.zeros(len(contours), dtype=ContourFeatures.DTYPE)
+        table["vertices"] = -1
+        if len(contours) == 0:
+            return ContourFeatures(contours, table)
+
+        lengths = np.fromiter((len(c) for c in contours), dtype=np.intp, count=len(contours))
+        starts = np.zeros(len(contours), dtype=np.intp)
+        np.cumsum(lengths[:-1], out=starts[1:])
+
+        points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+        xs = points[:, 0]
+        ys = points[:, 1]
+
+        # Index of the next point of each point, wrapping around within its own contour
+        next_index = np.arange(1, len(points) + 1)
+        next_index[starts + lengths - 1] = starts
+        cross = xs * ys[next_index] - xs[next_index] * ys
+        table["area"] = np.abs(np.add.reduceat(cross, starts)) / 2.0
+
+        x_min = np.minimum.reduceat(xs, starts)
+        y_min = np.minimum.reduceat(ys, starts)
+        table["x"] = x_min
+        table["y"] = y_min
+        table["w"] = np.maximum.reduceat(xs, starts) - x_min + 1
+        table["h"] = np.maximum.reduceat(ys, starts) - y_min + 1
+        table["aspect_ratio"] = table["w"] / table["h"]
+
+        return ContourFeatures(contours, table)
+
+
 class ContourSelector:
     """
     Selects the 'best' contour from a collection based on specific criteria,
@@ -46,7 +169,7 @@ class ContourSelector:
     """
     def __init__(self, min_area=1000, max_aspect_ratio=5, min_height_ratio=0.8,
                  max_approx_vertices=6, min_approx_vertices=4,
-                 top_bottom_tolerance=10):
+                 top_bottom_tolerance=10, narrow_width=100, narrow_height=50):
         """
         Initializes the ContourSelector with filtering criteria.
 
@@ -57,6 +180,8 @@ class ContourSelector:
             max_approx_vertices (int): Maximum number of vertices in approximated polygon to discard.
             min_approx_vertices (int): Minimum number of vertices in approximated polygon to discard.
             top_bottom_tolerance (int): Pixel tolerance for a contour to be considered 'top-to-bottom'.
+            narrow_width (int): Contours narrower than this and taller than narrow_height are discarded.
+            narrow_height (int): See narrow_width.
         """
         self.min_area = min_area
         self.max_aspect_ratio = max_aspect_ratio
@@ -64,8 +189,10 @@ class ContourSelector:
         self.max_approx_vertices = max_approx_vertices
         self.min_approx_vertices = min_approx_vertices
         self.top_bottom_tolerance = top_bottom_tolerance
+        self.narrow_width = narrow_width
+        self.narrow_height = narrow_height
 
-    def select_and_process_contour(self, contours, image_height, image_width):
+    def select_and_process_contour(self, contours, image_height, image_width, features=None):
         """
         Selects the best contour based on criteria, fits a line to it, and extends the line.
 
@@ -80,56 +207,43 @@ class ContourSelector:
             contours (list): A list of contours detected by cv2.findContours.
             image_height (int): The height of the original image.
             image_width (int): The width of the original image.
+            features (ContourFeatures): Precomputed features of the contours (computed if None).
 
         Returns:
             tuple: (best_contour, fitted_line_points) where best_contour is the selected
                    contour and fitted_line_points is a tuple (x1, y1, x2, y2) representing
                    the extended line, or (None, None) if no suitable contour is found.
         """
-        candidate_contours = []
+        if features is None:
+            features = ContourAnalyzer().analyze(contours)
 
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area < self.min_area:
-                continue
+        # Gates ordered from cheapest to most expensive; the polygon approximation
+        # only runs on contours that already span the image from top to bottom
+        candidates = features.candidates(self.min_area, self.max_aspect_ratio,
+                                         self.min_approx_vertices, self.max_approx_vertices,
+                                         span_height=image_height,
+                                         span_tolerance=self.top_bottom_tolerance,
+                                         narrow_width=self.narrow_width,
+                                         narrow_height=self.narrow_height)
 
-            x, y, w_rect, h_rect = cv2.boundingRect(contour)
-
-            # Gate 1: Discard based on specific width/height ranges (from original code)
-            if w_rect < 100 and h_rect > 50:
-                continue
-
-            aspect_ratio = float(w_rect) / float(h_rect) if h_rect > 0 else 0
-
-            # Gate 2: Discard based on aspect ratio
-            if aspect_ratio > self.max_aspect_ratio:
-                continue
-
-            # Approximate the contour (used for vertex count gate)
-            epsilon = 0.001 * cv2.arcLength(contour, True)
-            approx = cv2.approxPolyDP(contour, epsilon, True)
-
-            # Gate 3: Discard by number of vertices in the approximated polygon
-            if self.min_approx_vertices <= len(approx) <= self.max_approx_vertices:
-                continue
-
-            # Check for top-to-bottom spanning
-            is_top_to_bottom = (y <= self.top_bottom_tolerance and
-                                (y + h_rect) >= (image_height - self.top_bottom_tolerance))
+        if len(candidates) == 0:
+            return None, None
 
-            if is_top_to_bottom:
-                candidate_contours.append((contour, w_rect)) # Store contour and its width
+        # Select the narrowest contour among candidates (the first one on ties)
+        best_contour = contours[candidates[np.argmin(features.table["w"][candidates])]]
 
-        if not candidate_contours:
-            return None, None
+        return best_contour, self.fit_line(best_contour, image_height, image_width)
 
-        # Select the narrowest contour among candidates
-        candidate_contours.sort(key=lambda x: x[1]) # Sort by width
-        best_contour = candidate_contours[0][0]
+    def fit_line(self, contour, image_height, image_width):
+        """
+        Fits a line to a contour and extends it to the top and bottom of the image.
 
+        Returns:
+            tuple: (x_top, y_top, x_bottom, y_bottom) of the extended line.
+        """
         # Fit a line to the best contour
         # [vx, vy, x, y] where (x,y) is a point on the line, (vx,vy) is a unit vector along the line
-        [vx, vy, x, y] = cv2.fitLine(best_contour, cv2.DIST_L2, 0, 0.01, 0.01)
+        [vx, vy, x, y] = cv2.fitLine(contour, cv2.DIST_L2, 0, 0.01, 0.01).ravel()
 
         # Extend the line to the top and bottom of the image
         # Handle vertical lines separately to avoid division by zero
@@ -149,6 +263,4 @@ class ContourSelector:
         x_top = max(0, min(image_width - 1, x_top))
         x_bottom = max(0, min(image_width - 1, x_bottom))
 
-        fitted_line_points = (x_top, y_top, x_bottom, y_bottom)
-
-        return best_contour, fitted_line_points
\ No newline at end of file
+        return (x_top, y_top, x_bottom, y_bottom)
\ No newline at end of file
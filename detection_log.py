@@ -0,0 +1,192 @@
+import os
+
+import cv2
+import numpy as np
+
+from pipeline import FrameResult
+
+MAGIC = b"UAVDLOG1"
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("record_size", "<u4"), ("segment_size", "<u4")])
+
+# One fixed-size record per processed frame. Missing values are flagged rather than encoded
+# in the values themselves; the timestamp is NaN for image folders.
+RECORD_DTYPE = np.dtype([
+    ("frame_number", "<i8"),
+    ("timestamp", "<f8"),
+    ("bbox", "<i4", (4,)),  # x, y, w, h of the selected contour
+    ("fitted_line", "<i4", (4,)),  # x1, y1, x2, y2
+    ("hough_offset", "<i8"),  # Index of the frame's first segment in the segment file
+    ("hough_count", "<i4"),
+    ("flags", "u1"),
+    ("degradation_level", "u1"),
+])
+SEGMENT_DTYPE = np.dtype("<i4")  # Hough segments are stored as rows of (x1, y1, x2, y2)
+
+HAS_CONTOUR = 1
+HAS_FITTED_LINE = 2
+HAS_HOUGH = 4  # Hough detection ran (the frame may still have no segments)
+
+
+def box_contour(bbox):
+    """
+    Returns the bounding box (x, y, w, h) of a contour as a 4-point contour, whose
+    cv2.boundingRect is the same box again.
+    """
+    x, y, w, h = (int(v) for v in bbox)
+    return np.array([[[x, y]], [[x + w - 1, y]], [[x + w - 1, y + h - 1]], [[x, y + h - 1]]], dtype=np.int32)
+
+
+def segment_path(path):
+    """
+    Path of the file holding the variable-length Hough section of a log.
+    """
+    return path + ".hough"
+
+
+class DetectionLogWriter:
+    """
+    Appends per-frame detections to a compact binary log.
+
+    The log consists of two append-only files: `path` holds a small header followed by
+    one RECORD_DTYPE record per frame, and `path.hough` holds the Hough segments of all
+    frames back to back, which each record points into with hough_offset/hough_count.
+    Segments are written before the record that references them, so a log cut short
+    (e.g. by a crash) is still readable up to its last complete record.
+    """
+    def __init__(self, output_path):
+        """
+        Args:
+            output_path (str): Path of the record file; the segments go to output_path + '.hough'.
+        """
+        self.output_path = output_path
+        self._records = open(output_path, "wb")
+        self._segments = open(segment_path(output_path), "wb")
+        self._records.write(np.array((MAGIC, RECORD_DTYPE.itemsize, 4 * SEGMENT_DTYPE.itemsize),
+                                     dtype=HEADER_DTYPE).tobytes())
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+        self._segment_count = 0
+
+    def write(self, result):
+        """
+        Appends the detections of a FrameResult.
+        """
+        record = self._record[0]
+        record["frame_number"] = result.frame_number if result.frame_number is not None else -1
+        record["timestamp"] = result.timestamp if result.timestamp is not None else np.nan
+        record["degradation_level"] = result.degradation_level
+        flags = 0
+
+        if result.best_contour is not None:
+            record["bbox"] = cv2.boundingRect(result.best_contour)
+            flags |= HAS_CONTOUR
+        else:
+            record["bbox"] = 0
+
+        if result.fitted_line is not None:
+            record["fitted_line"] = result.fitted_line
+            flags |= HAS_FITTED_LINE
+        else:
+            record["fitted_line"] = 0
+
+        record["hough_offset"] = self._segment_count
+        record["hough_count"] = 0
+        if result.hough_lines is not None:
+            flags |= HAS_HOUGH
+            segments = np.ascontiguousarray(np.asarray(result.hough_lines).reshape(-1, 4), dtype=SEGMENT_DTYPE)
+            self._segments.write(segments.tobytes())
+            record["hough_count"] = len(segments)
+            self._segment_count += len(segments)
+
+        record["flags"] = flags
+        self._records.write(self._record.tobytes())
+
+    def close(self):
+        self._segments.close()
+        self._records.close()
+
+
+class DetectionLog:
+    """
+    Reads a detection log written by DetectionLogWriter without loading it.
+
+    `records` is a read-only np.memmap structured array (RECORD_DTYPE) with one entry per
+    logged frame and `segments` an (N, 4) memmap of all Hough segments, so even logs of
+    hours of video open instantly and only the pages that are accessed are read.
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Path of the record file written by DetectionLogWriter.
+        """
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header[0]["magic"] != MAGIC:
+            raise ValueError(f"Not a detection log: {path}")
+        if header[0]["record_size"] != RECORD_DTYPE.itemsize:
+            raise ValueError(f"Unsupported detection log record size: {header[0]['record_size']}")
+
+        # A partially written last record (or segment) is ignored
+        num_records = (os.path.getsize(path) - HEADER_DTYPE.itemsize) // RECORD_DTYPE.itemsize
+        self.records = self._memmap(path, RECORD_DTYPE, (num_records,), HEADER_DTYPE.itemsize)
+        segments_file = segment_path(path)
+        num_segments = os.path.getsize(segments_file) // (4 * SEGMENT_DTYPE.itemsize)
+        self.segments = self._memmap(segments_file, SEGMENT_DTYPE, (num_segments, 4), 0)
+        self._frame_numbers = None
+
+    @staticmethod
+    def _memmap(path, dtype, shape, offset):
+        if shape[0] == 0:
+            return np.empty(shape, dtype=dtype)  # np.memmap cannot map an empty file
+        return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+    def __len__(self):
+        return len(self.records)
+
+    def find(self, frame_number):
+        """
+        Returns the index of the record of a frame, or None if the frame was not logged.
+        """
+        if self._frame_numbers is None:
+            # Frames are logged in order, so the column is sorted
+            self._frame_numbers = np.array(self.records["frame_number"])
+        index = int(np.searchsorted(self._frame_numbers, frame_number))
+        if index < len(self._frame_numbers) and self._frame_numbers[index] == frame_number:
+            return index
+        return None
+
+    def hough_lines(self, index):
+        """
+        Returns the Hough segments of a record in the (N, 1, 4) layout of cv2.HoughLinesP,
+        or None if Hough detection did not run for that frame.
+        """
+        record = self.records[index]
+        if not record["flags"] & HAS_HOUGH:
+            return None
+        start = int(record["hough_offset"])
+        return np.asarray(self.segments[start:start + int(record["hough_count"])]).reshape(-1, 1, 4)
+
+    def result(self, index, frame=None):
+        """
+        Rebuilds a FrameResult from a record.
+
+        The log keeps only the bounding box of the selected contour, so best_contour is
+        that box as a 4-point contour.
+        """
+        record = self.records[index]
+        flags = int(record["flags"])
+        timestamp = float(record["timestamp"])
+
+        best_contour = box_contour(record["bbox"]) if flags & HAS_CONTOUR else None
+        fitted_line = tuple(int(v) for v in record["fitted_line"]) if flags & HAS_FITTED_LINE else None
+
+        result = FrameResult(frame, int(record["frame_number"]), None if np.isnan(timestamp) else timestamp,
+                             hough_lines=self.hough_lines(index), best_contour=best_contour,
+                             fitted_line=fitted_line)
+        result.degradation_level = int(record["degradation_level"])
+        return result
+
+    def close(self):
+        # Dropping the references unmaps the files
+        self.records = None
+        self.segments = None
+        self._frame_numbers = None
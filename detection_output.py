@@ -0,0 +1,94 @@
+import csv
+import json
+import os
+
+from detection_log import DetectionLogWriter
+
+
+class DetectionWriter:
+    """
+    Writes the per-frame detections (Hough segments and the fitted contour line)
+    to a JSONL or CSV file.
+
+    JSONL: one object per frame. hough_lines is null when Hough detection did not run
+    (disabled in the config or switched off by the real-time mode) and [] when it ran
+    but found nothing.
+    CSV: one row per detected segment, with a 'kind' column set to 'hough' or
+    'fitted_line'. Frames where Hough detection did not run get a row with kind
+    'hough_skipped', and frames without any detection a single row with kind 'none',
+    so every processed frame appears in the file.
+
+    Both formats record the real-time degradation level of every frame, as the binary log does.
+    """
+    CSV_FIELDS = ["frame_number", "timestamp", "kind", "x1", "y1", "x2", "y2", "degradation_level"]
+
+    def __init__(self, output_path, output_format=None):
+        """
+        Args:
+            output_path (str): Path of the file to write.
+            output_format (str): 'jsonl' or 'csv'. Inferred from the file extension if None.
+        """
+        if output_format is None:
+            ext = os.path.splitext(output_path)[1].lower()
+            output_format = "csv" if ext == ".csv" else "jsonl"
+        if output_format not in ("jsonl", "csv"):
+            raise ValueError(f"Unsupported detection output format: {output_format}")
+
+        self.output_path = output_path
+        self.output_format = output_format
+        self._file = open(output_path, "w", newline="")
+        self._csv_writer = None
+        if output_format == "csv":
+            self._csv_writer = csv.writer(self._file)
+            self._csv_writer.writerow(self.CSV_FIELDS)
+
+    @staticmethod
+    def _segments(hough_lines):
+        if hough_lines is None:
+            return None
+        return [[int(v) for v in line[0]] for line in hough_lines]
+
+    def write(self, result):
+        """
+        Writes the detections of a FrameResult.
+        """
+        hough_segments = self._segments(result.hough_lines)
+        fitted_line = [int(v) for v in result.fitted_line] if result.fitted_line is not None else None
+
+        if self.output_format == "jsonl":
+            record = {
+                "frame_number": result.frame_number,
+                "timestamp": result.timestamp,
+                "hough_lines": hough_segments,
+                "fitted_line": fitted_line,
+                "degradation_level": result.degradation_level,
+            }
+            self._file.write(json.dumps(record) + "\n")
+            return
+
+        if hough_segments is None:
+            rows = [["hough_skipped", "", "", "", ""]]
+        else:
+            rows = [["hough"] + segment for segment in hough_segments]
+        if fitted_line is not None:
+            rows.append(["fitted_line"] + fitted_line)
+        if not rows:
+            rows.append(["none", "", "", "", ""])
+        for row in rows:
+            self._csv_writer.writerow([result.frame_number, result.timestamp] + row + [result.degradation_level])
+
+    def close(self):
+        self._file.close()
+
+
+def create_detection_writer(output_path, output_format=None):
+    """
+    Returns a DetectionWriter, or a DetectionLogWriter for the 'binary' format.
+
+    The format is inferred from the file extension if None ('.bin' is binary).
+    """
+    if output_format is None and os.path.splitext(output_path)[1].lower() == ".bin":
+        output_format = "binary"
+    if output_format == "binary":
+        return DetectionLogWriter(output_path)
+    return DetectionWriter(output_path, output_format)
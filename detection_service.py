@@ -0,0 +1,466 @@
+import argparse
+import os
+import socket
+import socketserver
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config import CONFIG
+from detection_log import HAS_CONTOUR, HAS_FITTED_LINE, HAS_HOUGH, box_contour
+from instrumentation import Instrumentation, StatsReporter
+from media_loader import MediaLoader
+from pipeline import DetectionPipeline, FrameResult, create_geometry_corrector
+
+DEFAULT_SOCKET_PATH = "/tmp/uav_line_detection.sock"
+
+REQUEST_MAGIC = b"UAVREQ01"
+RESPONSE_MAGIC = b"UAVRES01"
+
+# A request is this header followed by the raw frame (height * width * channels uint8 bytes, row-major)
+REQUEST_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("frame_number", "<i8"),  # Echoed back; -1 if unknown
+    ("timestamp", "<f8"),  # Echoed back; NaN if unknown
+    ("height", "<u4"),
+    ("width", "<u4"),
+    ("channels", "<u4"),
+    ("reserved", "<u4"),
+])
+
+# A response is this header followed by hough_count int32 rows of (x1, y1, x2, y2),
+# or by message_size bytes of UTF-8 error message if status is STATUS_ERROR
+RESPONSE_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("frame_number", "<i8"),
+    ("timestamp", "<f8"),
+    ("processing_ms", "<f8"),  # Time from the end of the request header to the response
+    ("bbox", "<i4", (4,)),  # x, y, w, h of the selected contour
+    ("fitted_line", "<i4", (4,)),  # x1, y1, x2, y2
+    ("hough_count", "<u4"),
+    ("message_size", "<u4"),
+    ("status", "u1"),
+    ("flags", "u1"),  # HAS_CONTOUR, HAS_FITTED_LINE and HAS_HOUGH, as in the detection log
+    ("reserved", "u1", (6,)),
+])
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# Largest frame a request may carry (8K); larger headers are rejected before anything is allocated
+MAX_FRAME_PIXELS = 7680 * 4320
+
+
+def _recv_exactly(sock, view):
+    """
+    Fills a memoryview from the socket. Returns False if the peer closed the connection first.
+    """
+    while len(view):
+        received = sock.recv_into(view)
+        if received == 0:
+            return False
+        view = view[received:]
+    return True
+
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.service.handle_connection(self.request)
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class DetectionService:
+    """
+    Long-running detection service on a local Unix socket.
+
+    Clients send raw frames (no image encoding) and get back the fitted line, the
+    bounding box of the selected contour and the Hough segments of each frame. Each
+    connection is served by its own thread and pipeline, since buffer pools and line
+    tracking are per pipeline, so one connection should carry one camera stream.
+    Pipelines are kept when their connection closes and handed to the next one, and
+    all of them share one GeometryCorrector, so the undistortion maps are built once
+    per resolution for the lifetime of the service.
+    """
+    def __init__(self, config, socket_path=DEFAULT_SOCKET_PATH, instrumentation=None, warm_sizes=(),
+                 max_frame_pixels=MAX_FRAME_PIXELS):
+        """
+        Args:
+            config (dict): The CONFIG dictionary.
+            socket_path (str): Path of the Unix socket. A stale socket file is replaced.
+            instrumentation (Instrumentation): Optional timers; every request is timed as the
+                                               'request' stage next to the pipeline stages.
+            warm_sizes (list): (width, height) frame sizes whose undistortion maps are built at startup.
+            max_frame_pixels (int): Largest height * width accepted in a request.
+        """
+        self.config = config
+        self.socket_path = socket_path
+        self.max_frame_pixels = max_frame_pixels
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        self.geometry_corrector = create_geometry_corrector(config)
+        if config["fisheye_correction"]["enabled"]:
+            for width, height in warm_sizes:
+                self.geometry_corrector.get_undistortion_maps(width, height)
+
+        self._idle_pipelines = [self._create_pipeline()]
+        self._lock = threading.Lock()
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self._server = _UnixServer(socket_path, _ConnectionHandler)
+        self._server.service = self
+
+    def _create_pipeline(self):
+        return DetectionPipeline(self.config, geometry_corrector=self.geometry_corrector,
+                                 instrumentation=self.instrumentation)
+
+    def _acquire_pipeline(self):
+        with self._lock:
+            pipeline = self._idle_pipelines.pop() if self._idle_pipelines else None
+        if pipeline is None:
+            return self._create_pipeline()
+        pipeline.reset()  # The previous connection may have been another camera
+        return pipeline
+
+    def _release_pipeline(self, pipeline):
+        with self._lock:
+            self._idle_pipelines.append(pipeline)
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def shutdown(self):
+        """
+        Stops serve_forever() (from another thread).
+        """
+        self._server.shutdown()
+
+    def close(self):
+        self._server.server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def handle_connection(self, sock):
+        """
+        Serves the requests of one connection until the client closes it.
+        """
+        instr = self.instrumentation
+        pipeline = self._acquire_pipeline()
+        instr.increment("connections")
+        header_buffer = bytearray(REQUEST_DTYPE.itemsize)
+        header = np.frombuffer(header_buffer, dtype=REQUEST_DTYPE)[0]  # A view, updated by every recv
+        frame_buffer = bytearray()
+        try:
+            while _recv_exactly(sock, memoryview(header_buffer)):
+                if header["magic"] != REQUEST_MAGIC:
+                    instr.increment("bad_requests")
+                    return  # Out of sync with the client; nothing after this can be trusted
+                start = time.perf_counter()
+                shape = (int(header["height"]), int(header["width"]), int(header["channels"]))
+                error = self._check_shape(shape)
+                if error is not None:
+                    # The payload is not read, so the stream cannot be resynchronized: report and close
+                    instr.increment("bad_requests")
+                    sock.sendall(self._error_response(header, error))
+                    return
+                size = shape[0] * shape[1] * shape[2]
+                if len(frame_buffer) < size:
+                    frame_buffer = bytearray(size)
+                if not _recv_exactly(sock, memoryview(frame_buffer)[:size]):
+                    return
+
+                response = np.zeros(1, dtype=RESPONSE_DTYPE)
+                response["magic"] = RESPONSE_MAGIC
+                response["frame_number"] = header["frame_number"]
+                response["timestamp"] = header["timestamp"]
+                try:
+                    frame = np.frombuffer(frame_buffer, dtype=np.uint8, count=size).reshape(shape)
+                    timestamp = float(header["timestamp"])
+                    result = pipeline.process_frame(frame, int(header["frame_number"]),
+                                                    None if np.isnan(timestamp) else timestamp)
+                    payload = self._fill_response(response[0], result)
+                except Exception as exc:
+                    instr.increment("failed_requests")
+                    payload = f"{type(exc).__name__}: {exc}".encode("utf-8")
+                    response["status"] = STATUS_ERROR
+                    response["message_size"] = len(payload)
+
+                seconds = time.perf_counter() - start
+                response["processing_ms"] = seconds * 1000.0
+                sock.sendall(response.tobytes() + payload)
+                instr.observe("request", seconds)
+        except (ConnectionError, BrokenPipeError):
+            pass  # The client went away mid-request
+        finally:
+            self._release_pipeline(pipeline)
+
+    def _check_shape(self, shape):
+        """
+        Returns why a request header's frame shape is rejected, or None if it is acceptable.
+        """
+        height, width, channels = shape
+        if channels != 3:
+            return f"Expected a BGR frame with 3 channels, got {channels}"
+        if height <= 0 or width <= 0:
+            return f"Invalid frame size {width}x{height}"
+        if height * width > self.max_frame_pixels:
+            return f"Frame size {width}x{height} exceeds the limit of {self.max_frame_pixels} pixels"
+        return None
+
+    @staticmethod
+    def _error_response(header, message):
+        """
+        Returns an error response to a request header, followed by the message.
+        """
+        payload = f"ValueError: {message}".encode("utf-8")
+        response = np.zeros(1, dtype=RESPONSE_DTYPE)
+        response["magic"] = RESPONSE_MAGIC
+        response["frame_number"] = header["frame_number"]
+        response["timestamp"] = header["timestamp"]
+        response["status"] = STATUS_ERROR
+        response["message_size"] = len(payload)
+        return response.tobytes() + payload
+
+    @staticmethod
+    def _fill_response(record, result):
+        """
+        Writes the detections of a FrameResult into a response record and returns the segment bytes.
+        """
+        flags = 0
+        if result.best_contour is not None:
+            record["bbox"] = cv2.boundingRect(result.best_contour)
+            flags |= HAS_CONTOUR
+        if result.fitted_line is not None:
+            record["fitted_line"] = result.fitted_line
+            flags |= HAS_FITTED_LINE
+        segments = b""
+        if result.hough_lines is not None:
+            flags |= HAS_HOUGH
+            lines = np.ascontiguousarray(np.asarray(result.hough_lines).reshape(-1, 4), dtype="<i4")
+            record["hough_count"] = len(lines)
+            segments = lines.tobytes()
+        record["flags"] = flags
+        return segments
+
+
+class DetectionClient:
+    """
+    Client of a DetectionService: sends frames over the Unix socket and waits for their detections.
+
+    One client is one connection (and one pipeline on the service), so use one client
+    per camera stream. A client is not thread-safe.
+    """
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, timeout=None):
+        """
+        Args:
+            socket_path (str): Path of the service's Unix socket.
+            timeout (float): Optional socket timeout in seconds.
+        """
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(socket_path)
+        self._request = np.zeros(1, dtype=REQUEST_DTYPE)
+        self._request["magic"] = REQUEST_MAGIC
+        self._response_buffer = bytearray(RESPONSE_DTYPE.itemsize)
+        self._response = np.frombuffer(self._response_buffer, dtype=RESPONSE_DTYPE)[0]
+
+    def detect(self, frame, frame_number=None, timestamp=None):
+        """
+        Runs detection on a BGR frame.
+
+        Returns:
+            tuple: (result, processing_ms): a FrameResult without the frame image (best_contour is
+                   the bounding box of the selected contour as a 4-point contour) and the time the
+                   service spent on the request.
+        """
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        height, width = frame.shape[:2]
+        request = self._request
+        request["frame_number"] = frame_number if frame_number is not None else -1
+        request["timestamp"] = timestamp if timestamp is not None else np.nan
+        request["height"], request["width"] = height, width
+        request["channels"] = frame.shape[2] if frame.ndim == 3 else 1
+        self._sock.sendall(request.tobytes())
+        try:
+            self._sock.sendall(frame.data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The service rejected the header and closed the connection; read its error response
+
+        if not _recv_exactly(self._sock, memoryview(self._response_buffer)):
+            raise ConnectionError("The detection service closed the connection")
+        response = self._response
+        if response["magic"] != RESPONSE_MAGIC:
+            raise ConnectionError("Malformed response from the detection service")
+        if response["status"] != STATUS_OK:
+            message = bytearray(int(response["message_size"]))
+            _recv_exactly(self._sock, memoryview(message))
+            raise RuntimeError(f"Detection service error: {message.decode('utf-8', 'replace')}")
+
+        flags = int(response["flags"])
+        hough_lines = None
+        if flags & HAS_HOUGH:
+            segments = np.empty((int(response["hough_count"]), 1, 4), dtype=np.int32)
+            if not _recv_exactly(self._sock, memoryview(segments).cast("B")):
+                raise ConnectionError("The detection service closed the connection")
+            hough_lines = segments
+        best_contour = box_contour(response["bbox"]) if flags & HAS_CONTOUR else None
+        fitted_line = tuple(int(v) for v in response["fitted_line"]) if flags & HAS_FITTED_LINE else None
+
+        result_timestamp = float(response["timestamp"])
+        result = FrameResult(None, int(response["frame_number"]),
+                             None if np.isnan(result_timestamp) else result_timestamp,
+                             hough_lines=hough_lines, best_contour=best_contour, fitted_line=fitted_line)
+        return result, float(response["processing_ms"])
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def load_test(socket_path, frames, num_clients=1, num_requests=None):
+    """
+    Drives a running service from several client threads and measures the round-trip latency.
+
+    The frames are decoded up front, so only the transfer and detection are measured.
+    Each client sends the frames in order, wrapping around, until it has sent
+    num_requests frames (one pass over the frames by default).
+
+    Returns:
+        dict: requests, seconds, requests_per_s, round-trip p50/p95/p99/max in ms and the
+              service's p50/p99 processing time in ms.
+    """
+    num_requests = num_requests or len(frames)
+    round_trips = [[] for _ in range(num_clients)]
+    processing = [[] for _ in range(num_clients)]
+    errors = []
+
+    def client_loop(index):
+        try:
+            with DetectionClient(socket_path) as client:
+                for i in range(num_requests):
+                    frame, frame_number, timestamp = frames[i % len(frames)]
+                    start = time.perf_counter()
+                    _, processing_ms = client.detect(frame, frame_number, timestamp)
+                    round_trips[index].append(time.perf_counter() - start)
+                    processing[index].append(processing_ms)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=client_loop, args=(i,), name=f"client-{i}") for i in range(num_clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+
+    round_trip_ms = np.concatenate([np.asarray(r, dtype=np.float64) for r in round_trips]) * 1000.0
+    processing_ms = np.concatenate([np.asarray(p, dtype=np.float64) for p in processing])
+    return {
+        "requests": len(round_trip_ms),
+        "seconds": seconds,
+        "requests_per_s": len(round_trip_ms) / seconds if seconds > 0 else 0.0,
+        "round_trip_p50_ms": float(np.percentile(round_trip_ms, 50)),
+        "round_trip_p95_ms": float(np.percentile(round_trip_ms, 95)),
+        "round_trip_p99_ms": float(np.percentile(round_trip_ms, 99)),
+        "round_trip_max_ms": float(round_trip_ms.max()),
+        "processing_p50_ms": float(np.percentile(processing_ms, 50)),
+        "processing_p99_ms": float(np.percentile(processing_ms, 99)),
+    }
+
+
+def parse_size(text):
+    """
+    Parses 'WIDTHxHEIGHT' into (width, height).
+    """
+    try:
+        width, height = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHT but got '{text}'")
+    return width, height
+
+
+def serve(args):
+    instrumentation = Instrumentation(enabled=True)
+    stats_reporter = StatsReporter(instrumentation, interval=args.stats_interval or 5.0,
+                                   print_stats=args.stats_interval is not None,
+                                   csv_path=args.stats_csv, prometheus_path=args.prometheus_file)
+    service = DetectionService(CONFIG, socket_path=args.socket, instrumentation=instrumentation,
+                               warm_sizes=args.warm)
+    server_thread = threading.Thread(target=service.serve_forever, name="service", daemon=True)
+    server_thread.start()
+    print(f"Detection service listening on {args.socket} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(stats_reporter.interval)
+            stats_reporter.report()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+        service.close()
+        stats_reporter.report()
+
+
+def run_load_test(args):
+    reduced_decode = CONFIG.get("input", {}).get("reduced_decode", False)
+    media_loader = MediaLoader(args.input_path, end_frame=args.max_frames, reduced_decode=reduced_decode)
+    try:
+        frames = list(media_loader.iter_frames())
+    finally:
+        media_loader.release()
+    if not frames:
+        raise SystemExit(f"No frames could be read from {args.input_path}")
+
+    print(f"Sending {args.requests or len(frames)} frames from each of {args.clients} clients to {args.socket}...")
+    stats = load_test(args.socket, frames, num_clients=args.clients, num_requests=args.requests)
+    print(f"{stats['requests']} requests in {stats['seconds']:.2f}s ({stats['requests_per_s']:.1f} requests/s)")
+    print(f"round trip: p50 {stats['round_trip_p50_ms']:.2f}ms, p95 {stats['round_trip_p95_ms']:.2f}ms, "
+          f"p99 {stats['round_trip_p99_ms']:.2f}ms, max {stats['round_trip_max_ms']:.2f}ms")
+    print(f"service processing: p50 {stats['processing_p50_ms']:.2f}ms, p99 {stats['processing_p99_ms']:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run detection as a local service, or load-test a running service.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Start the detection service.")
+    serve_parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Path of the Unix socket.")
+    serve_parser.add_argument("--warm", type=parse_size, nargs="*", default=[],
+                              help="Frame sizes (e.g. 1920x1080) whose undistortion maps are built at startup.")
+    serve_parser.add_argument("--stats_interval", type=float, default=None,
+                              help="Print a stats line with the request and stage latencies every N seconds.")
+    serve_parser.add_argument("--stats_csv", default=None,
+                              help="Append per-stage latency rows to this CSV file at every report.")
+    serve_parser.add_argument("--prometheus_file", default=None,
+                              help="Export metrics to this Prometheus text file at every report.")
+
+    client_parser = subparsers.add_parser("load_test", help="Send the frames of a clip to a running service.")
+    client_parser.add_argument("input_path", help="Path to the input video file or image directory.")
+    client_parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Path of the Unix socket.")
+    client_parser.add_argument("--clients", type=int, default=1, help="Number of concurrent client connections.")
+    client_parser.add_argument("--requests", type=int, default=None,
+                               help="Number of frames each client sends (defaults to one pass over the clip).")
+    client_parser.add_argument("--max_frames", type=int, default=100,
+                               help="Number of frames of the clip to load into memory.")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args)
+    else:
+        run_load_test(args)
+
+if __name__ == "__main__":
+    main()
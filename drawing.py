@@ -1,9 +1,21 @@
 import cv2
 import numpy as np
 
+from contour_detection import ContourAnalyzer
+
 class Drawer:
-    def __init__(self, neutral_color=(128, 128, 128)):
+    def __init__(self, neutral_color=(128, 128, 128), reuse_canvas=False):
+        """
+        Args:
+            neutral_color (tuple): Fill color of the upper half of the canvas.
+            reuse_canvas (bool): Keep one canvas per resolution and redraw into it for every
+                                 frame instead of allocating a new one. The previous canvas is
+                                 overwritten, so only enable this when it is consumed before
+                                 the next call to prepare_canvas.
+        """
         self.neutral_color = neutral_color
+        self.reuse_canvas = reuse_canvas
+        self._canvases = {}  # (height, width) -> (preallocated canvas, neutral upper half)
 
     def prepare_canvas(self, image):
         """
@@ -11,8 +23,67 @@ class Drawer:
         The canvas is twice the height of the original image.
         """
         h, w = image.shape[:2]
-        canvas = np.full((h * 2, w, 3), self.neutral_color, dtype=np.uint8)
-        canvas[h:, :] = image  # Place the original image at the bottom
+        if not self.reuse_canvas:
+            canvas = np.full((h * 2, w, 3), self.neutral_color, dtype=np.uint8)
+            canvas[h:, :] = image  # Place the original image at the bottom
+            return canvas
+
+        buffers = self._canvases.get((h, w))
+        if buffers is None:
+            # Broadcasting a color tuple is much slower than a plain copy, so keep a filled template
+            buffers = self._canvases[(h, w)] = (np.empty((h * 2, w, 3), dtype=np.uint8),
+                                                np.full((h, w, 3), self.neutral_color, dtype=np.uint8))
+        canvas, neutral = buffers
+        np.copyto(canvas[:h], neutral)  # Clear the overlays of the previous frame
+        np.copyto(canvas[h:], image)
+        return canvas
+
+    def plot_extrapolated_lines(self, canvas, lines, color=(0, 0, 255), thickness=4):
+        """
+        Vectorized plot_extrapolated_line for a whole array of lines.
+
+        The extrapolation of every line is computed in one NumPy pass and the segments
+        and their extensions are drawn with one cv2.polylines call each. The segments
+        are all drawn before the extensions, so where lines cross the overlap order can
+        differ from calling plot_extrapolated_line line by line.
+
+        Args:
+            canvas (numpy.ndarray): The double-height canvas.
+            lines (numpy.ndarray): Lines as returned by cv2.HoughLinesP, shape (N, 1, 4) or (N, 4).
+            color (tuple): Color of the segments.
+            thickness (int): Thickness of the segments.
+        """
+        lines = np.asarray(lines).reshape(-1, 4)
+        if len(lines) == 0:
+            return canvas
+
+        h, w = canvas.shape[:2]
+        original_height = h // 2  # Height of the original image
+
+        x1 = lines[:, 0].astype(np.int64)
+        x2 = lines[:, 2].astype(np.int64)
+        y1_shifted = lines[:, 1].astype(np.int64) + original_height
+        y2_shifted = lines[:, 3].astype(np.int64) + original_height
+
+        # Same maths as plot_extrapolated_line: x at the top (y=0) and bottom (y=h) of the canvas,
+        # falling back to x1 for vertical and horizontal lines, truncated towards zero
+        dx = x2 - x1
+        dy = y2_shifted - y1_shifted
+        sloped = (dx != 0) & (dy != 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(sloped, dy / np.where(dx != 0, dx, 1), 1.0)
+            intercept = y1_shifted - slope * x1
+            x_top = np.where(sloped, np.trunc((0 - intercept) / slope), x1)
+            x_bottom = np.where(sloped, np.trunc((h - intercept) / slope), x1)
+        x_top = np.clip(x_top, 0, w - 1).astype(np.int32)
+        x_bottom = np.clip(x_bottom, 0, w - 1).astype(np.int32)
+
+        segments = np.stack([x1, y1_shifted, x2, y2_shifted], axis=1).astype(np.int32).reshape(-1, 2, 2)
+        extensions = np.stack([x_bottom, np.full_like(x_bottom, h), x_top, np.zeros_like(x_top)],
+                              axis=1).reshape(-1, 2, 2)
+
+        cv2.polylines(canvas, list(segments), False, color, thickness)
+        cv2.polylines(canvas, list(extensions), False, (0, 200, 0), 1)
         return canvas
 
     def plot_extrapolated_line(self, canvas, x1, y1, x2, y2, color=(0, 0, 255), thickness=4):
@@ -57,36 +128,29 @@ class Drawer:
 
         return canvas
 
-    def draw_contours(self, canvas, contours, color=(255, 0, 0), thickness=2, aspect_ratio_threshold=1.5):
+    def draw_contours(self, canvas, contours, color=(255, 0, 0), thickness=2, aspect_ratio_threshold=1.5,
+                      features=None):
         """
         Draws contours on the shifted image in the bottom half of the canvas.
+
+        Contours are filtered with the same gates as ContourSelector (without the
+        top-to-bottom check). Pass the frame's ContourFeatures to reuse the features
+        already computed for selection.
         """
         h, w = canvas.shape[:2]
         original_height = h // 2  # Height of the original image
 
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > 1000:
-                x, y, w_rect, h_rect = cv2.boundingRect(contour)
-                if w_rect < 100 and h_rect > 50:
-                    continue
-                aspect_ratio = float(w_rect) / float(h_rect) if h_rect > 0 else 0
-                # Approximate the contour
-                epsilon = 0.001 * cv2.arcLength(contour, True)
-                approx = cv2.approxPolyDP(contour, epsilon, True)
-
-                if aspect_ratio > 5:
-                    continue
+        if features is None:
+            features = ContourAnalyzer().analyze(contours)
 
-                # filter by number of vertices in the approximated polygon
-                if (4 <= len(approx) <= 6):
-                    continue
+        indices = features.candidates(min_area=1000, max_aspect_ratio=5,
+                                      min_approx_vertices=4, max_approx_vertices=6,
+                                      strict_area=True)
+        if len(indices) == 0:
+            return canvas
 
-                # Adjust the contour's y-coordinates to account for the vertical shift
-                shifted_contour = contour.copy()
-                shifted_contour[:, :, 1] += original_height  # Shift y-coordinates downward
+        # Draw the kept contours in one call, shifted down to the image on the canvas
+        cv2.drawContours(canvas, [contours[i] for i in indices], -1, color, thickness,
+                         offset=(0, original_height))
 
-                # Draw the adjusted contour on the canvas
-                cv2.drawContours(canvas, [shifted_contour], -1, color, thickness)
-
-        return canvas
\ No newline at end of file
+        return canvas
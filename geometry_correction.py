@@ -1,22 +1,104 @@
+import os
+import threading
+from collections import OrderedDict
+
 import numpy as np
 import cv2
 
 class GeometryCorrector:
-    def __init__(self, k1=0.2, k2=0.13):
+    """
+    Corrects fisheye distortion using cached undistortion maps.
+
+    The maps only depend on (width, height, k1, k2), so they are built once per
+    resolution and kept in an LRU cache. If a cache directory is given, the maps
+    are also saved there as .npy files and memory-mapped by later processes.
+    """
+    def __init__(self, k1=0.2, k2=0.13, cache_size=4, cache_dir=None):
+        """
+        Args:
+            k1 (float): First radial distortion coefficient.
+            k2 (float): Second radial distortion coefficient.
+            cache_size (int): Maximum number of resolutions kept in memory.
+            cache_dir (str): Optional directory used to persist the maps on disk.
+        """
         self.k1 = k1
         self.k2 = k2
+        self.cache_size = max(1, cache_size)
+        self.cache_dir = cache_dir
+        self._map_cache = OrderedDict()
+        self._lock = threading.Lock()  # The cache may be shared by several worker threads
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_undistortion_maps(self, width, height):
+        """
+        Returns the (map1, map2) pair for the given resolution, building it if needed.
+        """
+        key = (width, height, self.k1, self.k2)
+        with self._lock:
+            maps = self._map_cache.get(key)
+            if maps is not None:
+                self._map_cache.move_to_end(key)
+                return maps
 
-    def apply_fisheye_correction(self, image):
+            maps = self._load_maps(key)
+            if maps is None:
+                maps = self._build_maps(width, height)
+                self._save_maps(key, maps)
+
+            self._map_cache[key] = maps
+            while len(self._map_cache) > self.cache_size:
+                self._map_cache.popitem(last=False)  # Evict the least recently used resolution
+            return maps
+
+    def apply_fisheye_correction(self, image, dst=None):
+        """
+        Undistorts an image. If dst is given (same shape and dtype as image), the result is written into it.
+        """
         h, w = image.shape[:2]
-        camera_matrix = np.array([[w / 2, 0, w / 2],
-                                  [0, h / 2, h / 2],
+        map1, map2 = self.get_undistortion_maps(w, h)
+
+        corrected_image = cv2.remap(image, map1, map2, interpolation=cv2.INTER_LINEAR, dst=dst)
+        return corrected_image
+
+    def _build_maps(self, width, height):
+        camera_matrix = np.array([[width / 2, 0, width / 2],
+                                  [0, height / 2, height / 2],
                                   [0, 0, 1]], dtype=np.float32)
 
         dist_coeffs = np.array([self.k1, self.k2, 0, 0], dtype=np.float32)
 
-        map1, map2 = cv2.fisheye.initUndistortRectifyMap(
-            camera_matrix, dist_coeffs, np.eye(3), camera_matrix, (w, h), cv2.CV_16SC2
+        return cv2.fisheye.initUndistortRectifyMap(
+            camera_matrix, dist_coeffs, np.eye(3), camera_matrix, (width, height), cv2.CV_16SC2
         )
 
-        corrected_image = cv2.remap(image, map1, map2, interpolation=cv2.INTER_LINEAR)
-        return corrected_image
\ No newline at end of file
+    def _map_paths(self, key):
+        width, height, k1, k2 = key
+        prefix = os.path.join(self.cache_dir, f"fisheye_{width}x{height}_k1_{k1!r}_k2_{k2!r}")
+        return prefix + "_map1.npy", prefix + "_map2.npy"
+
+    def _load_maps(self, key):
+        if not self.cache_dir:
+            return None
+
+        map1_path, map2_path = self._map_paths(key)
+        if not (os.path.exists(map1_path) and os.path.exists(map2_path)):
+            return None
+
+        try:
+            # Memory-mapped so a fresh process can start remapping without reading the whole file
+            return np.load(map1_path, mmap_mode="r"), np.load(map2_path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None  # Corrupt or partially written file, rebuild it
+
+    def _save_maps(self, key, maps):
+        if not self.cache_dir:
+            return
+
+        for path, array in zip(self._map_paths(key), maps):
+            # Write to a temporary file first so concurrent workers never read a partial map
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
@@ -0,0 +1,234 @@
+import csv
+import os
+import threading
+import time
+
+import numpy as np
+
+# Upper bounds (in seconds) of the cumulative latency histogram buckets exported to Prometheus
+HISTOGRAM_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class _NullTimer:
+    """
+    Context manager that does nothing, returned by a disabled Instrumentation.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.instrumentation.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _StageStats:
+    """
+    Latency statistics of one stage: a rolling window of recent samples for
+    percentiles and cumulative histogram buckets for Prometheus.
+    """
+    def __init__(self, window):
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.window = window
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(HISTOGRAM_BUCKETS)
+
+    def add(self, seconds):
+        self.samples[self.count % self.window] = seconds
+        self.count += 1
+        self.total += seconds
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+    def recent(self):
+        return self.samples[:min(self.count, self.window)]
+
+
+class Instrumentation:
+    """
+    Per-stage timers, counters and rolling latency histograms for the main loop.
+
+    Usage:
+        with instrumentation.stage("blur"):
+            blurred = preprocessor.apply_blur(gray)
+        instrumentation.increment("frames_processed")
+
+    When disabled, stage() returns a shared no-op context manager and the other
+    methods return immediately, so the hooks can stay in the hot path.
+    """
+    def __init__(self, enabled=True, window=1000):
+        """
+        Args:
+            enabled (bool): Whether to record anything.
+            window (int): Number of recent samples per stage used for percentiles.
+        """
+        self.enabled = enabled
+        self.window = window
+        self.start_time = time.time()
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()  # Worker threads may record concurrently
+
+    def stage(self, name):
+        """
+        Returns a context manager that records the time spent in the block under `name`.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def observe(self, name, seconds):
+        """
+        Records one latency sample for a stage.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = _StageStats(self.window)
+            stats.add(seconds)
+
+    def increment(self, name, amount=1):
+        """
+        Adds `amount` to a counter.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self):
+        """
+        Returns the current statistics.
+
+        Returns:
+            dict: {"counters": {name: value}, "stages": {name: {count, mean_ms, p50_ms, p95_ms, p99_ms,
+                  total_s, buckets}}}
+        """
+        with self._lock:
+            stages = {}
+            for name, stats in self._stages.items():
+                recent = stats.recent() * 1000.0
+                stages[name] = {
+                    "count": stats.count,
+                    "total_s": stats.total,
+                    "mean_ms": float(recent.mean()) if len(recent) else 0.0,
+                    "p50_ms": float(np.percentile(recent, 50)) if len(recent) else 0.0,
+                    "p95_ms": float(np.percentile(recent, 95)) if len(recent) else 0.0,
+                    "p99_ms": float(np.percentile(recent, 99)) if len(recent) else 0.0,
+                    "buckets": list(stats.buckets),
+                }
+            return {"counters": dict(self._counters), "stages": stages}
+
+
+class StatsReporter:
+    """
+    Periodically exports an Instrumentation snapshot as a stats line on stdout,
+    rows appended to a CSV file and a Prometheus text-format file.
+
+    The Prometheus file is rewritten atomically, so a local scraper (e.g. the
+    node_exporter textfile collector) never reads a partial file.
+    """
+    CSV_FIELDS = ["time", "elapsed_s", "stage", "count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"]
+
+    def __init__(self, instrumentation, interval=5.0, print_stats=True, csv_path=None,
+                 prometheus_path=None, metric_prefix="uav_line_detection"):
+        """
+        Args:
+            instrumentation (Instrumentation): The source of the statistics.
+            interval (float): Minimum number of seconds between two reports.
+            print_stats (bool): Whether to print a stats line at each report.
+            csv_path (str): Optional CSV file to append per-stage rows to.
+            prometheus_path (str): Optional Prometheus text file to rewrite at each report.
+            metric_prefix (str): Prefix of the exported metric names.
+        """
+        self.instrumentation = instrumentation
+        self.interval = interval
+        self.print_stats = print_stats
+        self.csv_path = csv_path
+        self.prometheus_path = prometheus_path
+        self.metric_prefix = metric_prefix
+        self._last_report = time.monotonic()
+
+        if self.csv_path and not os.path.exists(self.csv_path):
+            with open(self.csv_path, "w", newline="") as f:
+                csv.writer(f).writerow(self.CSV_FIELDS)
+
+    def maybe_report(self):
+        """
+        Reports if at least `interval` seconds passed since the last report. Cheap to call every frame.
+        """
+        if time.monotonic() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self):
+        self._last_report = time.monotonic()
+        snapshot = self.instrumentation.snapshot()
+        if self.print_stats:
+            print(self.format_line(snapshot))
+        if self.csv_path:
+            self._write_csv(snapshot)
+        if self.prometheus_path:
+            self._write_prometheus(snapshot)
+
+    def format_line(self, snapshot):
+        counters = snapshot["counters"]
+        elapsed = time.time() - self.instrumentation.start_time
+        frames = counters.get("frames_processed", 0)
+        fps = frames / elapsed if elapsed > 0 else 0.0
+        parts = [f"[stats] frames={frames} fps={fps:.1f}"]
+        parts += [f"{name}={value}" for name, value in counters.items() if name != "frames_processed"]
+        parts += [f"{name}={stats['p50_ms']:.1f}/{stats['p99_ms']:.1f}ms"
+                  for name, stats in snapshot["stages"].items()]
+        return " ".join(parts)
+
+    def _write_csv(self, snapshot):
+        now = time.strftime("%Y-%m-%dT%H:%M:%S")
+        elapsed = time.time() - self.instrumentation.start_time
+        with open(self.csv_path, "a", newline="") as f:
+            writer = csv.writer(f)
+            for name, stats in snapshot["stages"].items():
+                writer.writerow([now, f"{elapsed:.3f}", name, stats["count"], f"{stats['mean_ms']:.3f}",
+                                 f"{stats['p50_ms']:.3f}", f"{stats['p95_ms']:.3f}", f"{stats['p99_ms']:.3f}"])
+
+    def _write_prometheus(self, snapshot):
+        prefix = self.metric_prefix
+        lines = []
+        for name, value in snapshot["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+
+        if snapshot["stages"]:
+            metric = f"{prefix}_stage_seconds"
+            lines.append(f"# HELP {metric} Time spent in each pipeline stage.")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, stats in snapshot["stages"].items():
+                for bound, count in zip(HISTOGRAM_BUCKETS, stats["buckets"]):
+                    lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {stats["count"]}')
+                lines.append(f'{metric}_sum{{stage="{name}"}} {stats["total_s"]:.6f}')
+                lines.append(f'{metric}_count{{stage="{name}"}} {stats["count"]}')
+
+        tmp_path = f"{self.prometheus_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.prometheus_path)
@@ -6,11 +6,16 @@ import numpy as np # Added for general numpy operations if needed
 # Import classes from their respective files
 from config import CONFIG
 from media_loader import MediaLoader
-from geometry_correction import GeometryCorrector
-from preprocessing import Preprocessor, MorphologyProcessor # Preprocessor classs
-from contour_detection import ContourDetector, ContourSelector, LineDetector # ContourDetector and new ContourSelector
+from pipeline import DetectionPipeline
+from threaded_pipeline import PipelinedProcessor
+from detection_output import create_detection_writer
+from detection_log import DetectionLog
+from batch_runner import BatchRunner
+from instrumentation import Instrumentation, StatsReporter
+from realtime import RealtimeProcessor
+from output_sinks import BackgroundSink, ImageSequenceSink, RawFrameSink, VideoFileSink
+from multi_stream import MultiStreamProcessor, stream_output_path, tile_canvases
 
-from drawing import Drawer
 from visualization import Visualizer
 
 def main():
@@ -18,34 +23,77 @@ def main():
     parser.add_argument("input_path", help="Path to the input video file or image directory.")
     parser.add_argument("--output_dir", default="output", help="Directory to save output frames (if needed).")
     parser.add_argument("--save_video", action="store_true", help="Save the processed output as a video file.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of detection worker threads. Values above 1 enable the pipelined mode.")
+    parser.add_argument("--queue_size", type=int, default=None,
+                        help="Capacity of the queues between pipeline stages (defaults to 2 * workers).")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run without a display window. The canvas is only drawn if a video is being saved.")
+    parser.add_argument("--detections", default=None,
+                        help="Write the per-frame Hough segments and fitted line to this JSONL, CSV or binary (.bin) file.")
+    parser.add_argument("--detections_format", choices=["jsonl", "csv", "binary"], default=None,
+                        help="Format of the --detections file (inferred from its extension by default).")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Split the input across this many worker processes (headless batch mode, detections only).")
+    parser.add_argument("--stats_interval", type=float, default=None,
+                        help="Enable stage instrumentation and print a stats line every N seconds.")
+    parser.add_argument("--stats_csv", default=None,
+                        help="Enable stage instrumentation and append per-stage latency rows to this CSV file.")
+    parser.add_argument("--prometheus_file", default=None,
+                        help="Enable stage instrumentation and export metrics to this Prometheus text file.")
+    parser.add_argument("--realtime", action="store_true",
+                        help="Always process the freshest frame, skipping frames and degrading stages to meet --deadline_ms.")
+    parser.add_argument("--deadline_ms", type=float, default=33.0,
+                        help="Per-frame processing budget in real-time mode (milliseconds).")
+    parser.add_argument("--no_degrade", action="store_true",
+                        help="In real-time mode, only skip frames; never switch off Hough or lower the resolution.")
+    parser.add_argument("--pace", action="store_true",
+                        help="In real-time mode, read video files at their frame rate as if they were a live feed.")
+    parser.add_argument("--replay", default=None,
+                        help="Redraw the detections from this binary detection log onto the input instead of running detection.")
+    parser.add_argument("--save_frames", default=None,
+                        help="Write every processed frame as a numbered image into this directory.")
+    parser.add_argument("--frames_format", choices=["png", "jpg"], default="png",
+                        help="Image format of --save_frames.")
+    parser.add_argument("--save_raw", default=None,
+                        help="Dump the processed frames uncompressed to this file, for lossless encoding later.")
+    parser.add_argument("--sink_queue_size", type=int, default=8,
+                        help="Capacity of the queue in front of the background video and raw-frame writers.")
+    parser.add_argument("--streams", nargs="+", default=None,
+                        help="Further camera streams to process together with input_path, synchronized by timestamp.")
+    parser.add_argument("--sync_tolerance_ms", type=float, default=None,
+                        help="Maximum timestamp difference between synchronized frames of --streams "
+                             "(defaults to half a frame interval).")
     args = parser.parse_args()
 
     os.makedirs(args.output_dir, exist_ok=True)
 
+    if args.streams:
+        run_multi_stream(args)
+        return
+    if args.processes > 1 and not args.replay:
+        run_batch(args)
+        return
+
     # Initialize components
-    media_loader = MediaLoader(args.input_path)
-    geometry_corrector = GeometryCorrector(k1=CONFIG["fisheye_correction"]["k1"],
-                                         k2=CONFIG["fisheye_correction"]["k2"])
-    preprocessor = Preprocessor()
-    morphology_processor = MorphologyProcessor(kernel_size=CONFIG["preprocessing"]["morphological_opening"]["kernel_size"])
-    line_detector = LineDetector()
-    
-    # Initialize ContourDetector and the new ContourSelector
-    contour_detector = ContourDetector()
-    contour_selector = ContourSelector(
-        min_area=CONFIG["contour_selection"]["min_area"],
-        max_aspect_ratio=CONFIG["contour_selection"]["max_aspect_ratio"],
-        min_height_ratio=CONFIG["contour_selection"]["min_height_ratio"],
-        max_approx_vertices=CONFIG["contour_selection"]["max_approx_vertices"],
-        min_approx_vertices=CONFIG["contour_selection"]["min_approx_vertices"],
-        top_bottom_tolerance=CONFIG["contour_selection"]["top_bottom_tolerance"]
-    )
-
-    drawer = Drawer(neutral_color=CONFIG["drawing"].get("neutral_color", (128, 128, 128)))
-    visualizer = Visualizer()
-
-    # Initialize video writer if save_video is True and input is a video
-    video_writer = None
+    media_loader = MediaLoader(args.input_path, reduced_decode=CONFIG.get("input", {}).get("reduced_decode", False))
+    visualizer = None if args.headless else Visualizer()
+    detection_writer = create_detection_writer(args.detections, args.detections_format) if args.detections else None
+
+    # Instrumentation is only enabled when one of its outputs was requested
+    instrumentation_enabled = any(v is not None for v in (args.stats_interval, args.stats_csv, args.prometheus_file))
+    instrumentation = Instrumentation(enabled=instrumentation_enabled)
+    stats_reporter = None
+    if instrumentation_enabled:
+        stats_reporter = StatsReporter(instrumentation,
+                                       interval=args.stats_interval or 5.0,
+                                       print_stats=args.stats_interval is not None,
+                                       csv_path=args.stats_csv,
+                                       prometheus_path=args.prometheus_file)
+
+    # Output sinks for the processed frames. Video encoding and the raw dump run on
+    # encoder threads behind a bounded queue; images are written from a thread pool
+    sinks = []
     if args.save_video and media_loader.is_video:
         input_filename = os.path.basename(args.input_path)
         name, ext = os.path.splitext(input_filename)
@@ -57,117 +105,71 @@ def main():
             print(f"Warning: Invalid FPS in input video, setting FPS to {fps}")
         frame_width = int(media_loader.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         frame_height = int(media_loader.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fourcc = cv2.VideoWriter_fourcc(*'XVID')  # Try 'MJPG' or 'AVC1' if 'XVID' doesn't work
-        video_writer = cv2.VideoWriter(output_video_path, fourcc, fps, (frame_width, frame_height))
+        video_sink = VideoFileSink(output_video_path, fps, (frame_width, frame_height), fourcc="XVID")
+        sinks.append(BackgroundSink(video_sink, queue_size=args.sink_queue_size, instrumentation=instrumentation))
         print(f"Saving processed video to: {output_video_path} with FPS: {fps} and dimensions: ({frame_width}, {frame_height})")
     elif args.save_video and not media_loader.is_video:
         print("Warning: --save_video is enabled, but the input is not a video. No video will be saved.")
+    if args.save_frames:
+        sinks.append(ImageSequenceSink(args.save_frames, extension="." + args.frames_format))
+    if args.save_raw:
+        sinks.append(BackgroundSink(RawFrameSink(args.save_raw), queue_size=args.sink_queue_size,
+                                    instrumentation=instrumentation, stage_name="raw_dump"))
 
-    while True:
-        frame, frame_number, timestamp = media_loader.get_next_frame()
+    # In headless mode the canvas is only needed for the output sinks
+    render = visualizer is not None or bool(sinks)
 
-        if frame is None:
-            break
+    # Decode, detection and drawing either run on this thread or in the pipelined mode,
+    # which returns the results in frame order either way
+    if CONFIG.get("mask_cache", {}).get("enabled", False) and (args.realtime or args.workers > 1):
+        print("Warning: the mask cache is only used in the sequential and --processes modes.")
+
+    realtime_processor = None
+    detection_log = None
+    if args.replay:
+        # Only fisheye correction and drawing run; the detections come from the log
+        detection_log = DetectionLog(args.replay)
+        results = DetectionPipeline(CONFIG, instrumentation=instrumentation).replay(media_loader, detection_log)
+    elif args.realtime:
+        realtime_processor = RealtimeProcessor(CONFIG, deadline_ms=args.deadline_ms, degrade=not args.no_degrade,
+                                               pace=args.pace, render=render, instrumentation=instrumentation)
+        results = realtime_processor.run(media_loader)
+    elif args.workers > 1:
+        if CONFIG.get("tracking", {}).get("enabled", False):
+            print("Warning: tracking needs frames in order and is disabled with --workers > 1.")
+        processor = PipelinedProcessor(CONFIG, num_workers=args.workers, queue_size=args.queue_size,
+                                       render=render, instrumentation=instrumentation)
+        results = processor.run(media_loader)
+    else:
+        results = DetectionPipeline(CONFIG, instrumentation=instrumentation,
+                                    use_mask_cache=True).run(media_loader, render=render)
+
+    for result in results:
+        canvas = result.canvas
+
+        if stats_reporter is not None:
+            stats_reporter.maybe_report()
 
-        # Get frame dimensions for contour selection
-        frame_height, frame_width = frame.shape[:2]
-
-        # Apply fisheye correction
-        if CONFIG["fisheye_correction"]["enabled"]:
-            frame = geometry_corrector.apply_fisheye_correction(frame)
-
-        # Preprocessing steps
-        gray = preprocessor.convert_to_grayscale(frame) if CONFIG["preprocessing"]["grayscale"]["enabled"] else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-        binary = gray
-        if CONFIG["preprocessing"]["binary_threshold"]["enabled"]:
-            blur_image = preprocessor.apply_blur(gray)
-            binary = preprocessor.apply_binary_threshold(blur_image)
-
-        if CONFIG["preprocessing"]["morphological_opening"]["enabled"]:
-            binary = morphology_processor.apply_morphological_opening(binary)
-
-        # Edge detection
-        edges = cv2.Canny(binary, 30, 100)
-
-        # Detect lines using Hough Transform
-        hough_lines = None
-        if CONFIG["line_detection"]["enabled"]:
-            hough_lines = line_detector.detect(edges,
-                                             threshold=CONFIG["line_detection"]["threshold"],
-                                             min_line_length=CONFIG["line_detection"]["min_line_length"],
-                                             max_line_gap=CONFIG["line_detection"]["max_line_gap"])
-
-        # Detect and select the best contour
-        all_contours = None
-        best_contour = None
-        fitted_line_from_contour = None
-
-        if CONFIG["contour_detection"]["enabled"]:
-            all_contours = contour_detector.detect(binary)
-            if all_contours: # Only try to select if contours were found
-                best_contour, fitted_line_from_contour = contour_selector.select_and_process_contour(
-                    all_contours, frame_height, frame_width
-                )
-
-        # Prepare canvas with extra space above the image
-        canvas = drawer.prepare_canvas(frame)
-
-        # Draw detected elements
-        # Draw Hough lines if enabled
-        if CONFIG["drawing"]["lines"]["enabled"] and hough_lines is not None:
-            for line in hough_lines:
-                x1, y1, x2, y2 = line[0]
-                canvas = drawer.plot_extrapolated_line(
-                    canvas, x1, y1, x2, y2,
-                    color=CONFIG["drawing"]["lines"]["color"],
-                    thickness=CONFIG["drawing"]["lines"]["thickness"]
-                )
-
-        # Draw the selected contour and its fitted line if found
-        if CONFIG["drawing"]["contours"]["enabled"] and best_contour is not None:
-            # Draw the selected contour
-            # Adjust the contour's y-coordinates to account for the vertical shift on canvas
-            original_height_on_canvas = canvas.shape[0] // 2
-            shifted_best_contour = best_contour.copy()
-            shifted_best_contour[:, :, 1] += original_height_on_canvas
-            cv2.drawContours(canvas, [shifted_best_contour], -1, 
-                             CONFIG["drawing"]["contours"]["color"], 
-                             CONFIG["drawing"]["contours"]["thickness"])
-
-            # Draw the fitted line from the contour
-            if fitted_line_from_contour is not None:
-                x1, y1, x2, y2 = fitted_line_from_contour
-                # Since the fitted line is calculated for the original frame dimensions,
-                # we need to adjust its y-coordinates for the canvas display.
-                canvas = drawer.plot_extrapolated_line(
-                    canvas, x1, y1, x2, y2,
-                    color=CONFIG["drawing"]["contour_fitted_line"]["color"], # Use a distinct color for fitted line
-                    thickness=CONFIG["drawing"]["contour_fitted_line"]["thickness"]
-                )
-        
-        # Save the processed frame (original size with overlays) to the video
-        if video_writer is not None:
+        if detection_writer is not None:
+            detection_writer.write(result)
+
+        # Save the processed frame (original size with overlays) to the sinks
+        if sinks:
             # The canvas has double the height, we only want the original frame area with overlays
-            h_original_frame = frame.shape[0] # This is the original frame height
-            processed_frame_for_video = canvas[h_original_frame:, :] # Get the bottom half of the canvas
-            
-            # Ensure the frame being written matches the dimensions initialized for video_writer
-            # If the original frame was resized by MediaLoader, the video_writer should match that size.
-            # Here, we assume frame_width and frame_height from media_loader.cap.get() are correct.
-            if processed_frame_for_video.shape[1] != frame_width or processed_frame_for_video.shape[0] != frame_height:
-                # This case should ideally not happen if MediaLoader's resizing is consistent
-                # with initial video_writer dimensions, but adding a resize as a safeguard.
-                processed_frame_for_video = cv2.resize(processed_frame_for_video, (frame_width, frame_height))
-            
-            video_writer.write(processed_frame_for_video)
+            processed_frame = canvas[canvas.shape[0] // 2:, :] # Get the bottom half of the canvas
+            with instrumentation.stage("output"):
+                for sink in sinks:
+                    sink.write(processed_frame, result.frame_number)
 
+        if visualizer is None:
+            continue
 
         # Display the result
-        visualizer.display(canvas, frame_number, timestamp)
+        with instrumentation.stage("display"):
+            visualizer.display(canvas, result.frame_number, result.timestamp)
 
-        # Check for exit condition
-        key = visualizer.wait_key(10)
+            # Check for exit condition
+            key = visualizer.wait_key(10)
         if key & 0xFF == ord('q') or key == 27:
             break
 
@@ -175,12 +177,128 @@ def main():
         if not media_loader.is_video:
             cv2.waitKey(0)
 
+    # Stop the worker threads (if any) before releasing the input
+    results.close()
+
+    if stats_reporter is not None:
+        stats_reporter.report()
+    if realtime_processor is not None:
+        print(realtime_processor.summary())
+
     # Cleanup
     media_loader.release()
-    cv2.destroyAllWindows()
-    if video_writer is not None:
-        video_writer.release()
-        print("Processed video saved successfully.")
+    if detection_log is not None:
+        detection_log.close()
+    if visualizer is not None:
+        cv2.destroyAllWindows()
+    if detection_writer is not None:
+        detection_writer.close()
+        print(f"Detections saved to: {args.detections}")
+    for sink in sinks:
+        sink.close()
+    if sinks:
+        print("Processed frames saved successfully.")
+
+def run_batch(args):
+    """
+    Processes the input on a process pool and writes the detections in frame order.
+    """
+    if args.save_video or args.save_frames or args.save_raw or not args.headless:
+        print("Warning: --processes only produces detections; no window is shown and no video is saved.")
+    if not args.detections:
+        print("Warning: --detections is not set, the results will only be summarised.")
+
+    detection_writer = create_detection_writer(args.detections, args.detections_format) if args.detections else None
+    batch_runner = BatchRunner(CONFIG, num_processes=args.processes)
+
+    frames_processed = 0
+    frames_with_line = 0
+    for result in batch_runner.run(args.input_path):
+        frames_processed += 1
+        if result.fitted_line is not None:
+            frames_with_line += 1
+        if detection_writer is not None:
+            detection_writer.write(result)
+
+    if detection_writer is not None:
+        detection_writer.close()
+        print(f"Detections saved to: {args.detections}")
+    print(f"Processed {frames_processed} frames ({frames_with_line} with a fitted line).")
+
+def run_multi_stream(args):
+    """
+    Processes input_path and --streams together in one process, one batch of synchronized frames at a time.
+    """
+    if args.save_video or args.save_frames or args.save_raw or args.replay or args.realtime or args.processes > 1:
+        print("Warning: --streams only produces detections and a display; the other output and mode options are ignored.")
+    if CONFIG.get("mask_cache", {}).get("enabled", False):
+        print("Warning: the mask cache is not used with --streams.")
+
+    input_paths = [args.input_path] + args.streams
+    reduced_decode = CONFIG.get("input", {}).get("reduced_decode", False)
+    media_loaders = [MediaLoader(path, reduced_decode=reduced_decode) for path in input_paths]
+    visualizer = None if args.headless else Visualizer()
+    detection_writers = []
+    if args.detections:
+        detection_writers = [create_detection_writer(stream_output_path(args.detections, i), args.detections_format)
+                             for i in range(len(input_paths))]
+
+    instrumentation_enabled = any(v is not None for v in (args.stats_interval, args.stats_csv, args.prometheus_file))
+    instrumentation = Instrumentation(enabled=instrumentation_enabled)
+    stats_reporter = None
+    if instrumentation_enabled:
+        stats_reporter = StatsReporter(instrumentation,
+                                       interval=args.stats_interval or 5.0,
+                                       print_stats=args.stats_interval is not None,
+                                       csv_path=args.stats_csv,
+                                       prometheus_path=args.prometheus_file)
+
+    sync_tolerance = args.sync_tolerance_ms / 1000.0 if args.sync_tolerance_ms is not None else None
+    processor = MultiStreamProcessor(CONFIG, num_threads=args.workers if args.workers > 1 else None,
+                                     sync_tolerance=sync_tolerance, render=visualizer is not None,
+                                     instrumentation=instrumentation)
+    groups = processor.run(media_loaders)
+
+    groups_processed = 0
+    frames_with_line = [0] * len(input_paths)
+    for group in groups:
+        groups_processed += 1
+        if stats_reporter is not None:
+            stats_reporter.maybe_report()
+
+        for i, result in enumerate(group.results):
+            if result is None:
+                continue
+            if result.fitted_line is not None:
+                frames_with_line[i] += 1
+            if detection_writers:
+                detection_writers[i].write(result)
+
+        if visualizer is None:
+            continue
+
+        # Show the canvases of all streams side by side
+        with instrumentation.stage("display"):
+            mosaic = tile_canvases([result.canvas for result in group.results if result is not None])
+            visualizer.display(mosaic, groups_processed, group.clock)
+            key = visualizer.wait_key(10)
+        if key & 0xFF == ord('q') or key == 27:
+            break
+
+    # Stop the decode threads before releasing the inputs
+    groups.close()
+
+    if stats_reporter is not None:
+        stats_reporter.report()
+    for media_loader in media_loaders:
+        media_loader.release()
+    if visualizer is not None:
+        cv2.destroyAllWindows()
+    for i, detection_writer in enumerate(detection_writers):
+        detection_writer.close()
+        print(f"Detections of {input_paths[i]} saved to: {stream_output_path(args.detections, i)}")
+    print(f"Processed {groups_processed} synchronized frame groups "
+          f"({', '.join(str(n) for n in frames_with_line)} frames with a fitted line per stream).")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# CONFIG sections that change the masks; a change in any of them starts a new cache
+MASK_CONFIG_SECTIONS = ("input", "fisheye_correction", "preprocessing")
+
+# Eviction frees the cache down to this fraction of max_bytes; the rest is shared out between
+# the processes writing to the directory, which each rescan it once they have written their share
+EVICTION_TARGET = 0.9
+
+
+def input_identity(input_path):
+    """
+    Returns a string that changes whenever the input changes: the real path with the
+    size and modification time of the video file, or of every image in the folder.
+    """
+    path = os.path.realpath(input_path)
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return f"{path}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    entries = []
+    for entry in sorted(os.scandir(path), key=lambda e: e.name):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append(f"{entry.name}|{stat.st_size}|{stat.st_mtime_ns}")
+    return path + "|" + ";".join(entries)
+
+
+def config_fingerprint(config):
+    """
+    Hashes the CONFIG sections that the binary and edge masks depend on.
+    """
+    sections = {name: config.get(name) for name in MASK_CONFIG_SECTIONS}
+    # Drop settings that do not change the pixels
+    sections["input"] = {"reduced_decode": (sections["input"] or {}).get("reduced_decode", False)}
+    fisheye = dict(sections["fisheye_correction"] or {})
+    fisheye.pop("map_cache_size", None)
+    fisheye.pop("map_cache_dir", None)
+    sections["fisheye_correction"] = fisheye
+    text = json.dumps(sections, sort_keys=True, default=repr)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class MaskCache:
+    """
+    Persistent on-disk cache of the binary and edge masks of processed frames.
+
+    Each frame is stored in its own file, keyed by the identity of the input, the
+    frame number and a fingerprint of the config sections the masks depend on. The
+    masks only hold 0 and 255, so they are stored bit-packed (8 pixels per byte).
+    When the cache grows beyond max_bytes, the least recently used frames are evicted.
+    The cache can be shared by several threads and processes: the recency of a frame is
+    its file modification time, and each process rescans the directory before evicting
+    and whenever it has written its share of the headroom above EVICTION_TARGET, so the
+    limit holds for the files of every process and a frame another process has just
+    used is not evicted.
+    """
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3, num_processes=1):
+        """
+        Args:
+            cache_dir (str): Directory of the cache files (created if needed).
+            max_bytes (int): Maximum total size of the cache files.
+            num_processes (int): Number of processes writing to the directory at the same time.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.num_processes = num_processes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        # Least recently used first, as recorded by the file modification times
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Evicted by another process
+                entries.append((stat.st_mtime_ns, entry.path, stat.st_size))
+        self._entries = OrderedDict((path, size) for _, path, size in sorted(entries))
+        self._total_bytes = sum(self._entries.values())
+        self._written_bytes = 0  # Since the scan
+
+    @staticmethod
+    def _touch(path):
+        # The high resolution clock keeps frames used in quick succession in order, which
+        # the coarse file system clock would not
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def namespace(self, input_path, config):
+        """
+        Returns the key prefix of the frames of an input processed with a config.
+        """
+        identity = hashlib.sha1(input_identity(input_path).encode("utf-8")).hexdigest()[:16]
+        return f"{identity}_{config_fingerprint(config)}"
+
+    def _path(self, namespace, frame_number):
+        return os.path.join(self.cache_dir, f"{namespace}_{frame_number:08d}.npz")
+
+    def contains(self, namespace, frame_number):
+        return self._path(namespace, frame_number) in self._entries
+
+    def get(self, namespace, frame_number, need_edges=False):
+        """
+        Returns (binary, edges, timestamp) for a frame, or None if it is not cached.
+        edges is None if it was not stored; with need_edges such an entry counts as a miss.
+        """
+        path = self._path(namespace, frame_number)
+        entry = None
+        try:
+            with np.load(path) as data:
+                if not need_edges or "edges" in data.files:
+                    shape = tuple(data["shape"])
+                    edges = self._unpack(data["edges"], shape) if "edges" in data.files else None
+                    entry = (self._unpack(data["binary"], shape), edges, float(data["timestamp"]))
+        except (OSError, ValueError, KeyError):
+            pass  # Missing, evicted by another process, or a corrupt file
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        try:
+            self._touch(path)  # Keeps the LRU order across runs and processes
+        except OSError:
+            pass
+        binary, edges, timestamp = entry
+        return binary, edges, None if np.isnan(timestamp) else timestamp
+
+    def put(self, namespace, frame_number, binary, edges=None, timestamp=None):
+        """
+        Stores the masks of a frame, then evicts old frames if the cache is too large.
+        """
+        path = self._path(namespace, frame_number)
+        arrays = {"shape": np.array(binary.shape), "binary": np.packbits(binary > 0),
+                  "timestamp": np.array(np.nan if timestamp is None else timestamp)}
+        if edges is not None:
+            arrays["edges"] = np.packbits(edges > 0)
+
+        # Write to a temporary file first so other readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        self._touch(path)
+        size = os.path.getsize(path)
+
+        evicted = []
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            self._written_bytes += size
+            headroom = (1 - EVICTION_TARGET) * self.max_bytes / max(1, self.num_processes)
+            if self._total_bytes > self.max_bytes or self._written_bytes >= headroom:
+                # Other processes may have added, used or evicted frames since the last scan
+                self._scan()
+            while self._total_bytes > EVICTION_TARGET * self.max_bytes and len(self._entries) > 1:
+                old_path, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _unpack(packed, shape):
+        bits = np.unpackbits(packed, count=int(np.prod(shape))).reshape(shape)
+        return bits * np.uint8(255)
@@ -1,18 +1,129 @@
 import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 
+# Images larger than this are scaled down to TARGET_HEIGHT
+TARGET_HEIGHT = 500
+MAX_WIDTH = 800
+
+# JPEG decoders can scale by these factors during decoding, which is much cheaper than a full decode
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                        (4, cv2.IMREAD_REDUCED_COLOR_4),
+                        (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+_END = object()  # Marks the end of the prefetch queue
+
+# JPEG start-of-frame markers, which hold the image size (0xC4, 0xC8 and 0xCC are other segments)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _exif_orientation(app1):
+    """
+    Returns the orientation tag (1-8) of an APP1 segment's EXIF data, or None if it has none.
+    """
+    if not app1.startswith(b"Exif\0\0"):
+        return None
+    tiff = app1[6:]
+    byte_order = {b"II": "little", b"MM": "big"}.get(tiff[:2])
+    if byte_order is None or len(tiff) < 8:
+        return None
+    offset = int.from_bytes(tiff[4:8], byte_order)
+    if offset + 2 > len(tiff):
+        return None
+    num_entries = int.from_bytes(tiff[offset:offset + 2], byte_order)
+    for entry in range(offset + 2, min(offset + 2 + 12 * num_entries, len(tiff) - 11), 12):
+        if int.from_bytes(tiff[entry:entry + 2], byte_order) == 0x0112:
+            return int.from_bytes(tiff[entry + 8:entry + 10], byte_order)
+    return None
+
+
+def read_jpeg_size(image_path):
+    """
+    Reads the (height, width) that cv2.imread returns for a JPEG file, without decoding it.
+
+    The size comes from the start-of-frame segment and is swapped when the EXIF
+    orientation tag rotates the image by 90 degrees, since cv2.imread applies it.
+
+    Returns:
+        tuple: (height, width), or None if the header cannot be parsed.
+    """
+    orientation = None
+    try:
+        with open(image_path, "rb") as f:
+            if f.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    return None
+                if marker[1] == 0xFF:
+                    f.seek(-1, os.SEEK_CUR)  # Fill byte before the marker
+                    continue
+                length = f.read(2)
+                if len(length) < 2:
+                    return None
+                if marker[1] in _JPEG_SOF_MARKERS:
+                    sof = f.read(5)  # Precision, height, width
+                    if len(sof) < 5:
+                        return None
+                    height, width = int.from_bytes(sof[1:3], "big"), int.from_bytes(sof[3:5], "big")
+                    if orientation in (5, 6, 7, 8):  # Transposed or rotated by 90 degrees
+                        return width, height
+                    return height, width
+                if marker[1] == 0xE1 and orientation is None:
+                    orientation = _exif_orientation(f.read(int.from_bytes(length, "big") - 2))
+                    continue
+                f.seek(int.from_bytes(length, "big") - 2, os.SEEK_CUR)
+    except OSError:
+        return None
+
+
+def reduced_decode_flag(original_shape):
+    """
+    Returns the cv2.imread flag that decodes an image of original_shape at the largest reduction
+    that still leaves at least TARGET_HEIGHT rows, or None if it should be decoded at full size.
+    The final resize then only ever scales down.
+    """
+    h, w = original_shape
+    if not (h > TARGET_HEIGHT or w > MAX_WIDTH):
+        return None
+    for factor, flag in REDUCED_DECODE_FLAGS:
+        if h // factor >= TARGET_HEIGHT:
+            return flag
+    return None
+
+
 class MediaLoader:
-    def __init__(self, input_path):
+    def __init__(self, input_path, start_frame=0, end_frame=None, reduced_decode=False):
+        """
+        Args:
+            input_path (str): Path to a video file or an image folder.
+            start_frame (int): Index of the first frame (or image) to read.
+            end_frame (int): Index one past the last frame to read, or None to read to the end.
+            reduced_decode (bool): Decode large JPEGs directly at a reduced scale (1/2, 1/4 or 1/8)
+                                   chosen from the target size, instead of decoding at full size
+                                   and then resizing. The pixels differ slightly from a full decode,
+                                   so detections can change.
+        """
         self.input_path = input_path
         self.is_video = os.path.isfile(input_path)
-        self.frame_count = 0
+        self.frame_count = start_frame
+        self.end_frame = end_frame
         self.image_files = []
+        self.reduced_decode = reduced_decode
 
         if self.is_video:
             # Video file
             self.cap = cv2.VideoCapture(input_path)
             if not self.cap.isOpened():
                 raise ValueError(f"Error opening video file: {input_path}")
+            if start_frame > 0:
+                # Seek so that a shard of the video can be read on its own
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
         else:
             # Image folder
             self.image_files = sorted(
@@ -21,7 +132,19 @@ class MediaLoader:
             if not self.image_files:
                 raise ValueError(f"No valid image files found in folder: {input_path}")
 
+    @property
+    def total_frames(self):
+        """
+        Number of frames in the input (as reported by the container for videos).
+        """
+        if self.is_video:
+            return int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return len(self.image_files)
+
     def get_next_frame(self):
+        if self.end_frame is not None and self.frame_count >= self.end_frame:
+            return None, None, None
+
         if self.is_video:
             # Process video frame
             ret, frame = self.cap.read()
@@ -34,25 +157,150 @@ class MediaLoader:
         else:
             # Process image file
             if self.frame_count < len(self.image_files):
-                image_path = os.path.join(self.input_path, self.image_files[self.frame_count])
-                frame = cv2.imread(image_path)
-
-                if frame is None:
-                    raise ValueError(f"Error reading image file: {image_path}")
-
-                # Resize image if necessary
-                h, w = frame.shape[:2]
-                if h > 500 or w > 800:
-                    scale_factor = 500 / h  # Calculate scale factor to make height 500
-                    new_width = int(w * scale_factor)
-                    new_height = 500
-                    frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-
+                frame = self._load_image(self.frame_count)
                 self.frame_count += 1
                 return frame, self.frame_count, None  # No timestamp for images
             else:
                 return None, None, None
 
+    def seek(self, frame_index):
+        """
+        Moves to a frame index, so the next frame read is frame_index + 1.
+        """
+        if frame_index == self.frame_count:
+            return
+        if self.is_video:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        self.frame_count = frame_index
+
+    def iter_frames(self, prefetch=8, num_threads=4):
+        """
+        Iterates over the remaining frames, decoding ahead of the consumer.
+
+        Videos are decoded on a background thread into a bounded queue. Image folders
+        are decoded by a thread pool (cv2.imread releases the GIL), with at most
+        `prefetch` images in flight, and yielded in order.
+
+        Args:
+            prefetch (int): Maximum number of decoded frames waiting to be consumed.
+            num_threads (int): Number of decode threads for image folders.
+
+        Yields:
+            tuple: (frame, frame_number, timestamp), as returned by get_next_frame.
+        """
+        if prefetch <= 0:
+            while True:
+                frame, frame_number, timestamp = self.get_next_frame()
+                if frame is None:
+                    return
+                yield frame, frame_number, timestamp
+        elif self.is_video:
+            yield from self._iter_video(prefetch)
+        else:
+            yield from self._iter_images(prefetch, num_threads)
+
+    def __iter__(self):
+        return self.iter_frames()
+
+    def _iter_video(self, prefetch):
+        frames = queue.Queue(maxsize=prefetch)
+        stop_event = threading.Event()
+
+        def decode_loop():
+            try:
+                while not stop_event.is_set():
+                    item = self.get_next_frame()
+                    if item[0] is None:
+                        break
+                    while not stop_event.is_set():
+                        try:
+                            frames.put(item, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+            except Exception as exc:
+                frames.put(exc)
+            finally:
+                frames.put(_END)
+
+        thread = threading.Thread(target=decode_loop, name="video-decode", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = frames.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop_event.set()
+            # Unblock the decode thread if it is waiting on a full queue
+            while thread.is_alive():
+                try:
+                    frames.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            thread.join()
+
+    def _iter_images(self, prefetch, num_threads):
+        end = len(self.image_files) if self.end_frame is None else min(self.end_frame, len(self.image_files))
+        indices = iter(range(self.frame_count, end))
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=max(1, num_threads)) as executor:
+            try:
+                for index in indices:
+                    pending.append((index, executor.submit(self._load_image, index)))
+                    if len(pending) >= prefetch:
+                        break
+                while pending:
+                    index, future = pending.popleft()
+                    frame = future.result()
+                    self.frame_count = index + 1
+                    next_index = next(indices, None)
+                    if next_index is not None:
+                        pending.append((next_index, executor.submit(self._load_image, next_index)))
+                    yield frame, self.frame_count, None  # No timestamp for images
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def _load_image(self, index):
+        image_path = os.path.join(self.input_path, self.image_files[index])
+
+        # The reduction is chosen per file from its own header, so every image is decoded
+        # the same way whatever the decode order, thread count or shard boundaries
+        if self.reduced_decode and image_path.lower().endswith(('.jpg', '.jpeg')):
+            original_shape = read_jpeg_size(image_path)
+            flag = reduced_decode_flag(original_shape) if original_shape is not None else None
+            if flag is not None:
+                frame = cv2.imread(image_path, flag)
+                # A frame whose aspect does not match the header (an orientation the header
+                # parser missed) is decoded again at full size rather than resized out of shape
+                if frame is not None and ((frame.shape[0] > frame.shape[1]) ==
+                                          (original_shape[0] > original_shape[1])):
+                    return self._resize(frame, original_shape)
+
+        frame = cv2.imread(image_path)
+
+        if frame is None:
+            raise ValueError(f"Error reading image file: {image_path}")
+
+        return self._resize(frame, frame.shape[:2])
+
+    @staticmethod
+    def _resize(frame, original_shape):
+        # Resize image if necessary; the output size is computed from the original image size
+        # so a reduced decode gives the same frame size as a full one
+        h, w = original_shape
+        if h > TARGET_HEIGHT or w > MAX_WIDTH:
+            scale_factor = TARGET_HEIGHT / h  # Calculate scale factor to make height 500
+            new_width = int(w * scale_factor)
+            new_height = TARGET_HEIGHT
+            if frame.shape[:2] != (new_height, new_width):
+                frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        return frame
+
     def release(self):
         if self.is_video:
-            self.cap.release()
\ No newline at end of file
+            self.cap.release()
@@ -0,0 +1,143 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from instrumentation import Instrumentation
+from pipeline import DetectionPipeline, create_geometry_corrector
+
+
+class MultiStreamResult:
+    """
+    The detections of all streams at one point in time.
+    """
+    def __init__(self, clock, results):
+        """
+        Args:
+            clock (float): Timestamp in seconds of the group (frame number for image folders).
+            results (list): One FrameResult per stream, or None for a stream without a frame
+                            at this time (e.g. a dropped frame or a stream that has ended).
+        """
+        self.clock = clock
+        self.results = results
+
+
+class MultiStreamProcessor:
+    """
+    Processes several camera streams in one process, synchronized by timestamp.
+
+    Each stream is decoded ahead on its own prefetch thread. Frames are grouped by
+    timestamp: a group holds the earliest pending frame of every stream whose frame
+    lies within sync_tolerance of it; the other streams contribute no frame to that
+    group. The frames of a group are processed as one batch on a thread pool, with one
+    DetectionPipeline per stream (so tracking sees every stream in order). All
+    pipelines share one GeometryCorrector, and the undistortion maps of every
+    resolution in the batch are built before it is dispatched, so same-resolution
+    streams use one set of maps.
+
+    As with DetectionPipeline.run, the frames and canvases of a group are overwritten
+    by the next group, so each group must be consumed before asking for the next one.
+    """
+    def __init__(self, config, num_threads=None, sync_tolerance=None, render=True, instrumentation=None):
+        """
+        Args:
+            config (dict): The CONFIG dictionary.
+            num_threads (int): Size of the thread pool (defaults to the number of streams).
+            sync_tolerance (float): Maximum timestamp difference in seconds between frames of one
+                                    group. Defaults to half the frame interval of the fastest stream.
+                                    Image folders are always grouped by frame number.
+            render (bool): Whether to draw the detections of every stream onto a canvas.
+            instrumentation (Instrumentation): Optional stage timers and counters shared by all threads.
+        """
+        self.config = config
+        self.num_threads = num_threads
+        self.sync_tolerance = sync_tolerance
+        self.render = render
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        self.geometry_corrector = create_geometry_corrector(config)
+
+    def _default_tolerance(self, media_loaders):
+        fps = [loader.cap.get(cv2.CAP_PROP_FPS) for loader in media_loaders]
+        fps = [value for value in fps if value > 0] or [30.0]
+        return 0.5 / max(fps)
+
+    def _process(self, pipeline, frame, frame_number, timestamp):
+        result = pipeline.process_frame(frame, frame_number, timestamp)
+        if self.render:
+            pipeline.render(result)
+        return result
+
+    def run(self, media_loaders):
+        """
+        Yields a MultiStreamResult per group of synchronized frames, in time order.
+        """
+        num_streams = len(media_loaders)
+        pipelines = [DetectionPipeline(self.config, geometry_corrector=self.geometry_corrector,
+                                       instrumentation=self.instrumentation) for _ in media_loaders]
+        fisheye_enabled = self.config["fisheye_correction"]["enabled"]
+
+        # Videos are synchronized by timestamp, image folders by frame number
+        use_timestamps = all(loader.is_video for loader in media_loaders)
+        tolerance = 0.0
+        if use_timestamps:
+            tolerance = self.sync_tolerance if self.sync_tolerance is not None \
+                else self._default_tolerance(media_loaders)
+
+        input_config = self.config.get("input", {})
+        streams = [loader.iter_frames(prefetch=input_config.get("prefetch", 0),
+                                      num_threads=input_config.get("decode_threads", 1))
+                   for loader in media_loaders]
+        executor = ThreadPoolExecutor(max_workers=self.num_threads or num_streams or 1)
+        try:
+            heads = [next(stream, None) for stream in streams]
+            while any(head is not None for head in heads):
+                clocks = [None if head is None else (head[2] if use_timestamps else head[1]) for head in heads]
+                clock = min(c for c in clocks if c is not None)
+
+                batch = [None] * num_streams
+                for i, head in enumerate(heads):
+                    if head is not None and clocks[i] <= clock + tolerance:
+                        batch[i] = head
+                        with self.instrumentation.stage("decode"):
+                            heads[i] = next(streams[i], None)
+                if any(item is None for item in batch):
+                    self.instrumentation.increment("unsynchronized_groups")
+
+                # Build the maps of each resolution once, before the workers ask for them
+                if fisheye_enabled:
+                    for height, width in {item[0].shape[:2] for item in batch if item is not None}:
+                        self.geometry_corrector.get_undistortion_maps(width, height)
+
+                futures = [None if item is None else executor.submit(self._process, pipelines[i], *item)
+                           for i, item in enumerate(batch)]
+                results = [None if future is None else future.result() for future in futures]
+                self.instrumentation.increment("stream_frames", sum(result is not None for result in results))
+                yield MultiStreamResult(clock, results)
+        finally:
+            executor.shutdown(wait=True)
+            for stream in streams:
+                stream.close()
+
+
+def stream_output_path(path, stream_index):
+    """
+    Inserts the stream index before the extension: detections.jsonl -> detections_cam0.jsonl.
+    """
+    name, ext = os.path.splitext(path)
+    return f"{name}_cam{stream_index}{ext}"
+
+
+def tile_canvases(canvases, height=None):
+    """
+    Places the canvases of several streams side by side, scaled to a common height.
+    Streams without a canvas are left out.
+    """
+    canvases = [canvas for canvas in canvases if canvas is not None]
+    if not canvases:
+        return None
+    height = height or min(canvas.shape[0] for canvas in canvases)
+    scaled = [canvas if canvas.shape[0] == height else
+              cv2.resize(canvas, (max(1, round(canvas.shape[1] * height / canvas.shape[0])), height),
+                         interpolation=cv2.INTER_AREA)
+              for canvas in canvases]
+    return cv2.hconcat(scaled)
@@ -0,0 +1,211 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from instrumentation import Instrumentation
+
+RAW_MAGIC = b"UAVRAW01"
+RAW_HEADER_DTYPE = np.dtype([("magic", "S8"), ("height", "<u4"), ("width", "<u4"), ("channels", "<u4"),
+                             ("reserved", "<u4")])
+
+_END = object()  # Marks the end of the encoder queue
+
+
+class FrameSink:
+    """
+    Destination for the processed output frames (the bottom half of the canvas).
+
+    write() may keep a reference to the frame until the next call; sinks that keep
+    it longer (e.g. to write it from another thread) copy it first.
+    """
+    def write(self, frame, frame_number=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class VideoFileSink(FrameSink):
+    """
+    Encodes frames into a video file with cv2.VideoWriter.
+    """
+    def __init__(self, output_path, fps, frame_size, fourcc="XVID"):
+        """
+        Args:
+            output_path (str): Path of the video file.
+            fps (float): Frame rate of the video.
+            frame_size (tuple): (width, height) of the video. Frames of another size are resized.
+            fourcc (str): Codec code. Try 'MJPG' or 'AVC1' if 'XVID' doesn't work.
+        """
+        self.output_path = output_path
+        self.frame_size = tuple(frame_size)
+        self._writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, self.frame_size)
+
+    def write(self, frame, frame_number=None):
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            frame = cv2.resize(frame, self.frame_size)
+        self._writer.write(frame)
+
+    def close(self):
+        self._writer.release()
+
+
+class RawFrameSink(FrameSink):
+    """
+    Appends uncompressed frames to a single file, for lossless encoding later.
+
+    The file is a small header (RAW_HEADER_DTYPE) followed by the frames back to back;
+    load_raw_frames() maps it as an (N, height, width, channels) array. The frame size
+    is fixed by the first frame; later frames of another size are resized.
+    """
+    def __init__(self, output_path):
+        """
+        Args:
+            output_path (str): Path of the dump file.
+        """
+        self.output_path = output_path
+        self._file = open(output_path, "wb")
+        self._shape = None
+
+    def write(self, frame, frame_number=None):
+        if frame.ndim == 2:
+            frame = frame[:, :, np.newaxis]
+        if self._shape is None:
+            self._shape = frame.shape
+            height, width, channels = frame.shape
+            self._file.write(np.array((RAW_MAGIC, height, width, channels, 0), dtype=RAW_HEADER_DTYPE).tobytes())
+        elif frame.shape != self._shape:
+            frame = cv2.resize(frame, (self._shape[1], self._shape[0])).reshape(self._shape)
+        self._file.write(np.ascontiguousarray(frame, dtype=np.uint8).data)
+
+    def close(self):
+        self._file.close()
+
+
+def load_raw_frames(path):
+    """
+    Memory-maps a file written by RawFrameSink.
+
+    Returns:
+        numpy.ndarray: A read-only (N, height, width, channels) uint8 array.
+    """
+    header = np.fromfile(path, dtype=RAW_HEADER_DTYPE, count=1)
+    if len(header) == 0 or header[0]["magic"] != RAW_MAGIC:
+        raise ValueError(f"Not a raw frame dump: {path}")
+    shape = (int(header[0]["height"]), int(header[0]["width"]), int(header[0]["channels"]))
+    # A partially written last frame is ignored
+    num_frames = (os.path.getsize(path) - RAW_HEADER_DTYPE.itemsize) // int(np.prod(shape))
+    if num_frames == 0:
+        return np.empty((0,) + shape, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r", offset=RAW_HEADER_DTYPE.itemsize,
+                     shape=(num_frames,) + shape)
+
+
+class ImageSequenceSink(FrameSink):
+    """
+    Writes every frame as a numbered PNG or JPEG file from a thread pool.
+
+    cv2.imwrite releases the GIL, so the images are compressed in parallel. At most
+    max_pending images are in flight; write() waits for the oldest one beyond that.
+    """
+    def __init__(self, output_dir, extension=".png", num_threads=4, max_pending=16, prefix="frame_"):
+        """
+        Args:
+            output_dir (str): Directory to write the images to (created if needed).
+            extension (str): '.png' or '.jpg'.
+            num_threads (int): Number of writer threads.
+            max_pending (int): Maximum number of images queued or being written.
+            prefix (str): File name prefix, followed by the zero-padded frame number.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.extension = extension if extension.startswith(".") else "." + extension
+        self.prefix = prefix
+        self.max_pending = max(1, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, num_threads))
+        self._pending = deque()
+        self._count = 0
+
+    def _wait(self, max_pending):
+        while len(self._pending) > max_pending:
+            self._pending.popleft().result()  # Re-raises errors from the writer threads
+
+    def write(self, frame, frame_number=None):
+        self._count += 1
+        number = frame_number if frame_number is not None else self._count
+        path = os.path.join(self.output_dir, f"{self.prefix}{number:06d}{self.extension}")
+        # The caller may reuse the frame buffer, so the writer thread gets a copy
+        self._pending.append(self._executor.submit(cv2.imwrite, path, frame.copy()))
+        self._wait(self.max_pending)
+
+    def close(self):
+        try:
+            self._wait(0)
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+class BackgroundSink(FrameSink):
+    """
+    Runs another sink on an encoder thread behind a bounded queue.
+
+    write() copies the frame into the queue and returns, so encoding overlaps with
+    detection instead of adding to it. When the queue is full, write() blocks until
+    the encoder catches up, so no frame is dropped. Errors raised by the wrapped sink
+    are re-raised by the next write() or by close().
+    """
+    def __init__(self, sink, queue_size=8, instrumentation=None, stage_name="encode"):
+        """
+        Args:
+            sink (FrameSink): The sink to run in the background.
+            queue_size (int): Maximum number of frames waiting to be written.
+            instrumentation (Instrumentation): Optional timers; the wrapped sink's writes are
+                                               timed as stage_name on the encoder thread.
+            stage_name (str): Instrumentation stage name.
+        """
+        self.sink = sink
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        self.stage_name = stage_name
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._error = None
+        self._error_raised = False
+        self._thread = threading.Thread(target=self._encode_loop, name="encoder", daemon=True)
+        self._thread.start()
+
+    def _encode_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                break
+            if self._error is not None:
+                continue  # Keep draining so write() never blocks on a dead sink
+            frame, frame_number = item
+            try:
+                with self.instrumentation.stage(self.stage_name):
+                    self.sink.write(frame, frame_number)
+            except Exception as exc:
+                self._error = exc
+
+    def _raise_error(self):
+        if self._error is not None and not self._error_raised:
+            self._error_raised = True  # The encoder keeps skipping frames, but the error is reported once
+            raise self._error
+
+    def write(self, frame, frame_number=None):
+        self._raise_error()
+        self._queue.put((frame.copy(), frame_number))
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_END)
+            self._thread.join()
+            self._thread = None
+            try:
+                self._raise_error()
+            finally:
+                self.sink.close()
@@ -0,0 +1,300 @@
+import argparse
+import ast
+import copy
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import CONFIG
+from media_loader import MediaLoader
+from pipeline import DetectionPipeline
+
+
+def set_config_value(config, path, value):
+    """
+    Sets a nested config value from a dotted path, e.g. 'line_detection.threshold'.
+    """
+    keys = path.split(".")
+    section = config
+    for key in keys[:-1]:
+        if key not in section:
+            raise KeyError(f"Unknown config section '{key}' in '{path}'")
+        section = section[key]
+    if keys[-1] not in section:
+        raise KeyError(f"Unknown config key '{keys[-1]}' in '{path}'")
+    # JSON has no tuples; config tuples (kernel sizes, colors) must stay hashable
+    section[keys[-1]] = tuple(value) if isinstance(value, list) else value
+
+
+def make_variants(base_config, grid):
+    """
+    Expands a grid {dotted path: [values]} into every combination of the values.
+
+    Returns:
+        list: (overrides, config) pairs, with overrides a {dotted path: value} dict.
+    """
+    paths = list(grid)
+    variants = []
+    for values in itertools.product(*(grid[path] for path in paths)):
+        config = copy.deepcopy(base_config)
+        overrides = dict(zip(paths, values))
+        for path, value in overrides.items():
+            set_config_value(config, path, value)
+        variants.append((overrides, config))
+    return variants
+
+
+class MemoizedRunner:
+    """
+    Evaluates the stage graphs of several pipelines with one shared cache of stage outputs.
+
+    A stage output is keyed by the stage name, the config values the stage declares
+    (Stage.params) and the keys of its inputs, so the key of e.g. the contours covers
+    every parameter upstream of them. Pipelines that differ only in downstream
+    parameters (min_area, Hough thresholds, ...) therefore reuse the upstream outputs
+    computed for the first one. The time each output took to compute is kept too, so
+    the standalone cost of each pipeline can still be reported.
+    """
+    def __init__(self):
+        self.cache = {}
+        self.durations = {}
+        self._stages = {}
+
+    def clear(self):
+        self.cache.clear()
+        self.durations.clear()
+
+    def run(self, graph, inputs, input_keys, outputs):
+        """
+        Evaluates the stages of graph needed for outputs.
+
+        Args:
+            graph (StageGraph): The graph to evaluate.
+            inputs (list): Values of the graph inputs.
+            input_keys (list): Hashable keys identifying the graph inputs.
+            outputs (list): Names of the outputs to compute.
+
+        Returns:
+            tuple: (values, keys, stats): the output values, their cache keys and
+                   (seconds, computed, evaluated): the standalone compute time of the stages,
+                   the number of stages that were not in the cache and the number of stages.
+        """
+        stages = self._stages.get((id(graph), tuple(outputs)))
+        if stages is None:
+            stages = self._stages[(id(graph), tuple(outputs))] = graph.stages_for(outputs)
+
+        values = dict(zip(graph.inputs, inputs))
+        keys = dict(zip(graph.inputs, input_keys))
+        seconds = 0.0
+        computed = 0
+        for stage in stages:
+            key = (stage.name, stage.params, tuple(keys[name] for name in stage.inputs))
+            if key in self.cache:
+                result = self.cache[key]
+            else:
+                start = time.perf_counter()
+                result = stage.function(*(values[name] for name in stage.inputs))
+                self.durations[key] = time.perf_counter() - start
+                self.cache[key] = result
+                computed += 1
+            seconds += self.durations[key]
+
+            if stage.single_output:
+                values[stage.outputs[0]] = result
+                keys[stage.outputs[0]] = key
+            else:
+                values.update(zip(stage.outputs, result))
+                keys.update((name, (key, name)) for name in stage.outputs)
+        return (tuple(values.get(name) for name in outputs), tuple(keys.get(name) for name in outputs),
+                (seconds, computed, len(stages)))
+
+
+def stability_metrics(fitted_lines):
+    """
+    Summarizes how stable the fitted line is over consecutive frames.
+
+    Returns:
+        dict: detection_rate (fraction of frames with a line), jitter_px (mean absolute
+              frame-to-frame change of the line's end points, over consecutive frames
+              that both have a line) and max_jump_px.
+    """
+    detected = [line is not None for line in fitted_lines]
+    jumps = []
+    for previous, current in zip(fitted_lines, fitted_lines[1:]):
+        if previous is not None and current is not None:
+            jumps.append(np.abs(np.subtract(current, previous, dtype=np.float64)).mean())
+    return {
+        "detection_rate": float(np.mean(detected)) if detected else 0.0,
+        "jitter_px": float(np.mean(jumps)) if jumps else None,
+        "max_jump_px": float(np.max(jumps)) if jumps else None,
+    }
+
+
+def _sweep_group(task):
+    """
+    Runs a group of variants over the clip in one process, frame by frame.
+
+    All variants process a frame before the next frame is decoded, so the cache only
+    ever holds the intermediate results of one frame.
+    """
+    input_path, max_frames, input_config, variants = task
+    # Tracking carries state between frames, which the stage keys do not capture
+    pipelines = [DetectionPipeline(config, enable_tracking=False, reuse_buffers=False) for _, config in variants]
+    runner = MemoizedRunner()
+    fitted_lines = [[] for _ in variants]
+    hough_counts = [[] for _ in variants]
+    seconds = [0.0] * len(variants)
+    computed = [0] * len(variants)
+    evaluated = [0] * len(variants)
+
+    media_loader = MediaLoader(input_path, end_frame=max_frames,
+                               reduced_decode=input_config.get("reduced_decode", False))
+    num_frames = 0
+    start = time.perf_counter()
+    try:
+        for frame, frame_number, _ in media_loader.iter_frames():
+            num_frames += 1
+            for i, pipeline in enumerate(pipelines):
+                frame_height, frame_width = frame.shape[:2]
+                (gray,), (gray_key,), frame_stats = runner.run(
+                    pipeline.frame_graph, [frame], [("frame", frame_number)], ["gray"])
+                (hough_lines, fitted_line), _, detection_stats = runner.run(
+                    pipeline.detection_graph, [gray, frame_height, frame_width, 0],
+                    [gray_key, frame_height, frame_width, 0], ["hough_lines", "fitted_line"])
+
+                fitted_lines[i].append(tuple(int(v) for v in fitted_line) if fitted_line is not None else None)
+                hough_counts[i].append(0 if hough_lines is None else len(hough_lines))
+                seconds[i] += frame_stats[0] + detection_stats[0]
+                computed[i] += frame_stats[1] + detection_stats[1]
+                evaluated[i] += frame_stats[2] + detection_stats[2]
+            runner.clear()
+    finally:
+        media_loader.release()
+    wall_seconds = time.perf_counter() - start
+
+    results = []
+    for i, (overrides, _) in enumerate(variants):
+        result = {"overrides": overrides, "frames": num_frames}
+        result.update(stability_metrics(fitted_lines[i]))
+        result["hough_lines_per_frame"] = float(np.mean(hough_counts[i])) if num_frames else 0.0
+        result["ms_per_frame"] = 1000.0 * seconds[i] / num_frames if num_frames else 0.0
+        result["cache_hit_rate"] = 1.0 - computed[i] / evaluated[i] if evaluated[i] else 0.0
+        results.append(result)
+    return results, wall_seconds
+
+
+class ParameterSweep:
+    """
+    Runs a grid of CONFIG variants over a clip and reports detection stability and
+    runtime for each variant.
+
+    The variants are split into contiguous groups of the grid (one group per process,
+    several per process for load balancing), so neighbouring variants, which share
+    most parameters, share one MemoizedRunner. Only the stages that depend on a
+    varied parameter are recomputed per variant.
+    """
+    def __init__(self, config, grid, num_processes=None, max_frames=None, groups_per_process=1):
+        """
+        Args:
+            config (dict): The base CONFIG dictionary. Its input section sets how the clip is decoded.
+            grid (dict): {dotted config path: [values]} of the parameters to vary.
+            num_processes (int): Size of the process pool (defaults to the number of CPUs).
+            max_frames (int): Only use the first max_frames frames of the clip.
+            groups_per_process (int): Number of variant groups per process. More groups balance
+                                      the load better but share less of the cache.
+        """
+        if any(path.split(".")[0] == "input" for path in grid):
+            raise ValueError("Input parameters cannot be swept, since the variants share the decoded frames")
+        self.input_config = copy.deepcopy(config.get("input", {}))
+        self.variants = make_variants(config, grid)
+        self.num_processes = num_processes or os.cpu_count() or 1
+        self.max_frames = max_frames
+        self.groups_per_process = max(1, groups_per_process)
+
+    def run(self, input_path):
+        """
+        Returns:
+            tuple: (results, wall_seconds), with one result dict per variant in grid order.
+        """
+        num_groups = min(len(self.variants), self.num_processes * self.groups_per_process)
+        group_size = -(-len(self.variants) // num_groups)  # Ceiling division
+        tasks = [(input_path, self.max_frames, self.input_config, self.variants[start:start + group_size])
+                 for start in range(0, len(self.variants), group_size)]
+
+        start = time.perf_counter()
+        results = []
+        if self.num_processes == 1:
+            for task in tasks:
+                results += _sweep_group(task)[0]
+        else:
+            with ProcessPoolExecutor(max_workers=self.num_processes) as executor:
+                for group_results, _ in executor.map(_sweep_group, tasks):
+                    results += group_results
+        return results, time.perf_counter() - start
+
+
+def parse_param(text):
+    """
+    Parses 'dotted.path=v1,v2,...' into (path, [values]). Values are Python literals.
+    """
+    path, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(f"Expected path=v1,v2,... but got '{text}'")
+    parsed = ast.literal_eval(f"[{values}]")
+    return path.strip(), parsed
+
+
+def print_report(results, wall_seconds):
+    ranked = sorted(results, key=lambda r: (-r["detection_rate"],
+                                            r["jitter_px"] if r["jitter_px"] is not None else float("inf")))
+    names = [", ".join(f"{path}={value}" for path, value in result["overrides"].items()) or "(base config)"
+             for result in ranked]
+    width = max(len("variant"), *(len(name) for name in names)) + 2
+    print(f"{'variant':<{width}}{'detected':>10}{'jitter px':>11}{'max jump':>10}{'hough':>8}{'ms/frame':>10}{'cached':>8}")
+    for name, result in zip(names, ranked):
+        jitter = f"{result['jitter_px']:.2f}" if result["jitter_px"] is not None else "-"
+        max_jump = f"{result['max_jump_px']:.1f}" if result["max_jump_px"] is not None else "-"
+        print(f"{name:<{width}}{result['detection_rate']:>10.1%}{jitter:>11}{max_jump:>10}"
+              f"{result['hough_lines_per_frame']:>8.1f}{result['ms_per_frame']:>10.2f}{result['cache_hit_rate']:>8.0%}")
+    standalone = sum(r["ms_per_frame"] * r["frames"] for r in results) / 1000.0
+    print(f"\n{len(results)} variants in {wall_seconds:.1f}s "
+          f"(running them one by one without the cache would take about {standalone:.1f}s).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep CONFIG parameters over a recorded clip.")
+    parser.add_argument("input_path", help="Path to the input video file or image directory.")
+    parser.add_argument("--param", action="append", type=parse_param, default=[],
+                        help="A parameter to vary, as dotted.path=v1,v2,... (e.g. line_detection.threshold=80,100,120). "
+                             "Can be given several times.")
+    parser.add_argument("--grid", default=None,
+                        help="JSON file with a {dotted.path: [values]} grid (combined with --param).")
+    parser.add_argument("--processes", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--max_frames", type=int, default=None, help="Only use the first N frames of the clip.")
+    parser.add_argument("--output", default=None, help="Save the per-variant results to this JSON file.")
+    args = parser.parse_args()
+
+    grid = {}
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+    grid.update(dict(args.param))
+    if not grid:
+        parser.error("Nothing to sweep: give --param or --grid.")
+
+    sweep = ParameterSweep(CONFIG, grid, num_processes=args.processes, max_frames=args.max_frames)
+    print(f"Sweeping {len(sweep.variants)} variants over {args.input_path}...")
+    results, wall_seconds = sweep.run(args.input_path)
+    print_report(results, wall_seconds)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"grid": grid, "wall_seconds": wall_seconds, "results": results}, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,765 @@
+import cv2
+import numpy as np
+
+from geometry_correction import GeometryCorrector
+from preprocessing import Preprocessor, MorphologyProcessor, TemporalThreshold
+from contour_detection import ContourAnalyzer, ContourDetector, ContourSelector, LineDetector
+from drawing import Drawer
+from instrumentation import Instrumentation
+from buffer_pool import BufferPool
+from tracking import LineTracker
+from stage_graph import Stage, StageGraph
+from mask_cache import MaskCache
+
+
+class FrameResult:
+    """
+    Holds the detections (and optionally the rendered canvas) for a single frame.
+
+    The corrected color frame can be produced lazily: pass frame_loader instead of
+    frame and it is only computed the first time result.frame is read (e.g. when a
+    canvas is drawn), so headless runs never pay for it.
+    """
+    def __init__(self, frame, frame_number, timestamp, hough_lines=None,
+                 best_contour=None, fitted_line=None, canvas=None, contour_features=None,
+                 frame_loader=None):
+        self._frame = frame  # Frame after fisheye correction, in original-image coordinates
+        self._frame_loader = frame_loader
+        self.frame_number = frame_number
+        self.timestamp = timestamp
+        self.hough_lines = hough_lines
+        self.best_contour = best_contour
+        self.fitted_line = fitted_line
+        self.canvas = canvas
+        self.contour_features = contour_features  # ContourFeatures of all contours, shared with drawing
+        self.degradation_level = 0  # Set by RealtimeProcessor when stages were switched off to keep up
+
+    @property
+    def frame(self):
+        if self._frame is None and self._frame_loader is not None:
+            self._frame = self._frame_loader()
+            self._frame_loader = None
+        return self._frame
+
+    @frame.setter
+    def frame(self, value):
+        self._frame = value
+        self._frame_loader = None
+
+
+def create_geometry_corrector(config):
+    """
+    Builds a GeometryCorrector from the fisheye_correction section of the config.
+    """
+    return GeometryCorrector(k1=config["fisheye_correction"]["k1"],
+                             k2=config["fisheye_correction"]["k2"],
+                             cache_size=config["fisheye_correction"].get("map_cache_size", 4),
+                             cache_dir=config["fisheye_correction"].get("map_cache_dir"))
+
+
+class DetectionPipeline:
+    """
+    Runs fisheye correction, preprocessing, edge/line detection and contour selection
+    on a single frame, and renders the detections onto a canvas.
+
+    A pipeline instance is not meant to be shared between threads; create one per
+    worker and pass a shared GeometryCorrector so the undistortion maps are built once.
+    """
+    def __init__(self, config, geometry_corrector=None, instrumentation=None, enable_tracking=True,
+                 reuse_buffers=True, use_mask_cache=False):
+        """
+        Args:
+            config (dict): The CONFIG dictionary.
+            geometry_corrector (GeometryCorrector): Optional shared corrector.
+            instrumentation (Instrumentation): Optional stage timers and counters (disabled by default).
+            enable_tracking (bool): Allow the temporal ROI tracking from config["tracking"] and the
+                                    threshold reuse from config["temporal_threshold"]. Both need frames
+                                    in order, so callers that hand out frames to several pipelines
+                                    turn it off.
+            reuse_buffers (bool): Write intermediate images into a per-resolution BufferPool and render
+                                  into a preallocated canvas. The frame and canvas of a result are then
+                                  overwritten by the next frame, so turn this off when results outlive
+                                  the next call (e.g. when handed to another thread).
+            use_mask_cache (bool): Read and write the mask cache from config["mask_cache"] in run(). Only
+                                   callers that go through run() set this; while the cache is in use,
+                                   tracking and the temporal threshold are off.
+        """
+        self.config = config
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        self.geometry_corrector = geometry_corrector or create_geometry_corrector(config)
+        self.preprocessor = Preprocessor()
+        self.morphology_processor = MorphologyProcessor(
+            kernel_size=config["preprocessing"]["morphological_opening"]["kernel_size"])
+        self.line_detector = LineDetector()
+        self.contour_detector = ContourDetector()
+        self.contour_analyzer = ContourAnalyzer()
+        self.contour_selector = ContourSelector(
+            min_area=config["contour_selection"]["min_area"],
+            max_aspect_ratio=config["contour_selection"]["max_aspect_ratio"],
+            min_height_ratio=config["contour_selection"]["min_height_ratio"],
+            max_approx_vertices=config["contour_selection"]["max_approx_vertices"],
+            min_approx_vertices=config["contour_selection"]["min_approx_vertices"],
+            top_bottom_tolerance=config["contour_selection"]["top_bottom_tolerance"]
+        )
+        self.buffer_pool = BufferPool() if reuse_buffers else None
+        self.drawer = Drawer(neutral_color=config["drawing"].get("neutral_color", (128, 128, 128)),
+                             reuse_canvas=reuse_buffers)
+
+        # Coarse-to-fine detection: the coarse level uses parameters scaled down to match
+        pyramid_config = config.get("pyramid", {})
+        self.pyramid_scale = 2 ** pyramid_config.get("levels", 1) if pyramid_config.get("enabled", False) else 1
+        if self.pyramid_scale > 1:
+            scale = self.pyramid_scale
+            selection = config["contour_selection"]
+            self.coarse_contour_selector = ContourSelector(
+                min_area=selection["min_area"] / scale ** 2,
+                max_aspect_ratio=selection["max_aspect_ratio"],
+                min_height_ratio=selection["min_height_ratio"],
+                max_approx_vertices=selection["max_approx_vertices"],
+                min_approx_vertices=selection["min_approx_vertices"],
+                top_bottom_tolerance=max(1, selection["top_bottom_tolerance"] // scale),
+                narrow_width=self.contour_selector.narrow_width / scale,
+                narrow_height=self.contour_selector.narrow_height / scale
+            )
+            # Hough votes are proportional to the line length in pixels, so the threshold scales too
+            self.coarse_hough_params = {
+                "threshold": max(1, config["line_detection"]["threshold"] // scale),
+                "min_line_length": config["line_detection"]["min_line_length"] / scale,
+                "max_line_gap": config["line_detection"]["max_line_gap"] / scale,
+            }
+            # The blur and the opening shrink with the image too, so thin structures (cables, the
+            # pole's edges) are not blurred or opened away at the coarse level
+            self.coarse_blur_sigma = (0.3 * ((15 - 1) * 0.5 - 1) + 0.8) / scale  # Sigma of the native 15x15 blur
+            blur_size = max(3, (15 // scale) | 1)
+            self.coarse_blur_kernel = (blur_size, blur_size)
+            opening_kernel = config["preprocessing"]["morphological_opening"]["kernel_size"]
+            self.coarse_opening_kernel = tuple(max(1, size // scale) for size in opening_kernel)
+            self.coarse_morphology_processor = MorphologyProcessor(kernel_size=self.coarse_opening_kernel)
+            self.refine_margin = pyramid_config.get("refine_margin", 16)
+
+        # Masks are cached for full-frame, native-resolution detection from a binary image only
+        self.mask_cache = None
+        mask_cache_config = config.get("mask_cache", {})
+        if (use_mask_cache and mask_cache_config.get("enabled", False) and self.pyramid_scale == 1
+                and config["preprocessing"]["binary_threshold"]["enabled"]):
+            self.mask_cache = MaskCache(mask_cache_config.get("directory", "mask_cache"),
+                                        max_bytes=int(mask_cache_config.get("max_size_mb", 2048) * 1024 ** 2))
+
+        self.line_tracker = None
+        tracking_config = config.get("tracking", {})
+        if enable_tracking and tracking_config.get("enabled", False) and self.mask_cache is None:
+            self.line_tracker = LineTracker(band_width=tracking_config.get("band_width", 0.2),
+                                            full_search_interval=tracking_config.get("full_search_interval", 30),
+                                            velocity_smoothing=tracking_config.get("velocity_smoothing", 0.5))
+
+        self.temporal_threshold = None
+        temporal_config = config.get("temporal_threshold", {})
+        if enable_tracking and temporal_config.get("enabled", False) and self.mask_cache is None:
+            self.temporal_threshold = TemporalThreshold(drift_tolerance=temporal_config.get("drift_tolerance", 0.05),
+                                                        smoothing=temporal_config.get("smoothing", 0.5),
+                                                        histogram_step=temporal_config.get("histogram_step", 4))
+
+        # The config is compiled once into stage graphs; the per-frame path does no config lookups
+        # and stages whose outputs nothing consumes (e.g. Canny without Hough) are never run
+        self.frame_graph = self._compile_frame_graph()
+        if self.pyramid_scale > 1:
+            self.detection_graph = self._compile_pyramid_graph()
+        else:
+            self.detection_graph = self._compile_detection_graph()
+        self.render_graph = self._compile_render_graph()
+
+    def _compile_frame_graph(self):
+        """
+        Fisheye correction and grayscale conversion of the input frame.
+
+        Outputs (frame, frame_loader, gray). With grayscale_first only the gray image is
+        undistorted and frame is None; frame_loader undistorts the color frame on demand.
+        """
+        fisheye_config = self.config["fisheye_correction"]
+        preprocessor = self.preprocessor
+        geometry_corrector = self.geometry_corrector
+        fisheye_params = (fisheye_config["k1"], fisheye_config["k2"])
+
+        stages = []
+        if fisheye_config["enabled"] and fisheye_config.get("grayscale_first", False):
+            # Detection only needs one channel: undistort the gray image and leave the
+            # color remap (with the same cached maps) until a canvas actually needs it
+            stages += [
+                Stage("grayscale", ["raw_frame"], "raw_gray",
+                      lambda frame: preprocessor.convert_to_grayscale(
+                          frame, dst=self._buffer("raw_gray", frame.shape[:2]))),
+                Stage("fisheye", ["raw_gray"], "gray",
+                      lambda raw_gray: geometry_corrector.apply_fisheye_correction(
+                          raw_gray, dst=self._buffer("gray", raw_gray.shape)),
+                      params=fisheye_params),
+                Stage("frame_loader", ["raw_frame"], "frame_loader", self._lazy_correction, timed=False),
+            ]
+        else:
+            if fisheye_config["enabled"]:
+                stages.append(Stage("fisheye", ["raw_frame"], "frame",
+                                    lambda frame: geometry_corrector.apply_fisheye_correction(
+                                        frame, dst=self._buffer("corrected", frame.shape)),
+                                    params=fisheye_params))
+            else:
+                stages.append(Stage("frame", ["raw_frame"], "frame", lambda frame: frame, timed=False))
+            stages.append(Stage("grayscale", ["frame"], "gray",
+                                lambda frame: preprocessor.convert_to_grayscale(
+                                    frame, dst=self._buffer("gray", frame.shape[:2]))))
+
+        # Only the color frame, for results whose masks come from the mask cache
+        self.color_graph = StageGraph(stages, inputs=["raw_frame"], outputs=["frame", "frame_loader"],
+                                      instrumentation=self.instrumentation)
+        return StageGraph(stages, inputs=["raw_frame"], outputs=["frame", "frame_loader", "gray"],
+                          instrumentation=self.instrumentation)
+
+    def _compile_detection_graph(self):
+        """
+        Thresholding, edge/line detection and contour selection on a grayscale image, which
+        is either the whole frame or a full-height band of it starting at column x_offset.
+
+        Outputs (hough_lines, best_contour, fitted_line, contour_features), in frame coordinates.
+        """
+        config = self.config
+        instr = self.instrumentation
+        preprocessor = self.preprocessor
+        morphology_processor = self.morphology_processor
+        # Config values the stage outputs depend on, for memoizing stages (see parameter_sweep.py)
+        opening_params = tuple(config["preprocessing"]["morphological_opening"]["kernel_size"])
+        selection_params = tuple(sorted(config["contour_selection"].items()))
+
+        def roi(gray, frame_height, frame_width):
+            instr.increment("detection_pixels", gray.shape[0] * gray.shape[1])
+            # Intermediate images go into pooled buffers sized for the full frame, also when gray is a band
+            return (frame_height, frame_width)
+
+        stages = [Stage("roi", ["gray", "frame_height", "frame_width"], "capacity", roi, timed=False)]
+
+        mask = "gray"  # Name of the image that edges and contours are detected on
+        if config["preprocessing"]["binary_threshold"]["enabled"]:
+            downsampled_blur = config["preprocessing"].get("blur", {}).get("downsampled", False)
+            blur = preprocessor.apply_downsampled_blur if downsampled_blur else preprocessor.apply_blur
+            otsu_threshold = self._otsu_threshold_function()
+            stages += [
+                Stage("blur", ["gray", "capacity"], "blurred",
+                      lambda gray, capacity: blur(gray, dst=self._buffer("blur", gray.shape, capacity)),
+                      params=(downsampled_blur,)),
+                Stage("threshold", ["blurred", "capacity"], "binary",
+                      lambda blurred, capacity: otsu_threshold(
+                          blurred, dst=self._buffer("binary", blurred.shape, capacity))[1]),
+            ]
+            mask = "binary"
+
+        if config["preprocessing"]["morphological_opening"]["enabled"]:
+            stages.append(Stage("opening", [mask, "capacity"], "opened",
+                                lambda binary, capacity: morphology_processor.apply_morphological_opening(
+                                    binary, dst=self._buffer("opened", binary.shape, capacity)),
+                                params=opening_params))
+            mask = "opened"
+
+        # Edge detection; only evaluated when Hough detection consumes the edges
+        stages.append(Stage("canny", [mask, "capacity"], "edges",
+                            lambda binary, capacity: cv2.Canny(
+                                binary, 30, 100, edges=self._buffer("edges", binary.shape, capacity))))
+
+        if config["line_detection"]["enabled"]:
+            line_config = config["line_detection"]
+            hough_params = {"threshold": line_config["threshold"],
+                            "min_line_length": line_config["min_line_length"],
+                            "max_line_gap": line_config["max_line_gap"]}
+
+            def hough(edges, x_offset):
+                hough_lines = self.line_detector.detect(edges, **hough_params)
+                if hough_lines is not None and x_offset:
+                    hough_lines[:, :, 0::2] += x_offset  # Back to frame coordinates
+                instr.increment("hough_lines", 0 if hough_lines is None else len(hough_lines))
+                return hough_lines
+
+            stages.append(Stage("hough", ["edges", "x_offset"], "hough_lines", hough,
+                                params=tuple(hough_params.values())))
+
+        if config["contour_detection"]["enabled"]:
+            def analyze(contours):
+                # Only try to select if contours were found
+                return self.contour_analyzer.analyze(contours) if contours else None
+
+            def select(contours, contour_features, frame_height, frame_width):
+                if not contours:
+                    return None, None
+                return self.contour_selector.select_and_process_contour(
+                    contours, frame_height, frame_width, features=contour_features)
+
+            stages += [
+                Stage("contours", [mask, "x_offset"], "contours",
+                      lambda binary, x_offset: self.contour_detector.detect(binary, offset=(x_offset, 0))),
+                Stage("contour_analysis", ["contours"], "contour_features", analyze),
+                Stage("selection", ["contours", "contour_features", "frame_height", "frame_width"],
+                      ["best_contour", "fitted_line"], select, params=selection_params),
+            ]
+
+        graph_inputs = ["gray", "frame_height", "frame_width", "x_offset"]
+        detection_outputs = ["hough_lines", "best_contour", "fitted_line", "contour_features"]
+        if self.mask_cache is not None:
+            # Split the graph at the masks so they can be stored in and reloaded from the cache
+            self.mask_names = [mask, "edges"] if config["line_detection"]["enabled"] else [mask]
+            self.mask_graph = StageGraph(stages, inputs=graph_inputs, outputs=self.mask_names,
+                                         instrumentation=instr)
+            downstream = stages[[stage.name for stage in stages].index("canny") + 1:]
+            self.from_mask_graph = StageGraph(downstream, inputs=[mask, "edges", "frame_height", "frame_width",
+                                                                  "x_offset"],
+                                              outputs=detection_outputs, instrumentation=instr)
+
+        return StageGraph(stages, inputs=graph_inputs, outputs=detection_outputs, instrumentation=instr)
+
+    def _compile_pyramid_graph(self):
+        """
+        Coarse-to-fine version of the detection graph.
+
+        Thresholding, Hough and contour selection run on a downscaled copy of gray, with
+        their pixel parameters (blur, opening kernel, Hough and contour selection) scaled
+        to match. Only the neighbourhood of the selected
+        contour is then thresholded again at native resolution to refine the contour
+        before the line is fitted. All results are returned in frame coordinates.
+        contour_features is None in this mode, since the table is at the coarse scale.
+        """
+        config = self.config
+        instr = self.instrumentation
+        preprocessor = self.preprocessor
+        # Config values the stage outputs depend on, for memoizing stages (see parameter_sweep.py)
+        opening_params = tuple(config["preprocessing"]["morphological_opening"]["kernel_size"])
+        selection_params = tuple(sorted(config["contour_selection"].items()))
+        scale = self.pyramid_scale
+
+        def downscale(gray, frame_height, frame_width):
+            height, width = gray.shape[:2]
+            small_shape = (max(1, height // scale), max(1, width // scale))
+            capacity = (max(1, frame_height // scale), max(1, frame_width // scale))
+            small = cv2.resize(gray, small_shape[::-1], dst=self._buffer("coarse_gray", small_shape, capacity),
+                               interpolation=cv2.INTER_AREA)
+            instr.increment("detection_pixels", small_shape[0] * small_shape[1])
+            return small, capacity, (width / small_shape[1], height / small_shape[0])
+
+        stages = [Stage("pyramid", ["gray", "frame_height", "frame_width"],
+                        ["coarse", "coarse_capacity", "coarse_scale"], downscale, params=(scale,))]
+
+        mask = "coarse"
+        if config["preprocessing"]["binary_threshold"]["enabled"]:
+            otsu_threshold = self._otsu_threshold_function()
+            stages += [
+                Stage("blur", ["coarse", "coarse_capacity"], "coarse_blurred",
+                      lambda small, capacity: preprocessor.apply_blur(
+                          small, kernel_size=self.coarse_blur_kernel, sigma=self.coarse_blur_sigma,
+                          dst=self._buffer("coarse_blur", small.shape, capacity)),
+                      params=self.coarse_blur_kernel + (self.coarse_blur_sigma,)),
+                Stage("threshold", ["coarse_blurred", "coarse_capacity"], ["otsu_threshold", "coarse_binary"],
+                      lambda blurred, capacity: otsu_threshold(
+                          blurred, dst=self._buffer("coarse_binary", blurred.shape, capacity))),
+            ]
+            mask = "coarse_binary"
+        else:
+            # Without a threshold the coarse contour cannot be refined
+            stages.append(Stage("otsu_threshold", [], "otsu_threshold", lambda: None, timed=False))
+
+        # A 1x1 opening changes nothing, so it is skipped
+        if (config["preprocessing"]["morphological_opening"]["enabled"]
+                and self.coarse_opening_kernel != (1, 1)):
+            coarse_morphology_processor = self.coarse_morphology_processor
+            stages.append(Stage("opening", [mask, "coarse_capacity"], "coarse_opened",
+                                lambda binary, capacity: coarse_morphology_processor.apply_morphological_opening(
+                                    binary, dst=self._buffer("coarse_opened", binary.shape, capacity)),
+                                params=self.coarse_opening_kernel))
+            mask = "coarse_opened"
+
+        stages.append(Stage("canny", [mask, "coarse_capacity"], "coarse_edges",
+                            lambda binary, capacity: cv2.Canny(
+                                binary, 30, 100, edges=self._buffer("coarse_edges", binary.shape, capacity))))
+
+        if config["line_detection"]["enabled"]:
+            def hough(edges, coarse_scale, x_offset):
+                hough_lines = self.line_detector.detect(edges, **self.coarse_hough_params)
+                if hough_lines is not None:
+                    # Back to frame coordinates
+                    scale_x, scale_y = coarse_scale
+                    scaled_lines = hough_lines.astype(np.float64)
+                    scaled_lines[:, :, 0::2] = scaled_lines[:, :, 0::2] * scale_x + x_offset
+                    scaled_lines[:, :, 1::2] *= scale_y
+                    hough_lines = np.round(scaled_lines).astype(hough_lines.dtype)
+                instr.increment("hough_lines", 0 if hough_lines is None else len(hough_lines))
+                return hough_lines
+
+            stages.append(Stage("hough", ["coarse_edges", "coarse_scale", "x_offset"], "hough_lines", hough,
+                                params=tuple(self.coarse_hough_params.values())))
+
+        if config["contour_detection"]["enabled"]:
+            def select(contours, small):
+                if not contours:
+                    return None
+                coarse_contour, _ = self.coarse_contour_selector.select_and_process_contour(
+                    contours, small.shape[0], small.shape[1])
+                return coarse_contour
+
+            def refine(gray, coarse_contour, coarse_scale, otsu_threshold, frame_height, frame_width, x_offset):
+                if coarse_contour is None:
+                    return None, None
+                scale_x, scale_y = coarse_scale
+                best_contour = self._refine_contour(gray, coarse_contour, scale_x, scale_y, otsu_threshold,
+                                                    (frame_height, frame_width))
+                best_contour[:, :, 0] += x_offset
+                return best_contour, self.contour_selector.fit_line(best_contour, frame_height, frame_width)
+
+            stages += [
+                Stage("contours", [mask], "coarse_contours", self.contour_detector.detect),
+                Stage("selection", ["coarse_contours", "coarse"], "coarse_contour", select,
+                      params=selection_params),
+                Stage("refine", ["gray", "coarse_contour", "coarse_scale", "otsu_threshold",
+                                 "frame_height", "frame_width", "x_offset"],
+                      ["best_contour", "fitted_line"], refine,
+                      params=(self.refine_margin, config["preprocessing"]["morphological_opening"]["enabled"])
+                      + opening_params),
+            ]
+
+        return StageGraph(stages, inputs=["gray", "frame_height", "frame_width", "x_offset"],
+                          outputs=["hough_lines", "best_contour", "fitted_line", "contour_features"],
+                          instrumentation=instr)
+
+    def _compile_render_graph(self):
+        """
+        Drawing of the detections onto a double-height canvas. Outputs (canvas,).
+
+        The stages are not timed individually; render() times the whole graph.
+        """
+        drawing_config = self.config["drawing"]
+        drawer = self.drawer
+
+        # Prepare canvas with extra space above the image
+        stages = [Stage("prepare_canvas", ["frame"], "canvas", drawer.prepare_canvas, timed=False)]
+
+        # Draw Hough lines if enabled, all in one batched call
+        if drawing_config["lines"]["enabled"]:
+            line_color = drawing_config["lines"]["color"]
+            line_thickness = drawing_config["lines"]["thickness"]
+
+            def draw_lines(canvas, hough_lines):
+                if hough_lines is None:
+                    return canvas
+                return drawer.plot_extrapolated_lines(canvas, hough_lines, color=line_color,
+                                                      thickness=line_thickness)
+
+            stages.append(Stage("draw_lines", ["canvas", "hough_lines"], "canvas", draw_lines, timed=False))
+
+        # Draw the selected contour and its fitted line if found
+        if drawing_config["contours"]["enabled"]:
+            contour_color = drawing_config["contours"]["color"]
+            contour_thickness = drawing_config["contours"]["thickness"]
+            fitted_line_color = drawing_config["contour_fitted_line"]["color"]  # A distinct color for the fitted line
+            fitted_line_thickness = drawing_config["contour_fitted_line"]["thickness"]
+
+            def draw_contour(canvas, best_contour, fitted_line):
+                if best_contour is None:
+                    return canvas
+                # Shift the contour down to the image on the canvas with an offset instead of a copy
+                cv2.drawContours(canvas, [best_contour], -1, contour_color, contour_thickness,
+                                 offset=(0, canvas.shape[0] // 2))
+                if fitted_line is not None:
+                    x1, y1, x2, y2 = fitted_line
+                    canvas = drawer.plot_extrapolated_line(canvas, x1, y1, x2, y2, color=fitted_line_color,
+                                                           thickness=fitted_line_thickness)
+                return canvas
+
+            stages.append(Stage("draw_contour", ["canvas", "best_contour", "fitted_line"], "canvas",
+                                draw_contour, timed=False))
+
+        return StageGraph(stages, inputs=["frame", "hough_lines", "best_contour", "fitted_line"],
+                          outputs=["canvas"], instrumentation=self.instrumentation)
+
+    def process_frame(self, frame, frame_number=None, timestamp=None):
+        """
+        Runs the detection stages on a frame.
+
+        Args:
+            frame (numpy.ndarray): The BGR input frame.
+            frame_number (int): Frame number reported by the MediaLoader.
+            timestamp (float): Timestamp in seconds reported by the MediaLoader.
+
+        Returns:
+            FrameResult: The detections for the frame (without a canvas).
+        """
+        instr = self.instrumentation
+
+        # Get frame dimensions for contour selection
+        frame_height, frame_width = frame.shape[:2]
+
+        frame, frame_loader, gray = self.frame_graph.run(frame)
+
+        # With tracking, the expensive stages only run in a band around the predicted line
+        band = self.line_tracker.search_band(frame_width) if self.line_tracker is not None else None
+        if band is not None:
+            x_start, x_end = band
+            detections = self.detection_graph.run(gray[:, x_start:x_end], frame_height, frame_width, x_start)
+            instr.increment("roi_frames")
+            if detections[2] is None:
+                # Track lost: search the whole frame before giving up on this frame
+                instr.increment("track_lost")
+                band = None
+        if band is None:
+            detections = self.detection_graph.run(gray, frame_height, frame_width, 0)
+            instr.increment("full_frames")
+
+        hough_lines, best_contour, fitted_line_from_contour, contour_features = detections
+        if self.line_tracker is not None:
+            self.line_tracker.update(fitted_line_from_contour, full_search=band is None)
+
+        instr.increment("frames_processed")
+        if best_contour is None:
+            instr.increment("frames_without_contour")
+
+        return FrameResult(frame, frame_number, timestamp, hough_lines,
+                           best_contour, fitted_line_from_contour, contour_features=contour_features,
+                           frame_loader=frame_loader)
+
+    def _otsu_threshold_function(self):
+        """
+        Returns the function that picks and applies the threshold: Otsu's method on every
+        frame, or the temporal threshold that only recomputes it when the histogram drifts.
+        """
+        if self.temporal_threshold is None:
+            return self.preprocessor.apply_otsu_threshold
+        temporal_threshold = self.temporal_threshold
+        instr = self.instrumentation
+
+        def apply(gray_image, dst=None):
+            result = temporal_threshold.apply(gray_image, dst=dst)
+            if temporal_threshold.recomputed:
+                instr.increment("threshold_recomputed")
+            return result
+        return apply
+
+    def reset(self):
+        """
+        Forgets the state carried from frame to frame (line track and temporal threshold), e.g.
+        before frames that do not follow the previous ones.
+        """
+        if self.line_tracker is not None:
+            self.line_tracker.reset()
+        if self.temporal_threshold is not None:
+            self.temporal_threshold.reset()
+
+    def _lazy_correction(self, raw_frame):
+        """
+        Returns a function that undistorts the color frame when called.
+        """
+        def correct():
+            with self.instrumentation.stage("fisheye_color"):
+                return self.geometry_corrector.apply_fisheye_correction(
+                    raw_frame, dst=self._buffer("corrected", raw_frame.shape))
+        return correct
+
+    def _refine_contour(self, gray, coarse_contour, scale_x, scale_y, threshold, capacity):
+        """
+        Re-extracts a contour found at the coarse level from the native-resolution image.
+
+        Only the bounding box of the upscaled contour (plus a margin) is blurred and
+        thresholded, using the threshold chosen at the coarse level. Falls back to the
+        upscaled coarse contour if nothing is found there.
+        """
+        config = self.config
+        height, width = gray.shape[:2]
+        upscaled = np.round(coarse_contour * (scale_x, scale_y)).astype(np.int32)
+        if threshold is None:
+            return upscaled
+
+        x, y, w, h = cv2.boundingRect(upscaled)
+        margin = self.refine_margin
+        x0, y0 = max(0, x - margin), max(0, y - margin)
+        x1, y1 = min(width, x + w + margin), min(height, y + h + margin)
+
+        roi_shape = (y1 - y0, x1 - x0)
+        blur_image = self.preprocessor.apply_blur(gray[y0:y1, x0:x1],
+                                                  dst=self._buffer("refine_blur", roi_shape, capacity))
+        binary = self.preprocessor.apply_binary_threshold(blur_image, threshold=threshold,
+                                                          dst=self._buffer("refine_binary", roi_shape, capacity))
+        if config["preprocessing"]["morphological_opening"]["enabled"]:
+            binary = self.morphology_processor.apply_morphological_opening(
+                binary, dst=self._buffer("refine_opened", roi_shape, capacity))
+
+        contours = self.contour_detector.detect(binary, offset=(x0, y0))
+        if not contours:
+            return upscaled
+
+        # Prefer the contour that contains the centre of the coarse one, else the largest
+        moments = cv2.moments(upscaled)
+        if moments["m00"] != 0:
+            centre = (moments["m10"] / moments["m00"], moments["m01"] / moments["m00"])
+            for contour in contours:
+                if cv2.pointPolygonTest(contour, centre, False) >= 0:
+                    return contour
+        return max(contours, key=cv2.contourArea)
+
+    def _buffer(self, name, shape, capacity=None):
+        """
+        Returns a pooled buffer for an intermediate image, or None (allocate) without a pool.
+        """
+        if self.buffer_pool is None:
+            return None
+        return self.buffer_pool.get(name, shape, capacity=capacity)
+
+    def render(self, result):
+        """
+        Draws the detections of a FrameResult onto a double-height canvas.
+
+        Returns:
+            numpy.ndarray: The canvas (also stored on result.canvas).
+        """
+        with self.instrumentation.stage("render"):
+            return self._render(result)
+
+    def _render(self, result):
+        canvas, = self.render_graph.run(result.frame, result.hough_lines, result.best_contour, result.fitted_line)
+        result.canvas = canvas
+        return canvas
+
+    def run(self, media_loader, render=True):
+        """
+        Processes the frames of a MediaLoader one after another on the calling thread.
+
+        Yields:
+            FrameResult: The result for each frame, in order.
+        """
+        if self.mask_cache is not None:
+            yield from self._run_with_mask_cache(media_loader, render)
+            return
+
+        input_config = self.config.get("input", {})
+        frames = media_loader.iter_frames(prefetch=input_config.get("prefetch", 0),
+                                          num_threads=input_config.get("decode_threads", 1))
+        try:
+            while True:
+                with self.instrumentation.stage("decode"):
+                    item = next(frames, None)
+                if item is None:
+                    break
+
+                frame, frame_number, timestamp = item
+                result = self.process_frame(frame, frame_number, timestamp)
+                if render:
+                    self.render(result)
+                yield result
+        finally:
+            frames.close()
+
+    def _run_with_mask_cache(self, media_loader, render):
+        """
+        Version of run() that reads the binary and edge masks from the mask cache when they
+        are there, and stores them when they are not.
+
+        Without rendering, the frames whose masks are all cached from the current position
+        on are not even decoded; decoding starts (with a seek) at the first missing frame.
+        """
+        instr = self.instrumentation
+        mask_cache = self.mask_cache
+        namespace = mask_cache.namespace(media_loader.input_path, self.config)
+        need_edges = len(self.mask_names) > 1
+
+        def from_cache(entry, frame_number, timestamp, frame_loader=None):
+            binary, edges, cached_timestamp = entry
+            instr.increment("mask_cache_hits")
+            result = self._detect_from_masks(binary, edges, frame_number,
+                                             cached_timestamp if timestamp is None else timestamp,
+                                             frame_loader=frame_loader)
+            if render:
+                self.render(result)
+            return result
+
+        if not render:
+            frame_number = media_loader.frame_count + 1
+            while media_loader.end_frame is None or frame_number <= media_loader.end_frame:
+                with instr.stage("mask_cache_read"):
+                    entry = mask_cache.get(namespace, frame_number, need_edges) \
+                        if mask_cache.contains(namespace, frame_number) else None
+                if entry is None:
+                    break
+                yield from_cache(entry, frame_number, None)
+                frame_number += 1
+            media_loader.seek(frame_number - 1)
+
+        input_config = self.config.get("input", {})
+        frames = media_loader.iter_frames(prefetch=input_config.get("prefetch", 0),
+                                          num_threads=input_config.get("decode_threads", 1))
+        try:
+            while True:
+                with instr.stage("decode"):
+                    item = next(frames, None)
+                if item is None:
+                    break
+
+                frame, frame_number, timestamp = item
+                with instr.stage("mask_cache_read"):
+                    entry = mask_cache.get(namespace, frame_number, need_edges)
+                if entry is not None:
+                    yield from_cache(entry, frame_number, timestamp, self._lazy_color(frame))
+                    continue
+
+                instr.increment("mask_cache_misses")
+                frame_height, frame_width = frame.shape[:2]
+                frame, frame_loader, gray = self.frame_graph.run(frame)
+                masks = self.mask_graph.run(gray, frame_height, frame_width, 0)
+                with instr.stage("mask_cache_write"):
+                    mask_cache.put(namespace, frame_number, masks[0], masks[1] if need_edges else None, timestamp)
+                result = self._detect_from_masks(masks[0], masks[1] if need_edges else None, frame_number,
+                                                 timestamp, frame, frame_loader)
+                if render:
+                    self.render(result)
+                yield result
+        finally:
+            frames.close()
+
+    def _detect_from_masks(self, binary, edges, frame_number, timestamp, frame=None, frame_loader=None):
+        frame_height, frame_width = binary.shape[:2]
+        hough_lines, best_contour, fitted_line, contour_features = self.from_mask_graph.run(
+            binary, edges, frame_height, frame_width, 0)
+
+        self.instrumentation.increment("frames_processed")
+        if best_contour is None:
+            self.instrumentation.increment("frames_without_contour")
+        return FrameResult(frame, frame_number, timestamp, hough_lines, best_contour, fitted_line,
+                           contour_features=contour_features, frame_loader=frame_loader)
+
+    def _lazy_color(self, raw_frame):
+        """
+        Returns a function that runs fisheye correction on the color frame when called.
+        """
+        def load():
+            frame, frame_loader = self.color_graph.run(raw_frame)
+            return frame if frame is not None else frame_loader()
+        return load
+
+    def replay(self, media_loader, detection_log):
+        """
+        Redraws logged detections onto the frames of a MediaLoader without running detection.
+
+        Only fisheye correction and drawing run. Frames without a record in the log (e.g.
+        frames skipped in real-time mode) are skipped.
+
+        Args:
+            media_loader (MediaLoader): The input the log was recorded from.
+            detection_log (DetectionLog): The logged detections.
+
+        Yields:
+            FrameResult: A rendered result for each logged frame, in order.
+        """
+        input_config = self.config.get("input", {})
+        frames = media_loader.iter_frames(prefetch=input_config.get("prefetch", 0),
+                                          num_threads=input_config.get("decode_threads", 1))
+        try:
+            for frame, frame_number, _ in frames:
+                index = detection_log.find(frame_number)
+                if index is None:
+                    continue
+                if self.config["fisheye_correction"]["enabled"]:
+                    with self.instrumentation.stage("fisheye"):
+                        frame = self.geometry_corrector.apply_fisheye_correction(
+                            frame, dst=self._buffer("corrected", frame.shape))
+                result = detection_log.result(index, frame)
+                self.render(result)
+                yield result
+        finally:
+            frames.close()
@@ -0,0 +1,232 @@
+import copy
+import threading
+import time
+
+import cv2
+
+from instrumentation import Instrumentation
+from pipeline import DetectionPipeline, create_geometry_corrector
+
+
+class LatestFrameGrabber:
+    """
+    Reads frames from a MediaLoader on a background thread and keeps only the newest one.
+
+    When frames arrive faster than they are consumed, older unread frames are dropped
+    (and counted), so the consumer always gets the freshest frame. The frame number and
+    timestamp from the MediaLoader are kept with each frame so results can still be
+    aligned downstream. For video files, reads can be paced at the file's frame rate to
+    behave like a live source.
+    """
+    def __init__(self, media_loader, pace=False, fps=None):
+        """
+        Args:
+            media_loader (MediaLoader): The frame source.
+            pace (bool): Read at most fps frames per second (for replaying recorded video as live input).
+            fps (float): Frame rate used for pacing (defaults to the video's FPS, or 30).
+        """
+        self.media_loader = media_loader
+        self.pace = pace
+        if fps is None and media_loader.is_video:
+            fps = media_loader.cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps and fps > 0 else 30.0
+
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self._latest = None
+        self._finished = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._read_loop, name="grabber", daemon=True)
+        self._thread.start()
+
+    def _read_loop(self):
+        next_time = time.monotonic()
+        try:
+            while not self._stop_event.is_set():
+                if self.pace:
+                    delay = next_time - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_time += 1.0 / self.fps
+
+                frame, frame_number, timestamp = self.media_loader.get_next_frame()
+                if frame is None:
+                    break
+                with self._condition:
+                    if self._latest is not None:
+                        self.frames_dropped += 1  # The previous frame was never consumed
+                    self._latest = (frame, frame_number, timestamp)
+                    self.frames_read += 1
+                    self._condition.notify()
+        except Exception as exc:
+            self._error = exc
+        finally:
+            with self._condition:
+                self._finished = True
+                self._condition.notify()
+
+    def get(self):
+        """
+        Blocks until a frame newer than the last one returned is available.
+
+        Returns:
+            tuple: (frame, frame_number, timestamp), or None once the input is exhausted.
+        """
+        with self._condition:
+            while self._latest is None and not self._finished:
+                self._condition.wait()
+            if self._error is not None:
+                raise self._error
+            item, self._latest = self._latest, None
+            return item
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class RealtimeProcessor:
+    """
+    Processes the freshest available frame under a per-frame latency budget.
+
+    Frames that arrive while a frame is being processed are skipped. If degrade_frames
+    consecutive frames exceed the deadline, the processor degrades step by step:
+    level 1 turns off Hough line detection, level 2 additionally runs detection on a
+    downscaled image (pyramid mode). It steps back up once latency stays comfortably
+    below the deadline. Skipped frames and frames processed at a degraded level are
+    counted and reported.
+    """
+    def __init__(self, config, deadline_ms=33.0, degrade=True, pace=False, render=True,
+                 degrade_frames=3, recover_ratio=0.6, recover_frames=30, instrumentation=None):
+        """
+        Args:
+            config (dict): The CONFIG dictionary.
+            deadline_ms (float): Per-frame processing budget in milliseconds.
+            degrade (bool): Whether to switch off stages when the budget is exceeded.
+            pace (bool): Pace video files at their frame rate, as if they were a live feed.
+            render (bool): Whether to draw the detections onto a canvas.
+            degrade_frames (int): Step down a level once this many consecutive frames exceed the deadline.
+            recover_ratio (float): Step back up a level once the smoothed latency stays below
+                                   recover_ratio * deadline for recover_frames consecutive frames.
+            recover_frames (int): See recover_ratio.
+            instrumentation (Instrumentation): Optional stage timers and counters.
+        """
+        self.deadline = deadline_ms / 1000.0
+        self.degrade = degrade
+        self.pace = pace
+        self.render = render
+        self.degrade_frames = max(1, degrade_frames)
+        self.recover_ratio = recover_ratio
+        self.recover_frames = recover_frames
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+
+        # One pipeline per degradation level, sharing the undistortion maps
+        geometry_corrector = create_geometry_corrector(config)
+        self.geometry_corrector = geometry_corrector
+        self.fisheye_enabled = config["fisheye_correction"]["enabled"]
+        self.pipelines = [DetectionPipeline(config, geometry_corrector=geometry_corrector,
+                                            instrumentation=self.instrumentation)]
+        if degrade:
+            no_lines = copy.deepcopy(config)
+            no_lines["line_detection"]["enabled"] = False
+            self.pipelines.append(DetectionPipeline(no_lines, geometry_corrector=geometry_corrector,
+                                                    instrumentation=self.instrumentation))
+            if not config.get("pyramid", {}).get("enabled", False):
+                low_resolution = copy.deepcopy(no_lines)
+                low_resolution["pyramid"] = dict(low_resolution.get("pyramid", {}), enabled=True)
+                self.pipelines.append(DetectionPipeline(low_resolution, geometry_corrector=geometry_corrector,
+                                                        instrumentation=self.instrumentation))
+
+        self.level = 0
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.frames_over_deadline = 0
+        self.frames_per_level = [0] * len(self.pipelines)
+        self._latency = None
+        self._frames_over = 0
+        self._frames_below = 0
+
+    def _adapt(self, latency):
+        # Stepping down needs several consecutive frames over the deadline, so a single slow
+        # frame does not change the level; stepping up uses an exponential moving average
+        self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        self._frames_over = self._frames_over + 1 if latency > self.deadline else 0
+
+        if self._frames_over >= self.degrade_frames and self.level < len(self.pipelines) - 1:
+            self.level += 1
+            self.instrumentation.increment("degrade_steps")
+            self._latency = None
+            self._frames_over = 0
+            self._frames_below = 0
+        elif self.level > 0 and self._latency < self.recover_ratio * self.deadline:
+            self._frames_below += 1
+            if self._frames_below >= self.recover_frames:
+                self.level -= 1
+                self._latency = None
+                self._frames_over = 0
+                self._frames_below = 0
+        else:
+            self._frames_below = 0
+
+    def run(self, media_loader):
+        """
+        Yields a FrameResult for each processed frame, always for the freshest frame available.
+        Each result has degradation_level set to the level it was processed at.
+        """
+        grabber = LatestFrameGrabber(media_loader, pace=self.pace)
+        grabber.start()
+        try:
+            while True:
+                item = grabber.get()
+                if item is None:
+                    break
+                frame, frame_number, timestamp = item
+
+                if self.fisheye_enabled:
+                    # Build the undistortion maps of a new frame size before the timer starts,
+                    # so the frame that builds them does not count against the deadline
+                    self.geometry_corrector.get_undistortion_maps(frame.shape[1], frame.shape[0])
+
+                level = self.level
+                pipeline = self.pipelines[level]
+                start = time.perf_counter()
+                result = pipeline.process_frame(frame, frame_number, timestamp)
+                if self.render:
+                    pipeline.render(result)
+                latency = time.perf_counter() - start
+
+                result.degradation_level = level
+                self.frames_processed += 1
+                self.frames_per_level[level] += 1
+                if latency > self.deadline:
+                    self.frames_over_deadline += 1
+                    self.instrumentation.increment("frames_over_deadline")
+                if level > 0:
+                    self.instrumentation.increment("frames_degraded")
+
+                skipped = grabber.frames_dropped - self.frames_skipped
+                if skipped:
+                    self.instrumentation.increment("frames_skipped", skipped)
+                    self.frames_skipped = grabber.frames_dropped
+
+                if self.degrade:
+                    self._adapt(latency)
+                yield result
+        finally:
+            grabber.stop()
+            self.frames_skipped = grabber.frames_dropped
+
+    def summary(self):
+        """
+        Returns a one-line report of processed, skipped and degraded frames.
+        """
+        levels = ", ".join(f"level {i}: {n}" for i, n in enumerate(self.frames_per_level))
+        return (f"Real-time: processed {self.frames_processed} frames, skipped {self.frames_skipped}, "
+                f"{self.frames_over_deadline} over the {self.deadline * 1000:.0f}ms deadline ({levels}).")
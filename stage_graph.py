@@ -0,0 +1,109 @@
+from instrumentation import Instrumentation
+
+
+class Stage:
+    """
+    One step of a StageGraph: a function from named inputs to named outputs.
+    """
+    def __init__(self, name, inputs, outputs, function, timed=True, params=()):
+        """
+        Args:
+            name (str): Stage name, also used as the instrumentation stage name.
+            inputs (list): Names of the values passed to function, in order.
+            outputs (str or list): Name of the value function returns, or names of the
+                                   values in the tuple it returns.
+            function (callable): Called with the input values as positional arguments.
+            timed (bool): Whether to time the stage with the graph's instrumentation (turn
+                          off for trivial stages that would only add noise to the stats).
+            params (tuple): Hashable config values the outputs depend on besides the inputs,
+                            so outputs can be memoized by (name, params, inputs).
+        """
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.single_output = isinstance(outputs, str)
+        self.outputs = (outputs,) if self.single_output else tuple(outputs)
+        self.function = function
+        self.timed = timed
+        self.params = tuple(params)
+
+
+class StageGraph:
+    """
+    A list of stages compiled once, of which only the ones that are needed run.
+
+    Stages are given in evaluation order and each one may only consume the graph
+    inputs and the outputs of earlier stages. At construction the graph walks back
+    from the requested outputs and drops every stage whose outputs are never
+    consumed, so e.g. an edge map that only Hough detection reads is not computed
+    when Hough detection is not part of the graph. Requested outputs that no stage
+    produces (because their stage is disabled) are returned as None.
+    """
+    def __init__(self, stages, inputs, outputs, instrumentation=None):
+        """
+        Args:
+            stages (list): Stage objects in evaluation order.
+            inputs (list): Names of the values passed to run().
+            outputs (list): Names of the values returned by run(), in order.
+            instrumentation (Instrumentation): Optional stage timers.
+        """
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+
+        available = set(self.inputs)
+        for stage in stages:
+            missing = [name for name in stage.inputs if name not in available]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' consumes {missing}, which no earlier stage produces")
+            available.update(stage.outputs)
+
+        self.stages = self._prune(stages, self.outputs)
+
+    @staticmethod
+    def _prune(stages, outputs):
+        # Keep only the stages that (transitively) feed one of the outputs
+        needed = set(outputs)
+        kept = []
+        for stage in reversed(stages):
+            if needed.intersection(stage.outputs):
+                kept.append(stage)
+                needed.update(stage.inputs)
+        return kept[::-1]
+
+    def stages_for(self, outputs):
+        """
+        Returns the stages needed for a subset of the outputs, in evaluation order.
+        """
+        return self._prune(self.stages, outputs)
+
+    @property
+    def stage_names(self):
+        """
+        Names of the stages that run, in evaluation order.
+        """
+        return [stage.name for stage in self.stages]
+
+    def run(self, *inputs):
+        """
+        Evaluates the graph.
+
+        Args:
+            *inputs: Values of the graph inputs, in the order given at construction.
+
+        Returns:
+            tuple: Values of the requested outputs (None for outputs no stage produces).
+        """
+        values = dict(zip(self.inputs, inputs))
+        instr = self.instrumentation
+        for stage in self.stages:
+            args = [values[name] for name in stage.inputs]
+            if stage.timed:
+                with instr.stage(stage.name):
+                    result = stage.function(*args)
+            else:
+                result = stage.function(*args)
+            if stage.single_output:
+                values[stage.outputs[0]] = result
+            else:
+                values.update(zip(stage.outputs, result))
+        return tuple(values.get(name) for name in self.outputs)
@@ -0,0 +1,111 @@
+import numpy as np
+import cv2
+
+RESOLUTIONS = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+
+class SyntheticFrame:
+    """
+    A synthetic UAV frame together with the geometry it was generated from.
+    """
+    def __init__(self, image, undistorted, expected_line):
+        self.image = image  # Fisheye-distorted BGR frame, as the camera would record it
+        self.undistorted = undistorted  # The scene before distortion
+        self.expected_line = expected_line  # (x_top, y_top, x_bottom, y_bottom) of the pole's centre line
+
+
+class SyntheticFrameGenerator:
+    """
+    Generates fisheye-distorted frames containing a pole of known geometry.
+
+    The scene is drawn in undistorted coordinates: a bright pole running from the
+    top to the bottom of the frame (with slightly irregular edges, like a real
+    pole against the ground), a few thin line structures for the Hough stage and
+    small blobs that mimic vegetation and rooftops. It is then distorted with the
+    same camera model GeometryCorrector undoes, so after correction the pole's
+    centre line is exactly expected_line.
+    """
+    def __init__(self, k1=0.2, k2=0.13, seed=0):
+        """
+        Args:
+            k1 (float): First radial distortion coefficient.
+            k2 (float): Second radial distortion coefficient.
+            seed (int): Seed for the random clutter and noise.
+        """
+        self.k1 = k1
+        self.k2 = k2
+        self.seed = seed
+
+    def _distortion_maps(self, width, height):
+        # For every pixel of the distorted image, find where it lies in the undistorted scene
+        camera_matrix = np.array([[width / 2, 0, width / 2],
+                                  [0, height / 2, height / 2],
+                                  [0, 0, 1]], dtype=np.float64)
+        dist_coeffs = np.array([self.k1, self.k2, 0, 0], dtype=np.float64)
+
+        xs, ys = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+        points = np.stack([xs.ravel(), ys.ravel()], axis=1).reshape(-1, 1, 2)
+        undistorted = cv2.fisheye.undistortPoints(points, camera_matrix, dist_coeffs, P=camera_matrix)
+        undistorted = undistorted.reshape(height, width, 2).astype(np.float32)
+        return undistorted[..., 0], undistorted[..., 1]
+
+    def generate(self, width, height, pole_x_top=None, pole_x_bottom=None):
+        """
+        Generates one frame.
+
+        Args:
+            width (int): Frame width.
+            height (int): Frame height.
+            pole_x_top (float): x of the pole's centre at the top (defaults to 45% of the width).
+            pole_x_bottom (float): x of the pole's centre at the bottom (defaults to 52% of the width).
+
+        Returns:
+            SyntheticFrame: The distorted frame and its ground truth.
+        """
+        rng = np.random.default_rng(self.seed)
+        pole_x_top = 0.45 * width if pole_x_top is None else pole_x_top
+        pole_x_bottom = 0.52 * width if pole_x_bottom is None else pole_x_bottom
+        pole_width = max(120, int(0.1 * width))  # ContourSelector discards narrow contours (< 100 px)
+
+        scene = np.full((height, width, 3), 40, dtype=np.uint8)
+
+        line_offsets = (0.12, 0.85)
+
+        # Small bright blobs (vegetation, rooftops) away from the pole and the lines
+        for _ in range(60):
+            cx = int(rng.uniform(0, width))
+            if abs(cx - (pole_x_top + pole_x_bottom) / 2) < pole_width * 1.5:
+                continue
+            if any(-0.03 * width < cx - offset * width < 0.06 * width for offset in line_offsets):
+                continue
+            cy = int(rng.uniform(0, height))
+            axes = (int(rng.uniform(3, 0.02 * width)), int(rng.uniform(3, 0.02 * width)))
+            cv2.ellipse(scene, (cx, cy), axes, rng.uniform(0, 180), 0, 360, (200, 200, 200), -1)
+
+        # Thin line structures (cables, fences) for the Hough stage
+        for offset in line_offsets:
+            x = int(offset * width)
+            cv2.line(scene, (x, 0), (x + int(0.03 * width), height - 1), (220, 220, 220), max(4, width // 320))
+
+        # The pole, with a small wobble on both edges so it is not a clean 4-vertex polygon
+        ys = np.arange(height, dtype=np.float64)
+        centre = pole_x_top + (pole_x_bottom - pole_x_top) * ys / (height - 1)
+        wobble = 0.06 * pole_width * np.sin(ys / max(8.0, height / 60.0))
+        left = centre - pole_width / 2 + wobble
+        right = centre + pole_width / 2 + wobble
+        polygon = np.concatenate([np.stack([left, ys], axis=1), np.stack([right, ys], axis=1)[::-1]])
+        cv2.fillPoly(scene, [np.round(polygon).astype(np.int32)], (235, 235, 235))
+
+        # Sensor noise
+        noise = rng.integers(0, 20, scene.shape, dtype=np.uint8)
+        scene = cv2.add(scene, noise)
+
+        map_x, map_y = self._distortion_maps(width, height)
+        image = cv2.remap(scene, map_x, map_y, interpolation=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+        expected_line = (pole_x_top, 0, pole_x_bottom, height - 1)
+        return SyntheticFrame(image, scene, expected_line)
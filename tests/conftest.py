@@ -0,0 +1,76 @@
+import copy
+import os
+import sys
+
+import cv2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CONFIG  # noqa: E402
+from synthetic_frames import SyntheticFrameGenerator  # noqa: E402
+
+CLIP_SIZE = (640, 360)
+CLIP_FRAMES = 8
+CLIP_FPS = 10.0
+
+
+def summarize(result):
+    """
+    The detections of a FrameResult as plain values, for comparing runs.
+    """
+    hough_lines = None
+    if result.hough_lines is not None:
+        hough_lines = sorted(tuple(int(v) for v in line) for line in result.hough_lines.reshape(-1, 4))
+    fitted_line = tuple(int(v) for v in result.fitted_line) if result.fitted_line is not None else None
+    return result.frame_number, fitted_line, hough_lines
+
+
+@pytest.fixture
+def config():
+    return copy.deepcopy(CONFIG)
+
+
+@pytest.fixture(scope="session")
+def clip_frames():
+    """
+    Fisheye-distorted synthetic frames of a pole that drifts to the right.
+    """
+    generator = SyntheticFrameGenerator(seed=0)
+    width, height = CLIP_SIZE
+    return [generator.generate(width, height, pole_x_top=280 + 4 * i, pole_x_bottom=320 + 4 * i).image
+            for i in range(CLIP_FRAMES)]
+
+
+@pytest.fixture(scope="session")
+def video_path(clip_frames, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("video") / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), CLIP_FPS, CLIP_SIZE)
+    for frame in clip_frames:
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture(scope="session")
+def image_dir(clip_frames, tmp_path_factory):
+    directory = tmp_path_factory.mktemp("images")
+    for i, frame in enumerate(clip_frames):
+        cv2.imwrite(str(directory / f"frame_{i:03d}.png"), frame)
+    return str(directory)
+
+
+@pytest.fixture(scope="session")
+def baseline_detections(video_path):
+    """
+    Detections of the sequential pipeline with the default CONFIG on the synthetic video.
+    """
+    from media_loader import MediaLoader
+    from pipeline import DetectionPipeline
+
+    pipeline = DetectionPipeline(copy.deepcopy(CONFIG))
+    media_loader = MediaLoader(video_path)
+    try:
+        return [summarize(result) for result in pipeline.run(media_loader, render=False)]
+    finally:
+        media_loader.release()
@@ -0,0 +1,58 @@
+import cv2
+
+import batch_runner
+from batch_runner import BatchRunner
+from media_loader import MediaLoader
+from pipeline import DetectionPipeline
+from conftest import summarize
+
+
+def test_shards_cover_the_input_in_order(config, video_path):
+    shards = BatchRunner(config, num_processes=2, shards_per_process=2).make_shards(video_path)
+
+    assert len(shards) == 4
+    assert shards[0][1] == 0
+    for (_, _, end), (_, start, _) in zip(shards, shards[1:]):
+        assert end == start
+    assert shards[-1][2] is None  # The last shard reads to the end of the video
+
+
+def test_merged_detections_are_in_frame_order(config, video_path):
+    config["tracking"]["enabled"] = False  # Each shard starts without a track
+    config["temporal_threshold"]["enabled"] = False
+    pipeline = DetectionPipeline(config)
+    media_loader = MediaLoader(video_path)
+    try:
+        expected = [summarize(result) for result in pipeline.run(media_loader, render=False)]
+    finally:
+        media_loader.release()
+
+    results = list(BatchRunner(config, num_processes=2, shards_per_process=2).run(video_path))
+    assert [summarize(result) for result in results] == expected
+
+
+def test_shard_results_only_keep_what_the_writers_use(config, video_path):
+    pipeline = DetectionPipeline(config)
+    media_loader = MediaLoader(video_path)
+    try:
+        boxes = [None if result.best_contour is None else cv2.boundingRect(result.best_contour)
+                 for result in pipeline.run(media_loader, render=False)]
+    finally:
+        media_loader.release()
+
+    results = list(BatchRunner(config, num_processes=1, shards_per_process=1).run(video_path))
+    assert any(box is not None for box in boxes)
+    for result, box in zip(results, boxes):
+        assert result.frame is None
+        assert result.contour_features is None
+        if box is None:
+            assert result.best_contour is None
+        else:
+            assert result.best_contour.shape == (4, 1, 2)
+            assert cv2.boundingRect(result.best_contour) == box
+
+
+def test_workers_share_the_mask_cache_limit(config, tmp_path):
+    config["mask_cache"].update(enabled=True, directory=str(tmp_path))
+    batch_runner._init_worker(config, 4)
+    assert batch_runner._worker_pipeline.mask_cache.num_processes == 4
@@ -0,0 +1,37 @@
+import numpy as np
+
+from benchmark import StageBenchmark, check_geometry, compare_to_baseline
+from synthetic_frames import SyntheticFrameGenerator
+
+
+def test_generator_is_deterministic():
+    first = SyntheticFrameGenerator(seed=3).generate(320, 180)
+    second = SyntheticFrameGenerator(seed=3).generate(320, 180)
+    assert np.array_equal(first.image, second.image)
+    assert first.expected_line == (0.45 * 320, 0, 0.52 * 320, 179)
+    assert not np.array_equal(first.image, SyntheticFrameGenerator(seed=4).generate(320, 180).image)
+
+
+def test_benchmark_times_every_stage_and_finds_the_pole(config):
+    frame = SyntheticFrameGenerator(seed=0).generate(1280, 720)
+    report = StageBenchmark(config, iterations=2, warmup=1).run_resolution(frame)
+
+    assert {"apply_fisheye_correction", "apply_blur", "line_detection", "select_and_process_contour",
+            "end_to_end"} <= set(report["stages"])
+    assert all(stats["p50_ms"] > 0 for stats in report["stages"].values())
+    assert report["geometry"]["passed"]
+
+
+def test_geometry_check_fails_without_a_line():
+    frame = SyntheticFrameGenerator(seed=0).generate(320, 180)
+    assert not check_geometry(None, frame)["passed"]
+
+
+def test_regressions_are_reported_per_stage():
+    def report(blur_ms, canny_ms):
+        return {"results": {"720p": {"stages": {"apply_blur": {"p50_ms": blur_ms},
+                                                "canny": {"p50_ms": canny_ms}}}}}
+
+    regressions = compare_to_baseline(report(1.5, 1.05), report(1.0, 1.0), max_regression=0.1)
+    assert [(resolution, stage) for resolution, stage, *_ in regressions] == [("720p", "apply_blur")]
+    assert compare_to_baseline(report(1.5, 1.0), {"results": {}}) == []
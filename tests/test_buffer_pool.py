@@ -0,0 +1,42 @@
+import numpy as np
+
+from buffer_pool import BufferPool
+from pipeline import DetectionPipeline
+from conftest import summarize
+
+
+def test_buffers_are_reused_per_name_dtype_and_shape():
+    pool = BufferPool()
+    blur = pool.get("blur", (36, 64))
+    assert pool.get("blur", (36, 64)) is blur
+    assert pool.get("edges", (36, 64)) is not blur
+    assert pool.get("blur", (36, 64), dtype=np.float32).dtype == np.float32
+    assert pool.nbytes == 36 * 64 * (1 + 1 + 4)
+
+    pool.clear()
+    assert pool.nbytes == 0
+
+
+def test_smaller_shapes_are_views_of_the_capacity_buffer():
+    pool = BufferPool()
+    band = pool.get("binary", (36, 20), capacity=(36, 64))
+    wider_band = pool.get("binary", (36, 30), capacity=(36, 64))
+    assert band.shape == (36, 20) and wider_band.shape == (36, 30)
+    assert np.shares_memory(band, wider_band)
+    assert pool.nbytes == 36 * 64
+
+
+def test_pooled_pipeline_stops_allocating_and_matches_unpooled(config, clip_frames):
+    config["tracking"]["enabled"] = True  # Bands of changing width go into full-frame buffers
+    pooled = DetectionPipeline(config)
+    unpooled = DetectionPipeline(config, reuse_buffers=False)
+    assert unpooled.buffer_pool is None
+
+    sizes = []
+    for i, frame in enumerate(clip_frames):
+        result = pooled.process_frame(frame, i + 1)
+        pooled.render(result)
+        expected = unpooled.process_frame(frame, i + 1)
+        assert summarize(result) == summarize(expected)
+        sizes.append(pooled.buffer_pool.nbytes)
+    assert len(set(sizes[1:])) == 1
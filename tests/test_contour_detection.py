@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+
+from contour_detection import ContourAnalyzer, ContourDetector, ContourSelector
+from pipeline import DetectionPipeline
+
+
+def frame_contours(config, frame):
+    pipeline = DetectionPipeline(config)
+    gray = pipeline.preprocessor.convert_to_grayscale(pipeline.geometry_corrector.apply_fisheye_correction(frame))
+    binary = pipeline.preprocessor.apply_binary_threshold(pipeline.preprocessor.apply_blur(gray))
+    opened = pipeline.morphology_processor.apply_morphological_opening(binary)
+    return ContourDetector().detect(opened), gray.shape
+
+
+def test_batched_features_match_opencv(config, clip_frames):
+    contours, _ = frame_contours(config, clip_frames[0])
+    assert len(contours) > 10
+
+    features = ContourAnalyzer().analyze(contours)
+    assert np.allclose(features.table["area"], [cv2.contourArea(c) for c in contours])
+    boxes = np.stack([features.table[name] for name in ("x", "y", "w", "h")], axis=1)
+    assert np.array_equal(boxes, [cv2.boundingRect(c) for c in contours])
+    assert (features.table["vertices"] == -1).all()  # Not computed until asked for
+
+
+def test_vertex_counts_are_only_computed_for_candidates(config, clip_frames):
+    contours, _ = frame_contours(config, clip_frames[0])
+    features = ContourAnalyzer().analyze(contours)
+    candidates = features.candidates(min_area=1000, max_aspect_ratio=5, min_approx_vertices=4,
+                                     max_approx_vertices=4)
+
+    computed = np.flatnonzero(features.table["vertices"] >= 0)
+    assert 0 < len(computed) < len(contours)
+    assert set(candidates) <= set(computed)
+    assert (features.table["area"][computed] >= 1000).all()
+
+
+def test_shared_features_give_the_same_selection(config, clip_frames):
+    selector = ContourSelector()
+    for frame in clip_frames:
+        contours, (height, width) = frame_contours(config, frame)
+        best, fitted_line = selector.select_and_process_contour(contours, height, width)
+        shared_best, shared_line = selector.select_and_process_contour(
+            contours, height, width, features=ContourAnalyzer().analyze(contours))
+        assert fitted_line is not None and fitted_line == shared_line
+        assert np.array_equal(best, shared_best)
+
+
+def test_empty_contour_list():
+    assert len(ContourAnalyzer().analyze([])) == 0
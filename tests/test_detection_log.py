@@ -0,0 +1,105 @@
+import cv2
+import numpy as np
+import pytest
+
+from detection_log import DetectionLog, DetectionLogWriter, RECORD_DTYPE
+from media_loader import MediaLoader
+from pipeline import DetectionPipeline, FrameResult
+
+
+def write_log(path, results):
+    writer = DetectionLogWriter(path)
+    try:
+        for result in results:
+            writer.write(result)
+    finally:
+        writer.close()
+
+
+def detections(config, video_path):
+    pipeline = DetectionPipeline(config)
+    media_loader = MediaLoader(video_path)
+    try:
+        return [pipeline.process_frame(frame, frame_number, timestamp)
+                for frame, frame_number, timestamp in media_loader.iter_frames()]
+    finally:
+        media_loader.release()
+
+
+def test_round_trip(config, video_path, tmp_path):
+    results = detections(config, video_path)
+    results[2].hough_lines = None  # Hough detection skipped
+    results[3].hough_lines = np.empty((0, 1, 4), dtype=np.int32)  # Ran but found nothing
+    results[4].best_contour = results[4].fitted_line = None
+    results[5].degradation_level = 2
+    path = str(tmp_path / "detections.dlog")
+    write_log(path, results)
+
+    log = DetectionLog(path)
+    assert len(log) == len(results)
+    for index, expected in enumerate(results):
+        result = log.result(index)
+        assert result.frame_number == expected.frame_number
+        assert result.timestamp == pytest.approx(expected.timestamp)
+        assert result.fitted_line == expected.fitted_line
+        assert result.degradation_level == expected.degradation_level
+        if expected.hough_lines is None:
+            assert result.hough_lines is None
+        else:
+            assert np.array_equal(result.hough_lines, expected.hough_lines.reshape(-1, 1, 4))
+        if expected.best_contour is None:
+            assert result.best_contour is None
+        else:
+            assert cv2.boundingRect(result.best_contour) == cv2.boundingRect(expected.best_contour)
+    assert log.hough_lines(3).shape == (0, 1, 4)
+    log.close()
+
+
+def test_find_and_missing_timestamps(tmp_path):
+    results = [FrameResult(None, frame_number, None) for frame_number in (1, 2, 5, 9)]
+    path = str(tmp_path / "detections.dlog")
+    write_log(path, results)
+
+    log = DetectionLog(path)
+    assert [log.find(n) for n in (1, 5, 9, 3, 10)] == [0, 2, 3, None, None]
+    assert log.result(1).timestamp is None
+    log.close()
+
+
+def test_truncated_log_is_readable_up_to_the_last_complete_record(tmp_path):
+    results = [FrameResult(None, frame_number, frame_number / 10, fitted_line=(1, 2, 3, 4))
+               for frame_number in range(1, 6)]
+    path = str(tmp_path / "detections.dlog")
+    write_log(path, results)
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - RECORD_DTYPE.itemsize // 2)
+
+    log = DetectionLog(path)
+    assert len(log) == 4
+    assert log.result(3).frame_number == 4
+    log.close()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_log.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        DetectionLog(str(path))
+
+
+def test_replay_draws_the_logged_detections(config, video_path, tmp_path):
+    results = detections(config, video_path)
+    path = str(tmp_path / "detections.dlog")
+    write_log(path, results)
+
+    pipeline = DetectionPipeline(config)
+    media_loader = MediaLoader(video_path)
+    log = DetectionLog(path)
+    try:
+        replayed = list(pipeline.replay(media_loader, log))
+    finally:
+        media_loader.release()
+        log.close()
+    assert [result.frame_number for result in replayed] == [result.frame_number for result in results]
+    assert all(result.canvas is not None for result in replayed)
+    assert [result.fitted_line for result in replayed] == [result.fitted_line for result in results]
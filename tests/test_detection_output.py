@@ -0,0 +1,77 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from detection_log import DetectionLogWriter
+from detection_output import DetectionWriter, create_detection_writer
+from pipeline import FrameResult
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def make_results():
+    found = FrameResult(None, 1, 0.0, hough_lines=np.array([[[1, 2, 3, 4]]], dtype=np.int32),
+                        fitted_line=(5, 0, 6, 99))
+    nothing_found = FrameResult(None, 2, 0.1, hough_lines=np.empty((0, 1, 4), dtype=np.int32))
+    skipped = FrameResult(None, 3, 0.2, hough_lines=None, fitted_line=(5, 0, 7, 99))
+    skipped.degradation_level = 1
+    return [found, nothing_found, skipped]
+
+
+def test_jsonl_distinguishes_skipped_hough_from_no_lines(tmp_path):
+    path = str(tmp_path / "detections.jsonl")
+    writer = DetectionWriter(path)
+    for result in make_results():
+        writer.write(result)
+    writer.close()
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["hough_lines"] for r in records] == [[[1, 2, 3, 4]], [], None]
+    assert [r["fitted_line"] for r in records] == [[5, 0, 6, 99], None, [5, 0, 7, 99]]
+    assert [r["degradation_level"] for r in records] == [0, 0, 1]
+
+
+def test_csv_distinguishes_skipped_hough_from_no_lines(tmp_path):
+    path = str(tmp_path / "detections.csv")
+    writer = DetectionWriter(path)
+    for result in make_results():
+        writer.write(result)
+    writer.close()
+
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["frame_number"], r["kind"], r["degradation_level"]) for r in rows] == [
+        ("1", "hough", "0"), ("1", "fitted_line", "0"),
+        ("2", "none", "0"),
+        ("3", "hough_skipped", "1"), ("3", "fitted_line", "1"),
+    ]
+
+
+def test_format_is_inferred_from_the_extension(tmp_path):
+    for name, expected in [("d.jsonl", DetectionWriter), ("d.csv", DetectionWriter), ("d.bin", DetectionLogWriter)]:
+        writer = create_detection_writer(str(tmp_path / name))
+        assert type(writer) is expected
+        writer.close()
+    assert create_detection_writer(str(tmp_path / "d.txt")).output_format == "jsonl"
+    with pytest.raises(ValueError):
+        DetectionWriter(str(tmp_path / "d.xml"), "xml")
+
+
+@pytest.mark.parametrize("mode", [[], ["--workers", "2"], ["--processes", "2"]])
+def test_headless_run_writes_every_frame(mode, video_path, baseline_detections, tmp_path):
+    path = str(tmp_path / "detections.jsonl")
+    subprocess.run([sys.executable, MAIN, video_path, "--headless", "--detections", path,
+                    "--output_dir", str(tmp_path / "output")] + mode,
+                   check=True, capture_output=True, timeout=120)
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["frame_number"] for r in records] == [frame_number for frame_number, _, _ in baseline_detections]
+    fitted_lines = [None if r["fitted_line"] is None else tuple(r["fitted_line"]) for r in records]
+    assert fitted_lines == [fitted_line for _, fitted_line, _ in baseline_detections]
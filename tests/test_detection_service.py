@@ -0,0 +1,114 @@
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from detection_service import (DetectionClient, DetectionService, REQUEST_DTYPE, REQUEST_MAGIC, RESPONSE_DTYPE,
+                               STATUS_ERROR)
+from media_loader import MediaLoader
+from pipeline import DetectionPipeline
+from conftest import summarize
+
+
+@pytest.fixture
+def socket_path(config, tmp_path):
+    path = str(tmp_path / "service.sock")
+    service = DetectionService(config, socket_path=path)
+    thread = threading.Thread(target=service.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    service.shutdown()
+    thread.join()
+    service.close()
+
+
+@pytest.fixture(scope="module")
+def video_frames(video_path):
+    media_loader = MediaLoader(video_path)
+    try:
+        return list(media_loader.iter_frames())
+    finally:
+        media_loader.release()
+
+
+def detect_all(socket_path, frames):
+    with DetectionClient(socket_path, timeout=30) as client:
+        return [client.detect(frame, frame_number, timestamp)[0] for frame, frame_number, timestamp in frames]
+
+
+def test_detections_match_the_sequential_pipeline(socket_path, video_frames, baseline_detections):
+    results = detect_all(socket_path, video_frames)
+    assert [summarize(result) for result in results] == baseline_detections
+    assert [result.timestamp for result in results] == pytest.approx([t for _, _, t in video_frames])
+
+    # The next connection gets the pipeline back without the previous connection's track
+    results = detect_all(socket_path, video_frames)
+    assert [summarize(result) for result in results] == baseline_detections
+
+
+def test_unknown_frame_number_and_timestamp(socket_path, video_frames):
+    with DetectionClient(socket_path, timeout=30) as client:
+        result, processing_ms = client.detect(video_frames[0][0])
+    assert result.frame_number == -1
+    assert result.timestamp is None
+    assert processing_ms > 0
+
+
+def test_failed_frame_returns_an_error_and_keeps_the_connection(socket_path, video_frames, monkeypatch):
+    process_frame = DetectionPipeline.process_frame
+
+    def fail_on_frame_99(self, frame, frame_number=None, timestamp=None):
+        if frame_number == 99:
+            raise ValueError("cannot process frame 99")
+        return process_frame(self, frame, frame_number, timestamp)
+
+    monkeypatch.setattr(DetectionPipeline, "process_frame", fail_on_frame_99)
+    frame, frame_number, timestamp = video_frames[0]
+    with DetectionClient(socket_path, timeout=30) as client:
+        with pytest.raises(RuntimeError, match="cannot process frame 99"):
+            client.detect(frame, 99)
+        result, _ = client.detect(frame, frame_number, timestamp)
+    assert result.frame_number == frame_number
+    assert result.fitted_line is not None
+
+
+def request_header(height, width, channels):
+    header = np.zeros(1, dtype=REQUEST_DTYPE)
+    header["magic"] = REQUEST_MAGIC
+    header["frame_number"] = 7
+    header["timestamp"] = np.nan
+    header["height"], header["width"], header["channels"] = height, width, channels
+    return header.tobytes()
+
+
+@pytest.mark.parametrize("shape, message", [((65535, 65535, 3), "exceeds the limit"),
+                                            ((100, 100, 255), "3 channels"),
+                                            ((0, 100, 3), "Invalid frame size")])
+def test_invalid_header_is_rejected_before_reading_the_frame(socket_path, video_frames, shape, message):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(30)
+        sock.connect(socket_path)
+        sock.sendall(request_header(*shape))  # No payload follows
+
+        response = bytearray(RESPONSE_DTYPE.itemsize)
+        view = memoryview(response)
+        while len(view):
+            received = sock.recv_into(view)
+            assert received
+            view = view[received:]
+        response = np.frombuffer(bytes(response), dtype=RESPONSE_DTYPE)[0]
+        assert response["status"] == STATUS_ERROR and response["frame_number"] == 7
+        assert message in sock.recv(int(response["message_size"])).decode("utf-8")
+        assert sock.recv(1) == b""  # The connection is closed
+
+    # The service keeps serving other connections
+    frame, frame_number, timestamp = video_frames[0]
+    with DetectionClient(socket_path, timeout=30) as client:
+        assert client.detect(frame, frame_number, timestamp)[0].fitted_line is not None
+
+
+def test_client_gets_the_error_for_a_rejected_frame(socket_path):
+    with DetectionClient(socket_path, timeout=30) as client:
+        with pytest.raises(RuntimeError, match="3 channels"):
+            client.detect(np.zeros((4, 4), dtype=np.uint8), 1)
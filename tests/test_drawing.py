@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from drawing import Drawer
+from media_loader import MediaLoader
+from pipeline import DetectionPipeline
+
+
+@pytest.mark.parametrize("line", [(100, 300, 140, 10), (200, 10, 200, 300), (10, 50, 300, 50),
+                                  (600, 20, 20, 340), (300, 200, 310, 199)])
+def test_vectorized_extrapolation_matches_the_per_line_version(line):
+    drawer = Drawer()
+    image = np.zeros((360, 640, 3), dtype=np.uint8)
+    expected = drawer.plot_extrapolated_line(drawer.prepare_canvas(image), *line)
+    canvas = drawer.plot_extrapolated_lines(drawer.prepare_canvas(image), np.array([[line]], dtype=np.int32))
+    assert np.array_equal(canvas, expected)
+
+
+def test_no_lines_leave_the_canvas_untouched():
+    drawer = Drawer()
+    canvas = drawer.prepare_canvas(np.zeros((36, 64, 3), dtype=np.uint8))
+    before = canvas.copy()
+    drawer.plot_extrapolated_lines(canvas, np.empty((0, 1, 4), dtype=np.int32))
+    assert np.array_equal(canvas, before)
+
+
+def test_reused_canvas_matches_a_fresh_one():
+    fresh, reused = Drawer(), Drawer(reuse_canvas=True)
+    first = np.full((36, 64, 3), 50, dtype=np.uint8)
+    canvas = reused.prepare_canvas(first)
+    reused.plot_extrapolated_lines(canvas, np.array([[[10, 5, 20, 30]]], dtype=np.int32))
+
+    second = np.full((36, 64, 3), 90, dtype=np.uint8)
+    canvas_again = reused.prepare_canvas(second)
+    assert canvas_again is canvas  # Same buffer, with the previous overlays cleared
+    assert np.array_equal(canvas_again, fresh.prepare_canvas(second))
+    assert reused.prepare_canvas(np.zeros((18, 32, 3), dtype=np.uint8)).shape == (36, 32, 3)
+
+
+def test_pipeline_canvases_match_without_reuse(config, video_path):
+    def canvases(reuse_buffers):
+        pipeline = DetectionPipeline(config, reuse_buffers=reuse_buffers)
+        media_loader = MediaLoader(video_path)
+        try:
+            # Copies, since a reused canvas is overwritten by the next frame
+            return [result.canvas.copy() for result in pipeline.run(media_loader, render=True)]
+        finally:
+            media_loader.release()
+
+    for reused, fresh in zip(canvases(True), canvases(False)):
+        assert np.array_equal(reused, fresh)
@@ -0,0 +1,58 @@
+import numpy as np
+
+from geometry_correction import GeometryCorrector
+
+
+class CountingCorrector(GeometryCorrector):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.builds = []
+
+    def _build_maps(self, width, height):
+        self.builds.append((width, height))
+        return super()._build_maps(width, height)
+
+
+def test_maps_are_built_once_per_resolution():
+    corrector = CountingCorrector(cache_size=2)
+    first = corrector.get_undistortion_maps(64, 48)
+    assert corrector.get_undistortion_maps(64, 48) is first
+    corrector.get_undistortion_maps(32, 24)
+    assert corrector.builds == [(64, 48), (32, 24)]
+
+
+def test_least_recently_used_resolution_is_evicted():
+    corrector = CountingCorrector(cache_size=2)
+    for size in [(64, 48), (32, 24), (64, 48), (16, 12), (64, 48), (32, 24)]:
+        corrector.get_undistortion_maps(*size)
+    # (32, 24) was the least recently used one when (16, 12) was added
+    assert corrector.builds == [(64, 48), (32, 24), (16, 12), (32, 24)]
+
+
+def test_maps_are_persisted_and_reloaded(tmp_path):
+    writer = CountingCorrector(cache_dir=str(tmp_path))
+    built = writer.get_undistortion_maps(64, 48)
+    assert len(list(tmp_path.glob("*.npy"))) == 2
+    assert not list(tmp_path.glob("*.tmp"))
+
+    reader = CountingCorrector(cache_dir=str(tmp_path))
+    loaded = reader.get_undistortion_maps(64, 48)
+    assert reader.builds == []
+    for built_map, loaded_map in zip(built, loaded):
+        assert np.array_equal(built_map, loaded_map)
+
+    # Other distortion coefficients do not reuse the maps
+    other = CountingCorrector(k1=0.3, cache_dir=str(tmp_path))
+    other.get_undistortion_maps(64, 48)
+    assert other.builds == [(64, 48)]
+
+
+def test_corrupt_map_files_are_rebuilt(tmp_path):
+    GeometryCorrector(cache_dir=str(tmp_path)).get_undistortion_maps(64, 48)
+    for path in tmp_path.glob("*.npy"):
+        path.write_bytes(b"not a map")
+
+    corrector = CountingCorrector(cache_dir=str(tmp_path))
+    image = np.full((48, 64, 3), 128, dtype=np.uint8)
+    assert corrector.apply_fisheye_correction(image).shape == image.shape
+    assert corrector.builds == [(64, 48)]
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from instrumentation import Instrumentation
+from pipeline import DetectionPipeline
+
+
+@pytest.fixture
+def gray_first_config(config):
+    config["fisheye_correction"]["grayscale_first"] = True
+    return config
+
+
+def test_detections_match_the_color_first_order(config, gray_first_config, clip_frames):
+    default = DetectionPipeline(config)
+    gray_first = DetectionPipeline(gray_first_config)
+    for i, frame in enumerate(clip_frames):
+        expected = default.process_frame(frame, i + 1)
+        result = gray_first.process_frame(frame, i + 1)
+        # Remapping the gray image instead of the color one only changes interpolation rounding
+        assert np.abs(np.subtract(result.fitted_line, expected.fitted_line)).max() <= 2
+        assert result.hough_lines is not None
+
+
+def test_color_frame_is_only_remapped_when_used(config, gray_first_config, clip_frames):
+    instrumentation = Instrumentation()
+    pipeline = DetectionPipeline(gray_first_config, instrumentation=instrumentation)
+    results = [pipeline.process_frame(frame, i + 1) for i, frame in enumerate(clip_frames[:3])]
+    assert "fisheye_color" not in instrumentation.snapshot()["stages"]
+
+    pipeline.render(results[-1])
+    assert instrumentation.snapshot()["stages"]["fisheye_color"]["count"] == 1
+    expected = DetectionPipeline(config).process_frame(clip_frames[2], 3).frame
+    assert np.array_equal(results[-1].frame, expected)
@@ -0,0 +1,71 @@
+import csv
+import threading
+
+from instrumentation import HISTOGRAM_BUCKETS, Instrumentation, StatsReporter
+from pipeline import DetectionPipeline
+
+
+def test_disabled_instrumentation_records_nothing():
+    instrumentation = Instrumentation(enabled=False)
+    with instrumentation.stage("blur"):
+        pass
+    instrumentation.increment("frames_processed")
+    instrumentation.observe("canny", 0.01)
+    assert instrumentation.snapshot() == {"counters": {}, "stages": {}}
+
+
+def test_counters_and_stages_from_several_threads():
+    instrumentation = Instrumentation(window=10)
+
+    def record():
+        for _ in range(100):
+            instrumentation.increment("frames_processed")
+            instrumentation.observe("blur", 0.002)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = instrumentation.snapshot()
+    assert snapshot["counters"] == {"frames_processed": 400}
+    blur = snapshot["stages"]["blur"]
+    assert blur["count"] == 400
+    assert abs(blur["p50_ms"] - 2.0) < 1e-9
+    # Cumulative buckets: every sample is at most 2.5 ms
+    assert blur["buckets"] == [0 if bound < 0.002 else 400 for bound in HISTOGRAM_BUCKETS]
+
+
+def test_pipeline_reports_its_stages(config, clip_frames):
+    instrumentation = Instrumentation()
+    pipeline = DetectionPipeline(config, instrumentation=instrumentation)
+    for i, frame in enumerate(clip_frames[:3]):
+        pipeline.render(pipeline.process_frame(frame, i + 1))
+
+    snapshot = instrumentation.snapshot()
+    assert snapshot["counters"]["frames_processed"] == 3
+    assert {"blur", "threshold", "canny", "hough", "selection"} <= set(snapshot["stages"])
+    assert snapshot["stages"]["canny"]["count"] == 3
+
+
+def test_reporter_exports(tmp_path):
+    instrumentation = Instrumentation()
+    instrumentation.increment("frames_processed", 5)
+    instrumentation.observe("blur", 0.003)
+    csv_path = str(tmp_path / "stats.csv")
+    prometheus_path = str(tmp_path / "metrics.prom")
+    reporter = StatsReporter(instrumentation, print_stats=False, csv_path=csv_path, prometheus_path=prometheus_path)
+    reporter.report()
+    reporter.report()
+
+    with open(csv_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["stage"], row["count"]) for row in rows] == [("blur", "1"), ("blur", "1")]
+
+    with open(prometheus_path) as f:
+        metrics = f.read().splitlines()
+    assert "uav_line_detection_frames_processed_total 5" in metrics
+    assert 'uav_line_detection_stage_seconds_bucket{stage="blur",le="+Inf"} 1' in metrics
+    assert 'uav_line_detection_stage_seconds_count{stage="blur"} 1' in metrics
+    assert "[stats] frames=5" in reporter.format_line(instrumentation.snapshot())
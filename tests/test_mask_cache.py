@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+
+from mask_cache import MaskCache, config_fingerprint
+from media_loader import MediaLoader
+from pipeline import DetectionPipeline
+from conftest import summarize
+
+
+def enable_cache(config, directory):
+    config["mask_cache"].update(enabled=True, directory=str(directory))
+    config["tracking"]["enabled"] = True
+    config["temporal_threshold"]["enabled"] = True
+
+
+def test_only_pipelines_that_ask_for_the_cache_use_it(config, tmp_path):
+    enable_cache(config, tmp_path)
+
+    pipeline = DetectionPipeline(config)
+    assert pipeline.mask_cache is None
+    assert pipeline.line_tracker is not None
+    assert pipeline.temporal_threshold is not None
+
+    pipeline = DetectionPipeline(config, use_mask_cache=True)
+    assert pipeline.mask_cache is not None
+    assert pipeline.line_tracker is None
+    assert pipeline.temporal_threshold is None
+
+
+def test_fingerprint_covers_only_the_mask_settings(config):
+    fingerprint = config_fingerprint(config)
+    config["contour_selection"]["min_area"] += 1
+    config["line_detection"]["threshold"] += 1
+    config["fisheye_correction"]["map_cache_size"] = 99
+    assert config_fingerprint(config) == fingerprint
+
+    config["preprocessing"]["morphological_opening"]["kernel_size"] = (5, 5)
+    assert config_fingerprint(config) != fingerprint
+
+
+def test_namespace_changes_when_the_input_changes(config, tmp_path):
+    cache = MaskCache(str(tmp_path / "cache"))
+    video = tmp_path / "clip.avi"
+    video.write_bytes(b"0" * 10)
+    namespace = cache.namespace(str(video), config)
+    assert cache.namespace(str(video), config) == namespace
+    video.write_bytes(b"0" * 11)
+    assert cache.namespace(str(video), config) != namespace
+
+
+def test_masks_round_trip(tmp_path):
+    cache = MaskCache(str(tmp_path))
+    rng = np.random.default_rng(0)
+    binary = (rng.integers(0, 2, (37, 53)) * 255).astype(np.uint8)
+    edges = (rng.integers(0, 2, (37, 53)) * 255).astype(np.uint8)
+    cache.put("ns", 1, binary, edges, 0.5)
+    cache.put("ns", 2, binary)
+
+    cached_binary, cached_edges, timestamp = cache.get("ns", 1, need_edges=True)
+    assert np.array_equal(cached_binary, binary) and np.array_equal(cached_edges, edges)
+    assert timestamp == 0.5
+    assert cache.get("ns", 2, need_edges=True) is None  # Stored without edges
+    assert cache.get("ns", 2)[1:] == (None, None)
+    assert cache.get("ns", 3) is None
+
+
+def test_least_recently_used_frames_are_evicted(tmp_path):
+    binary = np.full((64, 64), 255, dtype=np.uint8)
+    cache = MaskCache(str(tmp_path))
+    cache.put("ns", 1, binary)
+    entry_size = cache.total_bytes
+
+    cache = MaskCache(str(tmp_path / "small"), max_bytes=int(2.5 * entry_size))
+    cache.put("ns", 1, binary)
+    cache.put("ns", 2, binary)
+    cache.get("ns", 1)  # Frame 2 is now the least recently used
+    cache.put("ns", 3, binary)
+
+    assert cache.contains("ns", 1) and cache.contains("ns", 3)
+    assert not cache.contains("ns", 2)
+    assert len(os.listdir(tmp_path / "small")) == 2
+
+
+def test_the_size_limit_holds_across_processes(tmp_path):
+    binary = np.full((64, 64), 255, dtype=np.uint8)
+    cache = MaskCache(str(tmp_path))
+    cache.put("ns", 1, binary)
+    entry_size = cache.total_bytes
+
+    # Two caches on one directory stand for two worker processes
+    directory = tmp_path / "shared"
+    first = MaskCache(str(directory), max_bytes=int(3.5 * entry_size), num_processes=2)
+    second = MaskCache(str(directory), max_bytes=int(3.5 * entry_size), num_processes=2)
+    first.put("ns", 1, binary)
+    first.put("ns", 2, binary)
+    second.put("ns", 3, binary)
+    first.get("ns", 1)  # Frame 2 is now the least recently used
+    second.put("ns", 4, binary)
+
+    assert sorted(os.listdir(directory)) == ["ns_00000001.npz", "ns_00000003.npz", "ns_00000004.npz"]
+    assert second.total_bytes == 3 * entry_size
+    assert first.get("ns", 2) is None and first.get("ns", 1) is not None
+
+
+def test_cached_runs_match_the_uncached_pipeline(config, video_path, baseline_detections, tmp_path):
+    config["mask_cache"].update(enabled=True, directory=str(tmp_path))
+    for expected_hits in (0, len(baseline_detections)):
+        pipeline = DetectionPipeline(config, use_mask_cache=True)
+        media_loader = MediaLoader(video_path)
+        try:
+            detections = [summarize(result) for result in pipeline.run(media_loader, render=False)]
+        finally:
+            media_loader.release()
+        assert detections == baseline_detections
+        assert pipeline.mask_cache.hits == expected_hits
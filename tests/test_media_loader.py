@@ -0,0 +1,115 @@
+import os
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from media_loader import MediaLoader, read_jpeg_size, reduced_decode_flag
+
+LARGE_SIZE = (2880, 1620)
+
+
+@pytest.fixture(scope="module")
+def large_jpeg_dir(clip_frames, tmp_path_factory):
+    directory = tmp_path_factory.mktemp("large_jpegs")
+    rng = np.random.default_rng(1)
+    for i in range(12):
+        frame = cv2.resize(clip_frames[i % len(clip_frames)], LARGE_SIZE, interpolation=cv2.INTER_CUBIC)
+        frame = cv2.add(frame, rng.integers(0, 30, frame.shape, dtype=np.uint8))  # Detail a reduced decode loses
+        cv2.imwrite(str(directory / f"frame_{i:03d}.jpg"), frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return str(directory)
+
+
+def write_oriented_jpeg(path, image, orientation, byte_order="<"):
+    """
+    Writes a JPEG with an APP1 segment holding only the EXIF orientation tag.
+    """
+    tiff = (b"II*\0" if byte_order == "<" else b"MM\0*") + struct.pack(byte_order + "I", 8)
+    tiff += struct.pack(byte_order + "HHHIHHI", 1, 0x0112, 3, 1, orientation, 0, 0)
+    app1 = b"Exif\0\0" + tiff
+    encoded = cv2.imencode(".jpg", image)[1].tobytes()
+    with open(path, "wb") as f:
+        f.write(encoded[:2] + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + encoded[2:])
+
+
+def read_all(media_loader, **kwargs):
+    try:
+        return list(media_loader.iter_frames(**kwargs))
+    finally:
+        media_loader.release()
+
+
+def test_read_jpeg_size_matches_decoded_size(large_jpeg_dir, image_dir):
+    path = os.path.join(large_jpeg_dir, "frame_000.jpg")
+    assert read_jpeg_size(path) == cv2.imread(path).shape[:2]
+    assert read_jpeg_size(os.path.join(image_dir, "frame_000.png")) is None
+
+
+def test_reduced_decode_does_not_depend_on_decode_order(large_jpeg_dir):
+    sequential = read_all(MediaLoader(large_jpeg_dir, reduced_decode=True), prefetch=0)
+    prefetched = read_all(MediaLoader(large_jpeg_dir, reduced_decode=True), prefetch=8, num_threads=4)
+    sharded = (read_all(MediaLoader(large_jpeg_dir, end_frame=5, reduced_decode=True), prefetch=8, num_threads=4)
+               + read_all(MediaLoader(large_jpeg_dir, start_frame=5, reduced_decode=True), prefetch=2, num_threads=2))
+
+    assert [n for _, n, _ in sequential] == list(range(1, 13))
+    for other in (prefetched, sharded):
+        assert [n for _, n, _ in other] == [n for _, n, _ in sequential]
+        for (frame, _, _), (expected, _, _) in zip(other, sequential):
+            assert np.array_equal(frame, expected)
+
+
+def test_reduced_decode_applies_to_every_image(large_jpeg_dir):
+    frames = read_all(MediaLoader(large_jpeg_dir, reduced_decode=True), prefetch=8, num_threads=4)
+    flag = reduced_decode_flag(LARGE_SIZE[::-1])
+    assert flag == cv2.IMREAD_REDUCED_COLOR_2
+    for i, (frame, _, _) in enumerate(frames):
+        path = os.path.join(large_jpeg_dir, f"frame_{i:03d}.jpg")
+        expected = MediaLoader._resize(cv2.imread(path, flag), LARGE_SIZE[::-1])
+        assert np.array_equal(frame, expected)
+
+
+def test_full_decode_is_the_default(large_jpeg_dir):
+    frames = read_all(MediaLoader(large_jpeg_dir), prefetch=8, num_threads=4)
+    for i, (frame, _, _) in enumerate(frames):
+        path = os.path.join(large_jpeg_dir, f"frame_{i:03d}.jpg")
+        expected = MediaLoader._resize(cv2.imread(path), LARGE_SIZE[::-1])
+        assert frame.shape == (500, 888, 3)
+        assert np.array_equal(frame, expected)
+
+
+def test_prefetched_video_matches_on_demand_decode(video_path):
+    on_demand = read_all(MediaLoader(video_path), prefetch=0)
+    prefetched = read_all(MediaLoader(video_path), prefetch=3)
+    assert [(n, t) for _, n, t in prefetched] == [(n, t) for _, n, t in on_demand]
+    assert all(np.array_equal(a, b) for (a, _, _), (b, _, _) in zip(prefetched, on_demand))
+
+
+@pytest.mark.parametrize("orientation, byte_order", [(1, "<"), (3, "<"), (6, "<"), (8, ">")])
+def test_reduced_decode_follows_the_exif_orientation(orientation, byte_order, clip_frames, tmp_path):
+    # Stored as 2000x1200; orientations 6 and 8 are rotated by 90 degrees when decoded
+    image = cv2.resize(clip_frames[0], (2000, 1200), interpolation=cv2.INTER_CUBIC)
+    write_oriented_jpeg(str(tmp_path / "frame_000.jpg"), image, orientation, byte_order)
+    path = str(tmp_path / "frame_000.jpg")
+    assert read_jpeg_size(path) == cv2.imread(path).shape[:2]
+
+    (full, _, _), = read_all(MediaLoader(str(tmp_path)), prefetch=0)
+    (reduced, _, _), = read_all(MediaLoader(str(tmp_path), reduced_decode=True), prefetch=0)
+    assert full.shape == ((500, 300, 3) if orientation in (6, 8) else (500, 833, 3))
+    assert reduced.shape == full.shape
+    assert np.abs(reduced.astype(int) - full).mean() < 3
+
+
+def test_prefetched_images_match_on_demand_decode(large_jpeg_dir):
+    on_demand = read_all(MediaLoader(large_jpeg_dir, reduced_decode=False), prefetch=0)
+    prefetched = read_all(MediaLoader(large_jpeg_dir, reduced_decode=False), prefetch=4, num_threads=3)
+    assert [n for _, n, _ in prefetched] == [n for _, n, _ in on_demand] == list(range(1, 13))
+    assert all(np.array_equal(a, b) for (a, _, _), (b, _, _) in zip(prefetched, on_demand))
+
+
+def test_reduced_decode_gives_the_full_decode_size(large_jpeg_dir):
+    full = read_all(MediaLoader(large_jpeg_dir, reduced_decode=False), prefetch=0)
+    reduced = read_all(MediaLoader(large_jpeg_dir, reduced_decode=True), prefetch=0)
+    for (frame, _, _), (expected, _, _) in zip(reduced, full):
+        assert frame.shape == expected.shape == (500, 888, 3)
+        assert np.mean(np.abs(frame.astype(int) - expected.astype(int))) < 3
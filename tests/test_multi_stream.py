@@ -0,0 +1,70 @@
+import cv2
+import numpy as np
+import pytest
+
+from media_loader import MediaLoader
+from multi_stream import MultiStreamProcessor, stream_output_path, tile_canvases
+from conftest import CLIP_SIZE, CLIP_FPS, summarize
+
+
+@pytest.fixture(scope="module")
+def half_rate_video_path(clip_frames, tmp_path_factory):
+    """
+    Every other frame of the clip at half the frame rate, so frames line up in time with the clip.
+    """
+    path = str(tmp_path_factory.mktemp("video") / "half_rate.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), CLIP_FPS / 2, CLIP_SIZE)
+    for frame in clip_frames[::2]:
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def run_groups(config, paths, **kwargs):
+    media_loaders = [MediaLoader(path) for path in paths]
+    try:
+        processor = MultiStreamProcessor(config, render=False, **kwargs)
+        return [[None if result is None else summarize(result) for result in group.results]
+                for group in processor.run(media_loaders)]
+    finally:
+        for media_loader in media_loaders:
+            media_loader.release()
+
+
+def test_each_stream_matches_the_sequential_pipeline(config, video_path, baseline_detections):
+    groups = run_groups(config, [video_path, video_path])
+    assert [group[0] for group in groups] == baseline_detections
+    assert [group[1] for group in groups] == baseline_detections
+
+
+def present(groups, stream):
+    return [i for i, group in enumerate(groups) if group[stream] is not None]
+
+
+def test_frames_are_grouped_by_timestamp(config, video_path, half_rate_video_path):
+    # The default tolerance is half the frame interval of the faster stream
+    groups = run_groups(config, [video_path, half_rate_video_path])
+    assert len(groups) == 8
+    assert present(groups, 0) == list(range(8))
+    assert present(groups, 1) == [0, 2, 4, 6]
+
+
+def test_sync_tolerance_widens_the_groups(config, video_path, half_rate_video_path):
+    # A frame 0.1s later joins the current group, so the half-rate stream runs ahead
+    groups = run_groups(config, [video_path, half_rate_video_path], sync_tolerance=0.15)
+    assert present(groups, 0) == list(range(8))
+    assert present(groups, 1) == [0, 1, 3, 5]
+
+
+def test_image_folders_are_grouped_by_frame_number(config, video_path, image_dir):
+    groups = run_groups(config, [image_dir, video_path])
+    assert len(groups) == 8
+    assert all(group[0][0] == group[1][0] == i + 1 for i, group in enumerate(groups))
+
+
+def test_helpers():
+    assert stream_output_path("out/detections.jsonl", 1) == "out/detections_cam1.jsonl"
+    assert tile_canvases([None]) is None
+
+    canvases = [np.zeros((360, 640, 3), np.uint8), None, np.zeros((720, 1280, 3), np.uint8)]
+    assert tile_canvases(canvases).shape == (360, 1280, 3)
@@ -0,0 +1,90 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from output_sinks import BackgroundSink, FrameSink, ImageSequenceSink, RawFrameSink, load_raw_frames
+
+
+class ListSink(FrameSink):
+    def __init__(self, delay=None):
+        self.frames = []
+        self.closed = False
+        self.delay = delay
+
+    def write(self, frame, frame_number=None):
+        if self.delay is not None:
+            self.delay.wait()
+        self.frames.append((frame, frame_number))
+
+    def close(self):
+        self.closed = True
+
+
+class FailingSink(FrameSink):
+    def write(self, frame, frame_number=None):
+        raise IOError("disk full")
+
+
+def test_raw_frames_round_trip(tmp_path):
+    path = str(tmp_path / "frames.raw")
+    frames = [np.full((36, 64, 3), i, dtype=np.uint8) for i in range(3)]
+    sink = RawFrameSink(path)
+    for frame in frames:
+        sink.write(frame)
+    sink.write(np.zeros((72, 128, 3), dtype=np.uint8))  # Resized to the size of the first frame
+    sink.close()
+
+    loaded = load_raw_frames(path)
+    assert loaded.shape == (4, 36, 64, 3)
+    assert all(np.array_equal(loaded[i], frame) for i, frame in enumerate(frames))
+
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 100)  # A partially written last frame is ignored
+    assert len(load_raw_frames(path)) == 3
+
+
+def test_raw_loader_rejects_other_files(tmp_path):
+    path = tmp_path / "other.raw"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        load_raw_frames(str(path))
+
+
+def test_background_sink_keeps_order_and_copies_frames():
+    release = threading.Event()
+    inner = ListSink(delay=release)
+    sink = BackgroundSink(inner, queue_size=8)
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    for i in range(5):
+        frame[:] = i  # The caller reuses its buffer while the encoder is still behind
+        sink.write(frame, i + 1)
+    release.set()
+    sink.close()
+
+    assert [number for _, number in inner.frames] == [1, 2, 3, 4, 5]
+    assert [int(written[0, 0, 0]) for written, _ in inner.frames] == [0, 1, 2, 3, 4]
+    assert inner.closed
+
+
+def test_background_sink_reports_errors_once():
+    sink = BackgroundSink(FailingSink(), queue_size=1)
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    with pytest.raises(IOError):
+        for _ in range(100):
+            sink.write(frame)
+    sink.write(frame)  # Later frames are dropped without raising again
+    sink.close()
+
+
+def test_image_sequence_is_numbered_by_frame(tmp_path):
+    sink = ImageSequenceSink(str(tmp_path), extension="png", num_threads=2, max_pending=1)
+    frames = [np.full((8, 8, 3), 40 * i, dtype=np.uint8) for i in range(3)]
+    for i, frame in enumerate(frames):
+        sink.write(frame, frame_number=i + 10)
+    sink.close()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["frame_000010.png", "frame_000011.png",
+                                                                 "frame_000012.png"]
+    assert np.array_equal(cv2.imread(str(tmp_path / "frame_000012.png")), frames[2])
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import parameter_sweep
+from media_loader import MediaLoader
+from parameter_sweep import MemoizedRunner, ParameterSweep, make_variants, parse_param, stability_metrics
+from pipeline import DetectionPipeline
+from conftest import summarize
+
+GRID = {"line_detection.threshold": [60, 100], "contour_selection.min_area": [1000, 5000]}
+
+
+def test_variants_cover_the_grid(config):
+    variants = make_variants(config, GRID)
+    assert [overrides for overrides, _ in variants] == [
+        {"line_detection.threshold": 60, "contour_selection.min_area": 1000},
+        {"line_detection.threshold": 60, "contour_selection.min_area": 5000},
+        {"line_detection.threshold": 100, "contour_selection.min_area": 1000},
+        {"line_detection.threshold": 100, "contour_selection.min_area": 5000},
+    ]
+    assert variants[1][1]["contour_selection"]["min_area"] == 5000
+    assert config["contour_selection"]["min_area"] == 1000  # The base config is not modified
+    with pytest.raises(KeyError):
+        make_variants(config, {"line_detection.treshold": [1]})
+    assert parse_param("line_detection.threshold=80,100") == ("line_detection.threshold", [80, 100])
+
+
+def test_memoized_outputs_match_plain_runs(config, clip_frames):
+    pipelines = [DetectionPipeline(variant, enable_tracking=False, reuse_buffers=False)
+                 for _, variant in make_variants(config, GRID)]
+    runner = MemoizedRunner()
+    frame = clip_frames[0]
+    height, width = frame.shape[:2]
+    computed = []
+    for pipeline in pipelines:
+        (gray,), (gray_key,), frame_stats = runner.run(pipeline.frame_graph, [frame], [("frame", 1)], ["gray"])
+        (hough_lines, fitted_line), _, stats = runner.run(
+            pipeline.detection_graph, [gray, height, width, 0], [gray_key, height, width, 0],
+            ["hough_lines", "fitted_line"])
+        computed.append(frame_stats[1] + stats[1])
+
+        expected = summarize(pipeline.process_frame(frame, 1))
+        assert fitted_line == expected[1]
+        assert sorted(tuple(line) for line in hough_lines.reshape(-1, 4)) == expected[2]
+
+    # Later variants only recompute the stages downstream of the parameter they change
+    assert computed[1] < computed[0] and computed[2] < computed[0] and computed[3] < computed[0]
+
+
+def test_sweep_reports_every_variant(config, video_path):
+    results, _ = ParameterSweep(config, GRID, num_processes=1).run(video_path)
+    assert [result["overrides"] for result in results] == [overrides for overrides, _ in
+                                                            make_variants(config, GRID)]
+
+    for result, (_, variant) in zip(results, make_variants(config, GRID)):
+        pipeline = DetectionPipeline(variant, enable_tracking=False)
+        media_loader = MediaLoader(video_path)
+        try:
+            plain = [pipeline.process_frame(frame, n) for frame, n, _ in media_loader.iter_frames()]
+        finally:
+            media_loader.release()
+        assert result["frames"] == len(plain)
+        assert result["detection_rate"] == np.mean([r.fitted_line is not None for r in plain])
+        assert result["hough_lines_per_frame"] == np.mean([len(r.hough_lines) for r in plain])
+    # The first variant computes everything; the others reuse its upstream stages
+    assert results[0]["cache_hit_rate"] == 0
+    assert all(result["cache_hit_rate"] > 0 for result in results[1:])
+
+
+def test_stability_metrics():
+    metrics = stability_metrics([(0, 0, 10, 10), (2, 0, 12, 10), None, (2, 0, 12, 10)])
+    assert metrics == {"detection_rate": 0.75, "jitter_px": 1.0, "max_jump_px": 1.0}
+    assert stability_metrics([None])["jitter_px"] is None
+
+
+def test_sweep_decodes_with_the_base_config(config, image_dir, monkeypatch):
+    decode_options = []
+
+    class RecordingLoader(MediaLoader):
+        def __init__(self, *args, **kwargs):
+            decode_options.append(kwargs.get("reduced_decode"))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(parameter_sweep, "MediaLoader", RecordingLoader)
+    config["input"]["reduced_decode"] = True
+    ParameterSweep(config, GRID, num_processes=1, max_frames=2, groups_per_process=2).run(image_dir)
+    assert decode_options == [True, True]
+
+    with pytest.raises(ValueError):
+        ParameterSweep(config, {"input.reduced_decode": [False, True]})
@@ -0,0 +1,120 @@
+import cv2
+import numpy as np
+import pytest
+
+from pipeline import DetectionPipeline
+from preprocessing import Preprocessor, TemporalThreshold, otsu_threshold
+from synthetic_frames import SyntheticFrameGenerator
+
+
+@pytest.fixture(scope="module")
+def gray_720p():
+    image = SyntheticFrameGenerator(seed=0).generate(1280, 720, pole_x_top=580, pole_x_bottom=640).image
+    return Preprocessor().convert_to_grayscale(image)
+
+
+@pytest.mark.parametrize("size", [(640, 360), (1280, 720), (1920, 1080)])
+def test_downsampled_blur_is_close_to_the_full_blur(size):
+    width, height = size
+    image = SyntheticFrameGenerator(seed=1).generate(width, height, pole_x_top=0.45 * width,
+                                                     pole_x_bottom=0.5 * width).image
+    preprocessor = Preprocessor()
+    gray = preprocessor.convert_to_grayscale(image)
+
+    full = preprocessor.apply_blur(gray).astype(int)
+    downsampled = preprocessor.apply_downsampled_blur(gray).astype(int)
+    difference = np.abs(full - downsampled)
+    assert difference.max() <= 5
+    assert difference.mean() < 0.25
+
+    full_threshold, full_mask = preprocessor.apply_otsu_threshold(full.astype(np.uint8))
+    threshold, mask = preprocessor.apply_otsu_threshold(downsampled.astype(np.uint8))
+    assert abs(threshold - full_threshold) <= 1
+    assert np.mean(mask != full_mask) < 0.002
+
+
+def test_threshold_is_reused_while_the_histogram_is_stable(gray_720p):
+    otsu_threshold, otsu_mask = Preprocessor().apply_otsu_threshold(gray_720p)
+    temporal = TemporalThreshold(drift_tolerance=0.05)
+
+    threshold, mask = temporal.apply(gray_720p)
+    assert temporal.recomputed
+    assert threshold == otsu_threshold
+    assert np.array_equal(mask, otsu_mask)
+
+    # The next frame of the clip, with the pole moved a little, keeps the threshold
+    next_frame = SyntheticFrameGenerator(seed=0).generate(1280, 720, pole_x_top=584, pole_x_bottom=644).image
+    next_gray = Preprocessor().convert_to_grayscale(next_frame)
+    threshold, mask = temporal.apply(next_gray)
+    assert not temporal.recomputed
+    assert threshold == otsu_threshold
+    assert np.array_equal(mask, Preprocessor().apply_binary_threshold(next_gray, otsu_threshold))
+
+
+def test_threshold_is_recomputed_on_drift(gray_720p):
+    temporal = TemporalThreshold(drift_tolerance=0.05, smoothing=1.0)
+    first_threshold, _ = temporal.apply(gray_720p)
+
+    darker = (gray_720p * 0.6).astype(np.uint8)
+    threshold, mask = temporal.apply(darker)
+    assert temporal.recomputed
+    expected_threshold, expected_mask = Preprocessor().apply_otsu_threshold(darker)
+    assert threshold == expected_threshold != first_threshold
+    assert np.array_equal(mask, expected_mask)
+
+
+def test_smoothing_moves_towards_the_new_threshold(gray_720p, monkeypatch):
+    temporal = TemporalThreshold(drift_tolerance=0.05, smoothing=0.5)
+    first_threshold, _ = temporal.apply(gray_720p)
+
+    darker = (gray_720p * 0.6).astype(np.uint8)
+    target, target_mask = Preprocessor().apply_otsu_threshold(darker)
+
+    # Every frame, including the one that recomputes Otsu's threshold, is thresholded once
+    threshold_calls = []
+    cv2_threshold = cv2.threshold
+
+    def counting_threshold(image, threshold, *args, **kwargs):
+        threshold_calls.append(threshold)
+        return cv2_threshold(image, threshold, *args, **kwargs)
+
+    monkeypatch.setattr(cv2, "threshold", counting_threshold)
+    thresholds = []
+    for _ in range(12):
+        threshold, mask = temporal.apply(darker)
+        thresholds.append(threshold)
+    assert threshold_calls == thresholds
+    monkeypatch.undo()
+
+    assert abs(thresholds[0] - (first_threshold + 0.5 * (target - first_threshold))) < 1e-6
+    assert all(abs(b - target) <= abs(a - target) for a, b in zip(thresholds, thresholds[1:]))
+    assert thresholds[-1] == target  # Snaps to the target once it is within half a grey level
+    assert np.array_equal(mask, target_mask)
+
+
+def test_otsu_threshold_from_a_histogram_matches_opencv(gray_720p):
+    rng = np.random.default_rng(0)
+    images = [gray_720p, (gray_720p * 0.6).astype(np.uint8), np.full((8, 8), 7, dtype=np.uint8)]
+    images += [rng.normal(rng.uniform(50, 200), rng.uniform(5, 50), (40, 40)).clip(0, 255).astype(np.uint8)
+               for _ in range(50)]
+    for image in images:
+        histogram = cv2.calcHist([image], [0], None, [256], [0, 256]).ravel()
+        assert otsu_threshold(histogram) == Preprocessor().apply_otsu_threshold(image)[0]
+
+
+def test_default_smoothing_matches_the_config(config):
+    assert TemporalThreshold().smoothing == config["temporal_threshold"]["smoothing"]
+    del config["temporal_threshold"]["smoothing"]
+    config["temporal_threshold"]["enabled"] = True
+    assert DetectionPipeline(config).temporal_threshold.smoothing == TemporalThreshold().smoothing
+
+
+def test_reset_forgets_the_reference_frame(gray_720p):
+    temporal = TemporalThreshold(drift_tolerance=0.05, smoothing=0.5)
+    temporal.apply(gray_720p)
+
+    darker = (gray_720p * 0.6).astype(np.uint8)
+    temporal.reset()
+    threshold, _ = temporal.apply(darker)
+    assert temporal.recomputed
+    assert threshold == Preprocessor().apply_otsu_threshold(darker)[0]
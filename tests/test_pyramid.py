@@ -0,0 +1,43 @@
+import numpy as np
+
+from pipeline import DetectionPipeline
+
+
+def distance_to_line(point, segment):
+    (x1, y1, x2, y2), (px, py) = segment, point
+    return abs((x2 - x1) * (y1 - py) - (x1 - px) * (y2 - y1)) / np.hypot(x2 - x1, y2 - y1)
+
+
+def run(config, frames):
+    pipeline = DetectionPipeline(config)
+    return [pipeline.process_frame(frame, i + 1) for i, frame in enumerate(frames)]
+
+
+def test_coarse_parameters_are_scaled(config):
+    config["pyramid"]["enabled"] = True
+    pipeline = DetectionPipeline(config)
+    assert pipeline.pyramid_scale == 2
+    assert pipeline.coarse_blur_kernel == (7, 7)
+    # A 3x3 opening shrinks to 1x1, which would do nothing, so the stage is skipped
+    assert pipeline.coarse_opening_kernel == (1, 1)
+    assert "opening" not in pipeline.detection_graph.stage_names
+
+
+def test_pyramid_detections_are_comparable_to_native(config, clip_frames):
+    native = run(config, clip_frames)
+    config["pyramid"]["enabled"] = True
+    pyramid = run(config, clip_frames)
+
+    for native_result, pyramid_result in zip(native, pyramid):
+        assert native_result.hough_lines is not None and pyramid_result.hough_lines is not None
+        native_segments = native_result.hough_lines.reshape(-1, 4)
+        pyramid_segments = pyramid_result.hough_lines.reshape(-1, 4)
+        assert len(pyramid_segments) >= len(native_segments) // 2
+        # Every coarse segment lies on a structure the native level also found
+        for x1, y1, x2, y2 in pyramid_segments:
+            midpoint = ((x1 + x2) / 2, (y1 + y2) / 2)
+            assert min(distance_to_line(midpoint, segment) for segment in native_segments) < 4
+
+        # The refined contour is re-thresholded with the coarse threshold, so allow a little drift
+        assert pyramid_result.fitted_line is not None
+        assert np.abs(np.subtract(pyramid_result.fitted_line, native_result.fitted_line)).max() <= 8
@@ -0,0 +1,70 @@
+import time
+
+from media_loader import MediaLoader
+from realtime import RealtimeProcessor
+
+
+def test_single_slow_frame_does_not_degrade(config):
+    processor = RealtimeProcessor(config, deadline_ms=33.0, render=False)
+    processor._adapt(0.5)
+    for _ in range(10):
+        processor._adapt(0.005)
+    assert processor.level == 0
+
+
+def test_consecutive_slow_frames_degrade_and_recover(config):
+    processor = RealtimeProcessor(config, deadline_ms=33.0, degrade_frames=3, recover_frames=5, render=False)
+    for _ in range(2):
+        processor._adapt(0.05)
+    assert processor.level == 0
+    processor._adapt(0.05)
+    assert processor.level == 1
+
+    for _ in range(5):
+        processor._adapt(0.001)
+    assert processor.level == 0
+
+
+def test_building_the_undistortion_maps_is_not_timed(config, video_path):
+    processor = RealtimeProcessor(config, deadline_ms=100.0, render=False)
+    build_maps = processor.geometry_corrector._build_maps
+
+    def slow_build_maps(width, height):
+        time.sleep(0.3)  # Longer than the deadline
+        return build_maps(width, height)
+
+    processor.geometry_corrector._build_maps = slow_build_maps
+    media_loader = MediaLoader(video_path)
+    try:
+        results = list(processor.run(media_loader))
+    finally:
+        media_loader.release()
+
+    assert results
+    assert processor.frames_over_deadline == 0
+    assert all(result.degradation_level == 0 for result in results)
+
+
+def test_slow_frames_degrade_and_fast_frames_recover(config):
+    processor = RealtimeProcessor(config, deadline_ms=33.0, recover_frames=5, render=False)
+    for _ in range(10):
+        processor._adapt(0.05)
+    assert processor.level == len(processor.pipelines) - 1
+
+    for _ in range(5 * len(processor.pipelines)):
+        processor._adapt(0.001)
+    assert processor.level == 0
+
+
+def test_frames_within_the_deadline_run_at_full_detail(config, video_path):
+    processor = RealtimeProcessor(config, deadline_ms=10000.0, render=False)
+    media_loader = MediaLoader(video_path)
+    try:
+        results = list(processor.run(media_loader))
+    finally:
+        media_loader.release()
+
+    frame_numbers = [result.frame_number for result in results]
+    assert frame_numbers and frame_numbers == sorted(set(frame_numbers))
+    assert processor.frames_per_level[0] == len(results)
+    assert processor.frames_over_deadline == 0
@@ -0,0 +1,59 @@
+import pytest
+
+from pipeline import DetectionPipeline
+from stage_graph import Stage, StageGraph
+
+
+def recording_stage(calls, name, inputs, outputs, function):
+    def record(*args):
+        calls.append(name)
+        return function(*args)
+    return Stage(name, inputs, outputs, record)
+
+
+def test_stages_without_consumers_are_pruned():
+    calls = []
+    stages = [
+        recording_stage(calls, "double", ["x"], "doubled", lambda x: 2 * x),
+        recording_stage(calls, "square", ["x"], "squared", lambda x: x * x),
+        recording_stage(calls, "sum", ["doubled", "x"], "total", lambda doubled, x: doubled + x),
+        recording_stage(calls, "split", ["squared"], ["low", "high"], lambda squared: (squared - 1, squared + 1)),
+    ]
+    graph = StageGraph(stages, inputs=["x"], outputs=["total", "missing"])
+
+    assert graph.stage_names == ["double", "sum"]
+    assert graph.run(3) == (9, None)  # Outputs no stage produces are None
+    assert calls == ["double", "sum"]
+    assert [stage.name for stage in graph.stages_for(["doubled"])] == ["double"]
+
+    graph = StageGraph(stages, inputs=["x"], outputs=["high"])
+    assert graph.stage_names == ["square", "split"]
+    assert graph.run(3) == (10,)
+
+
+def test_consuming_a_later_output_is_rejected():
+    stages = [
+        Stage("sum", ["doubled", "x"], "total", lambda doubled, x: doubled + x),
+        Stage("double", ["x"], "doubled", lambda x: 2 * x),
+    ]
+    with pytest.raises(ValueError, match="sum"):
+        StageGraph(stages, inputs=["x"], outputs=["total"])
+
+
+def test_disabled_line_detection_skips_canny(config):
+    assert "canny" in DetectionPipeline(config).detection_graph.stage_names
+
+    config["line_detection"]["enabled"] = False
+    pipeline = DetectionPipeline(config)
+    assert "canny" not in pipeline.detection_graph.stage_names
+    assert "hough" not in pipeline.detection_graph.stage_names
+
+
+def test_disabled_stages_give_empty_outputs(config, clip_frames):
+    config["contour_detection"]["enabled"] = False
+    pipeline = DetectionPipeline(config)
+    assert "contours" not in pipeline.detection_graph.stage_names
+
+    result = pipeline.process_frame(clip_frames[0], 1)
+    assert result.hough_lines is not None
+    assert result.best_contour is None and result.fitted_line is None
@@ -0,0 +1,57 @@
+import threading
+import time
+
+import threaded_pipeline
+from media_loader import MediaLoader
+from pipeline import DetectionPipeline
+from threaded_pipeline import PipelinedProcessor
+from conftest import summarize
+
+
+def sequential_detections(config, video_path):
+    pipeline = DetectionPipeline(config, enable_tracking=False)
+    media_loader = MediaLoader(video_path)
+    try:
+        return [summarize(result) for result in pipeline.run(media_loader, render=False)]
+    finally:
+        media_loader.release()
+
+
+def test_results_are_yielded_in_frame_order(config, video_path):
+    expected = sequential_detections(config, video_path)
+
+    processor = PipelinedProcessor(config, num_workers=3, render=False)
+    media_loader = MediaLoader(video_path)
+    try:
+        results = [summarize(result) for result in processor.run(media_loader)]
+    finally:
+        media_loader.release()
+    assert results == expected
+
+
+def test_slow_frame_holds_back_decoding(config, video_path, monkeypatch):
+    started = []
+    first_done = threading.Event()
+
+    class SlowFirstFrame(DetectionPipeline):
+        def process_frame(self, frame, frame_number, timestamp=None):
+            started.append((frame_number, first_done.is_set()))
+            if frame_number == 1:
+                time.sleep(0.5)
+                first_done.set()
+            return super().process_frame(frame, frame_number, timestamp)
+
+    monkeypatch.setattr(threaded_pipeline, "DetectionPipeline", SlowFirstFrame)
+    expected = sequential_detections(config, video_path)
+
+    processor = PipelinedProcessor(config, num_workers=2, queue_size=2, render=False)
+    media_loader = MediaLoader(video_path)
+    try:
+        results = [summarize(result) for result in processor.run(media_loader)]
+    finally:
+        media_loader.release()
+
+    assert results == expected
+    # While the first frame is stuck, only the frames within the in-flight window are processed
+    ahead = [frame_number for frame_number, after_first in started if frame_number > 1 and not after_first]
+    assert ahead == [2]
@@ -0,0 +1,46 @@
+from instrumentation import Instrumentation
+from pipeline import DetectionPipeline
+from synthetic_frames import SyntheticFrameGenerator
+from tracking import LineTracker
+from conftest import CLIP_SIZE, summarize
+
+
+def test_band_follows_the_predicted_line():
+    tracker = LineTracker(band_width=0.2, full_search_interval=3)
+    assert tracker.search_band(640) is None  # No track yet
+
+    tracker.update((300, 0, 340, 359), full_search=True)
+    tracker.update((304, 0, 344, 359), full_search=False)
+    assert tracker.predict() == (306.0, 346.0)  # Half of the 4 px step, with velocity_smoothing 0.5
+    assert tracker.search_band(640) == (242, 411)
+
+    tracker.update((308, 0, 348, 359), full_search=False)
+    tracker.update((312, 0, 352, 359), full_search=False)
+    assert tracker.search_band(640) is None  # full_search_interval frames since the last full search
+
+    tracker.update(None, full_search=True)
+    assert not tracker.has_track
+
+
+def test_lost_track_falls_back_to_a_full_frame_search(config, clip_frames):
+    # The pole jumps far out of the band after the first frames
+    width, height = CLIP_SIZE
+    jumped = SyntheticFrameGenerator(seed=0).generate(width, height, pole_x_top=60, pole_x_bottom=100).image
+    frames = clip_frames[:4] + [jumped] + clip_frames[4:]
+
+    untracked = DetectionPipeline(config)
+    expected = [summarize(untracked.process_frame(frame, i + 1)) for i, frame in enumerate(frames)]
+
+    config["tracking"]["enabled"] = True
+    instrumentation = Instrumentation(enabled=True)
+    tracked = DetectionPipeline(config, instrumentation=instrumentation)
+    results = [tracked.process_frame(frame, i + 1) for i, frame in enumerate(frames)]
+
+    counters = instrumentation.snapshot()["counters"]
+    assert counters["track_lost"] >= 1
+    assert counters["roi_frames"] >= 4
+    # The frame the track was lost on still finds the line where the untracked pipeline does
+    assert results[4].fitted_line is not None
+    assert summarize(results[4])[1] == expected[4][1]
+    for result, (_, fitted_line, _) in zip(results, expected):
+        assert (result.fitted_line is None) == (fitted_line is None)
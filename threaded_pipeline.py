@@ -0,0 +1,168 @@
+import queue
+import threading
+
+from pipeline import DetectionPipeline, create_geometry_corrector
+from instrumentation import Instrumentation
+
+_END = object()  # Sentinel marking the end of a stream
+
+
+class PipelinedProcessor:
+    """
+    Processes frames with a decode thread, a pool of detection workers and an
+    ordered output stage.
+
+    The decode thread reads frames from the MediaLoader into a bounded queue. Each
+    worker owns its own DetectionPipeline (sharing one GeometryCorrector) and runs
+    the detection and drawing stages; OpenCV releases the GIL, so workers run in
+    parallel. Results are put back into frame order before being yielded to the
+    caller, which writes and displays them. The decode thread never gets more than
+    max(queue_size, num_workers) frames ahead of the next frame to be yielded, so a
+    slow frame holds back decoding instead of letting results pile up behind it.
+    """
+    def __init__(self, config, num_workers=4, queue_size=None, render=True, instrumentation=None):
+        """
+        Args:
+            config (dict): The CONFIG dictionary.
+            num_workers (int): Number of detection worker threads.
+            queue_size (int): Capacity of the queues between stages and number of frames that may be
+                              in flight ahead of the output (defaults to 2 * num_workers).
+            render (bool): Whether workers should draw the detections onto a canvas.
+            instrumentation (Instrumentation): Optional stage timers and counters shared by all threads.
+        """
+        self.config = config
+        self.num_workers = max(1, num_workers)
+        self.queue_size = queue_size or 2 * self.num_workers
+        self.render = render
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        self.geometry_corrector = create_geometry_corrector(config)
+
+        self._input_queue = queue.Queue(maxsize=self.queue_size)
+        self._output_queue = queue.Queue(maxsize=self.queue_size)
+        self._in_flight = None  # Released by run() for every frame it yields
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def _put(self, q, item):
+        # Blocking put that gives up once the processor is being stopped
+        while not self._stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _acquire(self, semaphore):
+        # Blocking acquire that gives up once the processor is being stopped
+        while not self._stop_event.is_set():
+            if semaphore.acquire(timeout=0.1):
+                return True
+        return False
+
+    def _decode_loop(self, media_loader):
+        sequence = 0
+        input_config = self.config.get("input", {})
+        frames = media_loader.iter_frames(prefetch=input_config.get("prefetch", 0),
+                                          num_threads=input_config.get("decode_threads", 1))
+        try:
+            while not self._stop_event.is_set():
+                with self.instrumentation.stage("decode"):
+                    item = next(frames, None)
+                if item is None:
+                    break
+                frame, frame_number, timestamp = item
+                # Wait until the output has caught up, so the reorder buffer in run() stays bounded
+                if not self._acquire(self._in_flight):
+                    return
+                if not self._put(self._input_queue, (sequence, frame, frame_number, timestamp)):
+                    return
+                sequence += 1
+        except Exception as exc:
+            self._put(self._output_queue, (None, exc))
+        finally:
+            frames.close()
+            # One end marker per worker so every worker shuts down
+            for _ in range(self.num_workers):
+                self._put(self._input_queue, _END)
+
+    def _worker_loop(self):
+        # Tracking needs every frame in order, which a single worker does not see, and
+        # results are still in use on the output side while the worker renders the next frame
+        pipeline = DetectionPipeline(self.config, geometry_corrector=self.geometry_corrector,
+                                     instrumentation=self.instrumentation, enable_tracking=False,
+                                     reuse_buffers=False)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    item = self._input_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _END:
+                    break
+
+                sequence, frame, frame_number, timestamp = item
+                result = pipeline.process_frame(frame, frame_number, timestamp)
+                if self.render:
+                    pipeline.render(result)
+                if not self._put(self._output_queue, (sequence, result)):
+                    return
+        except Exception as exc:
+            self._put(self._output_queue, (None, exc))
+        finally:
+            self._put(self._output_queue, _END)
+
+    def run(self, media_loader):
+        """
+        Starts the pipeline and yields FrameResults in frame order.
+
+        Closing the generator early (e.g. when the user quits) stops all threads.
+        """
+        self._stop_event.clear()
+        self._in_flight = threading.Semaphore(max(self.queue_size, self.num_workers))
+        self._threads = [threading.Thread(target=self._decode_loop, args=(media_loader,),
+                                          name="decode", daemon=True)]
+        self._threads += [threading.Thread(target=self._worker_loop, name=f"worker-{i}", daemon=True)
+                          for i in range(self.num_workers)]
+        for thread in self._threads:
+            thread.start()
+
+        pending = {}  # Results that arrived ahead of their turn, keyed by sequence number (bounded by _in_flight)
+        next_sequence = 0
+        finished_workers = 0
+        try:
+            while finished_workers < self.num_workers:
+                item = self._output_queue.get()
+                if item is _END:
+                    finished_workers += 1
+                    continue
+
+                sequence, result = item
+                if sequence is None:
+                    raise result  # Propagate exceptions from the decode thread or a worker
+
+                pending[sequence] = result
+                while next_sequence in pending:
+                    result = pending.pop(next_sequence)
+                    next_sequence += 1
+                    self._in_flight.release()
+                    yield result
+        finally:
+            self.stop()
+
+    def stop(self):
+        """
+        Signals all threads to stop and waits for them to exit.
+        """
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        # Drop anything left in the queues so a later run starts clean
+        for q in (self._input_queue, self._output_queue):
+            while True:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    break
@@ -0,0 +1,80 @@
+class LineTracker:
+    """
+    Predicts where the fitted line will be in the next frame, so detection can be
+    restricted to a vertical band around it.
+
+    The line is tracked by its x position at the top and at the bottom of the frame
+    with a constant-velocity model: the next position is the last measured position
+    plus a smoothed per-frame velocity. The tracker asks for a full-frame search
+    when it has no track yet, when the track was lost and every
+    full_search_interval frames, so a new (better) line can still be picked up.
+    """
+    def __init__(self, band_width=0.2, full_search_interval=30, velocity_smoothing=0.5):
+        """
+        Args:
+            band_width (float): Width of the search band as a fraction of the frame width. The band is
+                                centred on the predicted line and widened to cover its slant.
+            full_search_interval (int): Run a full-frame search at least every N frames (0 to disable).
+            velocity_smoothing (float): Weight of the newest measurement in the velocity estimate (0-1).
+        """
+        self.band_width = band_width
+        self.full_search_interval = full_search_interval
+        self.velocity_smoothing = velocity_smoothing
+        self.reset()
+
+    def reset(self):
+        self._position = None  # (x_top, x_bottom) of the last measured line
+        self._velocity = (0.0, 0.0)
+        self._frames_since_full_search = 0
+
+    @property
+    def has_track(self):
+        return self._position is not None
+
+    def predict(self):
+        """
+        Returns the predicted (x_top, x_bottom) of the line in the next frame, or None without a track.
+        """
+        if self._position is None:
+            return None
+        return (self._position[0] + self._velocity[0], self._position[1] + self._velocity[1])
+
+    def search_band(self, image_width):
+        """
+        Returns the (x_start, x_end) column range to search in the next frame, or None
+        if the next frame needs a full-frame search.
+        """
+        prediction = self.predict()
+        if prediction is None:
+            return None
+        if self.full_search_interval and self._frames_since_full_search >= self.full_search_interval:
+            return None
+
+        half_band = self.band_width * image_width / 2.0
+        x_start = int(max(0, min(prediction) - half_band))
+        x_end = int(min(image_width, max(prediction) + half_band + 1))
+        if x_end - x_start >= image_width or x_end <= x_start:
+            return None
+        return x_start, x_end
+
+    def update(self, fitted_line, full_search):
+        """
+        Updates the track with the line found in the current frame.
+
+        Args:
+            fitted_line (tuple): (x_top, y_top, x_bottom, y_bottom), or None if no line was found.
+            full_search (bool): Whether the line came from a full-frame search.
+        """
+        if fitted_line is None:
+            self.reset()  # Track lost; the next frame is searched in full
+            return
+
+        x_top, _, x_bottom, _ = fitted_line
+        if self._position is None:
+            self._velocity = (0.0, 0.0)
+        else:
+            a = self.velocity_smoothing
+            self._velocity = ((1 - a) * self._velocity[0] + a * (x_top - self._position[0]),
+                              (1 - a) * self._velocity[1] + a * (x_bottom - self._position[1]))
+        self._position = (float(x_top), float(x_bottom))
+        self._frames_since_full_search = 0 if full_search else self._frames_since_full_search + 1